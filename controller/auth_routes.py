@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from database.db import db
-from model.models import Usuarios, Discapacidades, Preferencias, UsuarioDiscapacidad
+from model.models import Usuarios, Preferencias, UsuarioDiscapacidad
 from controller.forms import RegistrationForm, LoginForm
+from services.reference_data import obtener_discapacidades, obtener_preferencias
 
 auth_bp = Blueprint('auth', __name__,
                     template_folder='../view/templates/auth',
@@ -14,8 +15,8 @@ def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.home'))
     form = RegistrationForm()
-    form.discapacidades.choices = [(d.id_discapacidad, d.nombre.value if hasattr(d.nombre, 'value') else d.nombre) for d in Discapacidades.query.all()]
-    form.preferencias.choices = [(p.id_preferencia, p.nombre_corto) for p in Preferencias.query.all()]
+    form.discapacidades.choices = [(d.id_discapacidad, d.nombre.value if hasattr(d.nombre, 'value') else d.nombre) for d in obtener_discapacidades()]
+    form.preferencias.choices = [(p.id_preferencia, p.nombre_corto) for p in obtener_preferencias()]
     if form.validate_on_submit():
         existing_user = Usuarios.query.filter_by(DNI=form.dni.data).first()
         if existing_user:
@@ -36,11 +37,10 @@ def register():
                 user.discapacidades_pivot.append(user_discapacidad_assoc)
 
         if form.preferencias.data:
-            for preferencia_id_str in form.preferencias.data:
-                preferencia_id = int(preferencia_id_str)
-                preferencia = Preferencias.query.get(preferencia_id)
-                if preferencia:
-                    user.preferencias.append(preferencia)
+            # Una sola consulta IN para todas las preferencias seleccionadas
+            preferencia_ids = {int(preferencia_id_str) for preferencia_id_str in form.preferencias.data}
+            user.preferencias.extend(Preferencias.query.filter(Preferencias.id_preferencia.in_(preferencia_ids))
+                                     .order_by(Preferencias.id_preferencia).all())
 
         db.session.add(user)
         db.session.commit()
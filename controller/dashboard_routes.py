@@ -1,9 +1,18 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, flash, redirect, url_for, current_app, send_file, request
+from sqlalchemy import func, or_
 from flask_login import login_required, current_user
-from model.models import UsuarioDiscapacidad, Discapacidades, Inscripciones, Actividades, Usuarios, EstadoActividad
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from wtforms.validators import ValidationError
+from model.models import UsuarioDiscapacidad, Discapacidades, Inscripciones, Actividades, Usuarios, EstadoUsuario
 from database.db import db
-from services.participation_service import predecir_participacion
-from services.compatibility_service import get_compatibility_scores
+from database.query_stats import presupuesto_consultas
+from model.load_profiles import PERFIL_ACTIVIDAD_CON_ORGANIZACION, cargar_perfil_voluntario
+from services.participation_service import predecir_participacion_batch, exportar_arbol_modelo
+from services.recommendation_service import obtener_recomendaciones_usuario
+from services.enrollment_service import ESTADO_CANCELADA
+
+# Valores de Usuarios.perfil (filtro de la gestión de usuarios)
+PERFILES_USUARIO = ['voluntario', 'organizador', 'administrador']
 
 dashboard_bp = Blueprint('user_dashboard', __name__,
                          template_folder='../view/templates/dashboards',
@@ -37,24 +46,31 @@ def _get_participation_indicator_info(prediction_output):
 
 @dashboard_bp.route('/')
 @login_required
+@presupuesto_consultas(16) # Voluntario nuevo: ~10 para calcular sus recomendaciones en el momento
 def dashboard():
     # Redirige al panel de control según perfil.
     if current_user.perfil == 'administrador':
-        total_users = Usuarios.query.count()
-        total_programs = Actividades.query.count()
+        # Todos los totales del panel en una sola consulta (subconsultas escalares)
+        total_users, total_programs = db.session.query(
+            db.session.query(func.count(Usuarios.id_usuario)).scalar_subquery(),
+            db.session.query(func.count(Actividades.id_actividad)).scalar_subquery()
+        ).one()
         return render_template('admin_dashboard.html', title="Panel de Administrador", total_users=total_users, total_programs=total_programs)
     elif current_user.perfil == 'organizador':
         organizer_org_ids = [org.id_organizacion for org in current_user.organizaciones]
         created_programs_query = []
         if organizer_org_ids:
-            created_programs_query = Actividades.query.filter(Actividades.id_organizacion.in_(organizer_org_ids)) \
+            created_programs_query = Actividades.query.options(*PERFIL_ACTIVIDAD_CON_ORGANIZACION) \
+                                               .filter(Actividades.id_organizacion.in_(organizer_org_ids)) \
                                                .order_by(Actividades.fecha_actividad.desc()) \
                                                .all()
         
         # Procesamiento de actividades creadas por el organizador para mostrar predicción de participación
         actividades_con_prediccion = []
+        # Una sola matriz de características y una sola llamada al modelo para todas las actividades
+        predictions = predecir_participacion_batch([actividad.id_actividad for actividad in created_programs_query])
         for actividad in created_programs_query:
-            prediction_output = predecir_participacion(actividad.id_actividad)
+            prediction_output = predictions.get(actividad.id_actividad)
             # Utilizar la función auxiliar para obtener el indicador y el texto
             indicator, indicator_text = _get_participation_indicator_info(prediction_output)
 
@@ -63,7 +79,9 @@ def dashboard():
                 'indicador': indicator,
                 'texto_indicador': indicator_text,
                 'metricas': prediction_output.get('metricas') if prediction_output else None,
-                'tree_dot_file': prediction_output.get('tree_dot_file') if prediction_output else None
+                'modelo_hash': prediction_output.get('modelo_hash') if prediction_output else None,
+                'modelo_version': prediction_output.get('modelo_version') if prediction_output else None,
+                'entrenado_en': prediction_output.get('entrenado_en') if prediction_output else None
             })
 
         member_organizations = current_user.organizaciones
@@ -75,79 +93,34 @@ def dashboard():
     elif current_user.perfil == 'voluntario':
         user_enrollments = db.session.query(Inscripciones, Actividades) \
                             .join(Actividades, Inscripciones.id_actividad == Actividades.id_actividad) \
-                            .filter(Inscripciones.id_usuario == current_user.id_usuario) \
+                            .options(*PERFIL_ACTIVIDAD_CON_ORGANIZACION) \
+                            .filter(Inscripciones.id_usuario == current_user.id_usuario,
+                                    Inscripciones.estado_inscripcion != ESTADO_CANCELADA) \
                             .order_by(Inscripciones.fecha_inscripcion.desc()) \
                             .all()
 
-     
-        # 1. Obtener todas las actividades abiertas que podrían ser de interés
-        actividades_abiertas = Actividades.query.filter_by(estado=EstadoActividad.ABIERTO).all()
-        
-        # Lista para almacenar las actividades abiertas junto con su información combinada (compatibilidad y participación)
-        actividades_abiertas_con_prediccion = [] 
-
-        # 2. Preparar datos del perfil del voluntario para el servicio de compatibilidad
-        user_disabilities = []
-        if hasattr(current_user, 'discapacidades_pivot'):
-            user_disabilities = [
-                udp.discapacidad.nombre.value
-                for udp in current_user.discapacidades_pivot
-                if udp.discapacidad and udp.discapacidad.nombre
-            ]
-
-        user_profile = {
-            'id': current_user.id_usuario,
-            'username': current_user.nombre,
-            'interests': [p.nombre_corto for p in current_user.preferencias],
-            'skills': ['writing', 'gardening'],
-            'disabilities': user_disabilities
-        }
-
-        # 3. Cálculo de compatibilidad de programas con el perfil del voluntario.
-        programs_or_activities_for_compatibility = []
-        for actividad in actividades_abiertas:
-            item_data = {
-                'id': actividad.id_actividad,
-                'name': actividad.nombre,
-                'description': actividad.descripcion if actividad.descripcion else '',
-                'category': actividad.etiqueta if actividad.etiqueta else (actividad.nombre.lower() if actividad.nombre else "")
-            }
-            programs_or_activities_for_compatibility.append(item_data)
-
-        compatibility_scores = {}
-        if user_profile and programs_or_activities_for_compatibility:
-            try:
-                # Obtener los puntajes de compatibilidad
-                compatibility_scores = get_compatibility_scores(user_profile, programs_or_activities_for_compatibility)
-            except Exception as e:
-                current_app.logger.error(f"Error al llamar a get_compatibility_scores para el usuario {user_profile.get('id')}: {e}")
-                flash("Error al calcular la compatibilidad de actividades. Intente más tarde.", "danger")
-        
-        # 4. Procesamiento de actividades para predicción de participación y combinación con compatibilidad.
-        for actividad in actividades_abiertas:
-            # Obtener predicción de participación para la actividad
-            prediction_output = predecir_participacion(actividad.id_actividad)
-            # Utilizar la función auxiliar para obtener el indicador y el texto de participación
-            indicator, indicator_text = _get_participation_indicator_info(prediction_output)
 
-            activity_score = 0
-            if isinstance(compatibility_scores, dict):
-                 activity_score_value = compatibility_scores.get(actividad.id_actividad)
-                 if activity_score_value is not None:
-                     activity_score = activity_score_value
+        # 1. Leer las recomendaciones precalculadas del voluntario (ver `flask compute-recommendations`)
+        recomendaciones = []
+        try:
+            recomendaciones = obtener_recomendaciones_usuario(current_user.id_usuario, min_score=35)
+        except Exception as e:
+            current_app.logger.error(f"Error al obtener las recomendaciones del usuario {current_user.id_usuario}: {e}")
+            flash("Error al calcular la compatibilidad de actividades. Intente más tarde.", "danger")
 
-            actividades_abiertas_con_prediccion.append({
+        # 2. Predicción de participación solo para las actividades recomendadas
+        predictions = predecir_participacion_batch([actividad.id_actividad for actividad, _ in recomendaciones])
+        actividades_compatibles_filtradas = []
+        for actividad, activity_score in recomendaciones:
+            # Utilizar la función auxiliar para obtener el indicador y el texto de participación
+            indicator, indicator_text = _get_participation_indicator_info(predictions.get(actividad.id_actividad))
+            actividades_compatibles_filtradas.append({
                 'actividad': actividad,
                 'indicador': indicator,
                 'texto_indicador': indicator_text,
                 'compatibility_score': activity_score
             })
 
-        actividades_compatibles_filtradas = [
-            actividad_info for actividad_info in actividades_abiertas_con_prediccion
-            if actividad_info.get('compatibility_score', 0) > 35
-        ]
-
         return render_template('volunteer_dashboard.html',
                                title="Panel de Voluntario",
                                user_enrollments=user_enrollments,
@@ -158,10 +131,13 @@ def dashboard():
 
 @dashboard_bp.route('/profile')
 @login_required
+@presupuesto_consultas(8)
 def profile():
     """
     Muestra la página de perfil del usuario.
     """
+    # Preferencias y discapacidades (con su catálogo) en un número fijo de consultas
+    cargar_perfil_voluntario(current_user)
     user_disabilities_data = []
     if current_user.is_authenticated and hasattr(current_user, 'discapacidades_pivot'):
         user_general_preferences = list(current_user.preferencias)
@@ -178,7 +154,9 @@ def profile():
     if current_user.perfil == 'voluntario':
         user_enrollments = db.session.query(Inscripciones, Actividades) \
                                 .join(Actividades, Inscripciones.id_actividad == Actividades.id_actividad) \
-                                .filter(Inscripciones.id_usuario == current_user.id_usuario) \
+                                .options(*PERFIL_ACTIVIDAD_CON_ORGANIZACION) \
+                                .filter(Inscripciones.id_usuario == current_user.id_usuario,
+                                    Inscripciones.estado_inscripcion != ESTADO_CANCELADA) \
                                 .order_by(Inscripciones.fecha_inscripcion.desc()) \
                                 .all()
 
@@ -191,13 +169,114 @@ def profile():
 
 @dashboard_bp.route('/admin/manage_users')
 @login_required
+@presupuesto_consultas(4)
 def admin_manage_users():
     if current_user.perfil != 'administrador':
         flash("Acceso no autorizado.", "danger")
         return redirect(url_for('user_dashboard.dashboard'))
 
-    all_users = Usuarios.query.order_by(Usuarios.id_usuario).all()
-    return render_template('admin_manage_users.html', users=all_users, title="Gestionar Usuarios")
+    # Búsqueda y filtros en el servidor; paginación por cursor sobre id_usuario
+    search = request.args.get('q', '').strip()
+    perfil_filter = request.args.get('perfil', '')
+    estado_filter = request.args.get('estado', '')
+    after_id = request.args.get('after', type=int)
+    per_page = current_app.config.get('ADMIN_USERS_PER_PAGE', 50)
+
+    query = Usuarios.query
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Usuarios.DNI.like(f"{search}%"),
+                                 Usuarios.nombre.ilike(pattern),
+                                 Usuarios.apellido.ilike(pattern),
+                                 Usuarios.email.ilike(pattern)))
+    if perfil_filter in PERFILES_USUARIO:
+        query = query.filter(Usuarios.perfil == perfil_filter)
+    if estado_filter in [estado.value for estado in EstadoUsuario]:
+        query = query.filter(Usuarios.estado_usuario == EstadoUsuario(estado_filter))
+    if after_id:
+        query = query.filter(Usuarios.id_usuario > after_id)
+
+    users = query.order_by(Usuarios.id_usuario).limit(per_page + 1).all()
+    filter_args = {key: value for key, value in request.args.items() if key != 'after' and value}
+    next_page_url = None
+    if len(users) > per_page:
+        users = users[:per_page]
+        next_page_url = url_for('user_dashboard.admin_manage_users', after=users[-1].id_usuario, **filter_args)
+    first_page_url = url_for('user_dashboard.admin_manage_users', **filter_args) if after_id else None
+
+    return render_template('admin_manage_users.html', users=users, title="Gestionar Usuarios",
+                           perfiles=PERFILES_USUARIO, estados=[estado.value for estado in EstadoUsuario],
+                           current_filters=request.args, next_page_url=next_page_url, first_page_url=first_page_url,
+                           csrf_token=generate_csrf())
+
+@dashboard_bp.route('/admin/manage_users/bulk-status', methods=['POST'])
+@login_required
+def admin_bulk_update_user_status():
+    """Cambia el estado de los usuarios seleccionados con una sola sentencia UPDATE ... WHERE id IN (...)."""
+    if current_user.perfil != 'administrador':
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for('user_dashboard.dashboard'))
+
+    # La vuelta al listado se reconstruye con los filtros enviados (nunca con una URL del formulario)
+    filtros = {campo: request.form.get(f'filtro_{campo}', '').strip() for campo in ('q', 'perfil', 'estado')}
+    filtros = {campo: valor for campo, valor in filtros.items() if valor}
+    if request.form.get('filtro_after', '').isdigit():
+        filtros['after'] = int(request.form['filtro_after'])
+    return_url = url_for('user_dashboard.admin_manage_users', **filtros)
+
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.form.get('csrf_token'))
+        except ValidationError:
+            flash("La sesión del formulario expiró. Vuelve a intentarlo.", "danger")
+            return redirect(return_url)
+
+    estado_value = request.form.get('estado', '')
+    if estado_value not in [estado.value for estado in EstadoUsuario]:
+        flash("Estado de usuario no válido.", "danger")
+        return redirect(return_url)
+
+    # El administrador no puede cambiar su propio estado desde la acción masiva
+    user_ids = {int(value) for value in request.form.getlist('user_ids') if value.isdigit()}
+    user_ids.discard(current_user.id_usuario)
+    if not user_ids:
+        flash("No se seleccionó ningún usuario.", "info")
+        return redirect(return_url)
+
+    try:
+        updated = Usuarios.query.filter(Usuarios.id_usuario.in_(user_ids)) \
+                                .update({Usuarios.estado_usuario: EstadoUsuario(estado_value)}, synchronize_session=False)
+        db.session.commit()
+        current_app.logger.info(f"Administrador {current_user.id_usuario} cambió a '{estado_value}' el estado de {updated} usuarios.")
+        flash(f"Estado actualizado a '{estado_value}' para {updated} usuario(s).", "success")
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error en la actualización masiva de estado de usuarios: {e}")
+        flash("Error al actualizar el estado de los usuarios.", "danger")
+    return redirect(return_url)
+
+@dashboard_bp.route('/organizer/model-tree')
+@login_required
+def organizer_model_tree():
+    """
+    Descarga el árbol de decisión (.dot) del modelo de participación vigente.
+
+    El archivo se genera solo cuando se solicita, una vez por versión del modelo, y se sirve con
+    el hash del modelo como ETag para que el navegador pueda reutilizarlo (respuesta 304).
+    """
+    if current_user.perfil != 'organizador':
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for('main.home'))
+
+    artefacto = exportar_arbol_modelo()
+    if artefacto is None:
+        flash("No hay un modelo de predicción entrenado para exportar su árbol de decisión.", "info")
+        return redirect(url_for('user_dashboard.dashboard'))
+
+    path, model_hash, version = artefacto
+    return send_file(path, mimetype='text/vnd.graphviz', as_attachment=True,
+                     download_name=f"arbol_participacion_v{version}.dot",
+                     etag=model_hash, conditional=True, max_age=0)
 
 @dashboard_bp.route('/organizer/trigger-recommendations', methods=['POST'])
 @login_required
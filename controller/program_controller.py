@@ -1,14 +1,80 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+
 from flask import flash, redirect, url_for, current_app # Importar current_app para logging
 from flask_login import current_user, login_required
-from model.models import Actividades, Discapacidades, Inscripciones, EstadoActividad, Preferencias, actividad_discapacidad_table
-from services.compatibility_service import get_compatibility_scores
+from model.models import Actividades, Discapacidades, Inscripciones, actividad_discapacidad_table
+from services.compatibility_store import get_compatibility_scores_cached
+from services.reference_data import obtener_preferencia
+from services.search_service import subconsulta_busqueda
+from services.enrollment_service import (inscribir_usuario, cancelar_inscripcion, INSCRITO, EN_ESPERA, YA_INSCRITO,
+                                         NO_ABIERTA, NO_ENCONTRADA, CANCELADA, ESTADO_CANCELADA)
+from services.enrollment_queue import encolar_inscripcion, obtener_ticket, TICKET_PENDIENTE, TICKET_PROCESADO, TICKET_ERROR
+from services.seat_updates import notificar_cupos
+from sqlalchemy import and_, or_
 from database.db import db
-
-def get_programs_compatibility(tipo_filter=None, organizacion_filter=None, estado_filter=None, enfoque_inclusivo=None, preferencia_filter=None):
+from database.query_stats import presupuesto_consultas
+from model.load_profiles import PERFIL_TARJETA_PROGRAMA, PERFIL_DETALLE_PROGRAMA, cargar_perfil_voluntario
+
+# Mensajes para cada resultado de una inscripción: (mensaje, categoría de flash)
+MENSAJES_INSCRIPCION = {
+    INSCRITO: ("¡Inscripción exitosa!", "success"),
+    EN_ESPERA: ("El programa alcanzó su cupo máximo: quedaste en la lista de espera y te avisaremos si se libera un cupo.", "info"),
+    YA_INSCRITO: ("Ya estás inscrito en este programa.", "info"),
+    NO_ABIERTA: ("Este programa no está abierto para inscripciones.", "danger"),
+    NO_ENCONTRADA: ("Programa no encontrado.", "danger"),
+}
+
+# Valores de `orden`: compatibilidad con el voluntario, o fecha (por defecto sin búsqueda; con búsqueda se ordena por relevancia)
+ORDEN_COMPATIBILIDAD = 'compatibilidad'
+ORDEN_FECHA = 'fecha'
+
+def _build_volunteer_profile(user):
+    """Datos del perfil del voluntario que usa el servicio de compatibilidad."""
+    user = cargar_perfil_voluntario(user)
+    user_disabilities = [udp.discapacidad.nombre for udp in user.discapacidades_pivot if udp.discapacidad and udp.discapacidad.nombre]
+    user_interests = [pref.nombre_corto for pref in user.preferencias if pref.nombre_corto]
+    # TODO: Obtener habilidades reales del usuario. Por ahora, se usa una lista placeholder.
+    user_skills_placeholder = ['comunicacion', 'trabajo en equipo']
+
+    return {
+        'id': user.id_usuario,
+        'username': user.nombre,
+        'interests': user_interests,
+        'skills': user_skills_placeholder,
+        'disabilities': user_disabilities
+    }
+
+def _compatibility_item(program):
+    # El texto (descripción/categoría) ya está vectorizado en el índice de actividades
+    return {
+        'id': program.id_actividad,
+        'name': program.nombre,
+        'es_inclusiva': program.es_inclusiva, # Añadir si el programa es inclusivo
+        'discapacidades_soportadas': [d.nombre for d in program.discapacidades if d.nombre] # Nombres de discapacidades soportadas
+    }
+
+def get_programs_compatibility(tipo_filter=None, organizacion_filter=None, estado_filter=None, enfoque_inclusivo=None, preferencia_filter=None,
+                               cursor=None, orden=None, per_page=None, busqueda=None):
+    """
+    Devuelve una página del catálogo de programas con los filtros aplicados.
+
+    La paginación es por cursor (keyset): el cursor codifica la última fila de la página anterior, de modo
+    que cada página cuesta lo mismo sin importar lo avanzada que esté. Con `orden='compatibilidad'` (solo
+    voluntarios) se puntúan los IDs filtrados y se elige la página con un heap top-K; solo las actividades
+    de esa página se cargan completas.
+
+    Con `busqueda`, solo se incluyen las actividades que coinciden en el índice de texto completo
+    (ver `services.search_service`) y, salvo que se pida otro orden, se ordenan por relevancia.
+
+    Returns:
+        tuple: (programas de la página, {id_actividad: puntaje}, cursor de la página siguiente o None)
+    """
+    per_page = per_page or current_app.config.get('PROGRAMS_PER_PAGE', 12)
     compatibility_scores = {}
     query = Actividades.query
-    # Inicializar programs como lista vacía para el caso de que no se encuentren programas
-    programs = []
 
     apply_default_status_filter = True
     default_status_is_abierto = True
@@ -38,7 +104,7 @@ def get_programs_compatibility(tipo_filter=None, organizacion_filter=None, estad
         query = query.with_entities(Actividades) # Asegurarse de devolver solo objetos Actividades
 
     if preferencia_filter and preferencia_filter.isdigit():
-        pref = Preferencias.query.get(int(preferencia_filter))
+        pref = obtener_preferencia(int(preferencia_filter))
         if pref and pref.nombre_corto: # Filtrar por etiqueta de preferencia
             query = query.filter(Actividades.etiqueta == pref.nombre_corto)
 
@@ -54,69 +120,145 @@ def get_programs_compatibility(tipo_filter=None, organizacion_filter=None, estad
         else: # Por defecto, para usuarios no logueados o voluntarios, mostrar solo abiertos
             query = query.filter(Actividades.estado == 'abierto')
 
-    programs = query.all() # Ejecutar la consulta
-
-    # Si el usuario es voluntario y hay programas, calcular compatibilidad
-    if current_user.is_authenticated and current_user.perfil == 'voluntario' and programs:
-        user_disabilities = [udp.discapacidad.nombre for udp in current_user.discapacidades_pivot if udp.discapacidad and udp.discapacidad.nombre]
-        user_interests = [pref.nombre_corto for pref in current_user.preferencias if pref.nombre_corto]
-        # TODO: Obtener habilidades reales del usuario. Por ahora, se usa una lista placeholder.
-        user_skills_placeholder = ['comunicacion', 'trabajo en equipo']
-
-        user_profile_data = {
-            'id': current_user.id_usuario,
-            'username': current_user.nombre,
-            'interests': user_interests,
-            'skills': user_skills_placeholder,
-            'disabilities': user_disabilities
-        }
-
-        program_data_for_service = []
-        for p in programs:
-            # Obtener nombres de discapacidades soportadas por el programa
-            supported_disabilities_names = [d.nombre for d in p.discapacidades if d.nombre]
-
-            program_data_for_service.append({
-                'id': p.id_actividad,
-                'name': p.nombre,
-                'description': p.descripcion,
-                'category': p.etiqueta if p.etiqueta else (p.nombre.lower() if p.nombre else ""),
-                'es_inclusiva': p.es_inclusiva, # Añadir si el programa es inclusivo
-                'discapacidades_soportadas': supported_disabilities_names # Añadir lista de nombres de discapacidades
-            })
-
-        if program_data_for_service:
+    matches = subconsulta_busqueda(busqueda) if busqueda else None
+    if matches is not None:
+        query = query.join(matches, matches.c.id_actividad == Actividades.id_actividad)
+
+    is_volunteer = current_user.is_authenticated and current_user.perfil == 'voluntario'
+    if orden == ORDEN_COMPATIBILIDAD and is_volunteer:
+        return _page_by_compatibility(query, cursor, per_page)
+
+    if matches is not None and orden != ORDEN_FECHA:
+        # Orden por relevancia (mayor primero) e ID como desempate
+        cursor_filter = _after_relevance_cursor(matches, _decode_cursor(cursor))
+        if cursor_filter is not None:
+            query = query.filter(cursor_filter)
+        query = query.add_columns(matches.c.relevancia).order_by(matches.c.relevancia.desc(), Actividades.id_actividad)
+        rows = query.options(*PERFIL_TARJETA_PROGRAMA).limit(per_page + 1).all()
+        programs = [program for program, _ in rows]
+        last_key = [rows[per_page - 1][1], rows[per_page - 1][0].id_actividad] if len(rows) > per_page else None
+    else:
+        # Orden por fecha de la actividad (las que no tienen fecha al final) e ID como desempate
+        programs = _page_by_date(query.options(*PERFIL_TARJETA_PROGRAMA), _decode_cursor(cursor), per_page + 1) # Organización y discapacidades en bloque
+        last = programs[per_page - 1] if len(programs) > per_page else None
+        last_key = [last.fecha_actividad.isoformat() if last.fecha_actividad else None, last.id_actividad] if last else None
+
+    next_cursor = None
+    if last_key is not None:
+        programs = programs[:per_page]
+        next_cursor = _encode_cursor(last_key)
+
+    # Si el usuario es voluntario y hay programas, calcular compatibilidad (solo de la página)
+    if is_volunteer and programs:
+        try:
+            # Los puntajes se guardan por usuario en el almacén de compatibilidad, no en Actividades.compatibilidad
+            compatibility_scores = get_compatibility_scores_cached(_build_volunteer_profile(current_user),
+                                                                   [_compatibility_item(p) for p in programs])
+        except Exception as e:
+            # Usar logger para registrar errores del servicio de compatibilidad
+            current_app.logger.error(f"Error al calcular o procesar los puntajes de compatibilidad: {e}")
+
+    return programs, compatibility_scores, next_cursor
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor):
+    """Devuelve la lista de valores del cursor, o None si falta o no es válido (se muestra la primera página)."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return values if isinstance(values, list) else None
+    except (ValueError, UnicodeError):
+        return None
+
+def _page_by_date(query, cursor_values, limit):
+    """
+    Hasta `limit` filas posteriores al cursor (fecha, id) en el orden: fecha ascendente, sin fecha al final, id ascendente.
+
+    Se consulta en dos tramos (primero las actividades con fecha y, si no alcanzan, las que no tienen) para que
+    cada tramo recorra en orden los índices por (..., fecha_actividad, id_actividad) sin ordenar todas las filas.
+    """
+    after_date, last_id = None, None
+    if cursor_values and len(cursor_values) == 2 and isinstance(cursor_values[1], int):
+        last_id = cursor_values[1]
+        if cursor_values[0] is not None:
             try:
-                # Llamar al servicio de compatibilidad
-                compatibility_scores = get_compatibility_scores(user_profile_data, program_data_for_service)
-
-                # Si se obtuvieron puntajes y el usuario es voluntario, actualizar los objetos del programa
-                if compatibility_scores and current_user.perfil == 'voluntario':
-                    updated_scores_flag = False
-                    for program_obj in programs:
-                        score = compatibility_scores.get(program_obj.id_actividad)
-                        if score is not None:
-                            program_obj.compatibilidad = score # Asignar el nuevo puntaje
-                            updated_scores_flag = True
-                            # Registrar el puntaje (usar logger en producción)
-                            current_app.logger.info(f"Compatibilidad para actividad {program_obj.id_actividad} ({program_obj.nombre}): {program_obj.compatibilidad}")
-
-                    if updated_scores_flag:
-                        try:
-                            db.session.commit() # Guardar cambios en la BD
-                            current_app.logger.info("Puntajes de compatibilidad actualizados en la BD.")
-                        except Exception as e:
-                            db.session.rollback() # Revertir en caso de error
-                            current_app.logger.error(f"Error al guardar puntajes de compatibilidad en la BD: {e}")
-
-            except Exception as e:
-                # Usar logger para registrar errores del servicio de compatibilidad
-                current_app.logger.error(f"Error al calcular o procesar los puntajes de compatibilidad: {e}")
-
-    return programs, compatibility_scores
-
-from flask import Blueprint, render_template, redirect, url_for, flash
-from sqlalchemy.orm import joinedload # Importar joinedload
+                after_date = datetime.fromisoformat(cursor_values[0])
+            except (TypeError, ValueError):
+                last_id = None # Cursor inválido: primera página
+
+    programs = []
+    if last_id is None or after_date is not None:
+        dated = query.filter(Actividades.fecha_actividad.isnot(None))
+        if after_date is not None:
+            dated = dated.filter(or_(Actividades.fecha_actividad > after_date,
+                                     and_(Actividades.fecha_actividad == after_date, Actividades.id_actividad > last_id)))
+        programs = dated.order_by(Actividades.fecha_actividad, Actividades.id_actividad).limit(limit).all()
+    if len(programs) < limit:
+        undated = query.filter(Actividades.fecha_actividad.is_(None))
+        if last_id is not None and after_date is None:
+            undated = undated.filter(Actividades.id_actividad > last_id)
+        programs += undated.order_by(Actividades.id_actividad).limit(limit - len(programs)).all()
+    return programs
+
+def _after_relevance_cursor(matches, cursor_values):
+    # Filas posteriores a (relevancia, id) en el orden: relevancia descendente, id ascendente
+    if not cursor_values or len(cursor_values) != 2 or not isinstance(cursor_values[0], (int, float)) \
+            or not isinstance(cursor_values[1], int):
+        return None
+    last_relevance, last_id = cursor_values
+    return or_(matches.c.relevancia < last_relevance,
+               and_(matches.c.relevancia == last_relevance, Actividades.id_actividad > last_id))
+
+def _page_by_compatibility(query, cursor, per_page):
+    """
+    Página del catálogo ordenada por compatibilidad (mayor primero, ID como desempate).
+
+    Solo se consultan los IDs y los datos de inclusión de las actividades filtradas; los puntajes salen del
+    almacén por usuario y `heapq.nsmallest` elige las `per_page + 1` siguientes al cursor sin ordenar todo.
+    """
+    rows = query.with_entities(Actividades.id_actividad, Actividades.es_inclusiva).all()
+    if not rows:
+        return [], {}, None
+
+    activity_ids = [row.id_actividad for row in rows]
+    supported = {activity_id: [] for activity_id in activity_ids}
+    for activity_id, nombre in db.session.query(actividad_discapacidad_table.c.actividad_id, Discapacidades.nombre) \
+            .join(Discapacidades, actividad_discapacidad_table.c.discapacidad_id == Discapacidades.id_discapacidad) \
+            .filter(actividad_discapacidad_table.c.actividad_id.in_(activity_ids)).all():
+        if nombre:
+            supported[activity_id].append(nombre)
+    items = [{'id': row.id_actividad, 'es_inclusiva': row.es_inclusiva, 'discapacidades_soportadas': supported[row.id_actividad]}
+             for row in rows]
+
+    scores = {}
+    try:
+        scores = get_compatibility_scores_cached(_build_volunteer_profile(current_user), items)
+    except Exception as e:
+        current_app.logger.error(f"Error al calcular o procesar los puntajes de compatibilidad: {e}")
+
+    candidates = ((scores.get(activity_id, 0.0), activity_id) for activity_id in activity_ids)
+    cursor_values = _decode_cursor(cursor)
+    if cursor_values and len(cursor_values) == 2 and all(isinstance(value, (int, float)) for value in cursor_values):
+        last_score, last_id = cursor_values
+        candidates = ((score, activity_id) for score, activity_id in candidates
+                      if score < last_score or (score == last_score and activity_id > last_id))
+    page_keys = heapq.nsmallest(per_page + 1, candidates, key=lambda item: (-item[0], item[1]))
+
+    next_cursor = None
+    if len(page_keys) > per_page:
+        page_keys = page_keys[:per_page]
+        next_cursor = _encode_cursor(list(page_keys[-1]))
+
+    page_ids = [activity_id for _, activity_id in page_keys]
+    loaded = {p.id_actividad: p for p in Actividades.query.options(*PERFIL_TARJETA_PROGRAMA)
+              .filter(Actividades.id_actividad.in_(page_ids)).all()} if page_ids else {}
+    programs = [loaded[activity_id] for activity_id in page_ids if activity_id in loaded]
+    return programs, {activity_id: scores[activity_id] for activity_id in page_ids if activity_id in scores}, next_cursor
+
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 
 # Definición del Blueprint
 program_bp = Blueprint('program', __name__,
@@ -125,66 +267,95 @@ program_bp = Blueprint('program', __name__,
 
 # Ruta para ver el detalle de un programa
 @program_bp.route('/<int:program_id>')
+@presupuesto_consultas(10)
 def view_program_detail(program_id):
-    # Cargar programa con relaciones de discapacidades y facilidades
-    program = Actividades.query.options(
-        joinedload(Actividades.discapacidades),
-        joinedload(Actividades.facilidades),
-        joinedload(Actividades.organizacion) # Asegurar que la organización también se carga si es necesario
-    ).get(program_id)
+    # Cargar programa con relaciones de discapacidades, facilidades y organización
+    program = Actividades.query.options(*PERFIL_DETALLE_PROGRAMA).get(program_id)
 
     if not program:
         flash('Programa no encontrado.', 'danger')
         return redirect(url_for('main.programs')) # Redirigir si no se encuentra
 
+    # Compatibilidad personal del voluntario (desde el almacén por usuario) y su inscripción actual
+    compatibilidad = None
+    inscripcion = None
+    if current_user.is_authenticated and current_user.perfil == 'voluntario':
+        inscripcion = Inscripciones.query.filter(Inscripciones.id_usuario == current_user.id_usuario,
+                                                 Inscripciones.id_actividad == program_id,
+                                                 Inscripciones.estado_inscripcion != ESTADO_CANCELADA).first()
+        try:
+            scores = get_compatibility_scores_cached(_build_volunteer_profile(current_user), [_compatibility_item(program)])
+            compatibilidad = scores.get(program.id_actividad)
+        except Exception as e:
+            current_app.logger.error(f"Error al obtener la compatibilidad del programa {program_id}: {e}")
+
     # Renderizar la plantilla de detalle del programa
-    return render_template('program_detail.html', program=program, title=program.nombre)
+    return render_template('program_detail.html', program=program, compatibilidad=compatibilidad, inscripcion=inscripcion,
+                           ticket=request.args.get('ticket'), title=program.nombre)
 
 # Ruta para inscribirse en un programa (requiere login)
 @program_bp.route('/<int:program_id>/enroll', methods=['POST'])
 @login_required
 def enroll_program(program_id):
-    program = Actividades.query.get_or_404(program_id) # Obtener programa o error 404
+    # La actividad no se consulta aquí: si no existe, la inscripción (directa o en cola) responde NO_ENCONTRADA
 
     # Verificar que el usuario sea un voluntario
     if current_user.perfil != 'voluntario':
         flash("Solo los voluntarios pueden inscribirse.", "danger")
         return redirect(url_for('main.programs'))
 
-    # Verificar que el programa esté abierto para inscripciones
-    if program.estado != EstadoActividad.ABIERTO:
-        flash("Este programa no está abierto para inscripciones.", "danger")
-        return redirect(url_for('program.view_program_detail', program_id=program_id))
-
-    # Verificar si ya está inscrito
-    existing_inscription = Inscripciones.query.filter_by(
-        id_usuario=current_user.id_usuario,
-        id_actividad=program_id
-    ).first()
-    if existing_inscription:
-        flash("Ya estás inscrito en este programa.", "info")
-        return redirect(url_for('program.view_program_detail', program_id=program_id))
-
-    # Verificar cupo máximo
-    if program.cupo_maximo is not None:
-        if len(program.inscripciones) >= program.cupo_maximo:
-            flash("El programa ha alcanzado su cupo máximo.", "danger")
-            return redirect(url_for('program.view_program_detail', program_id=program_id))
+    if current_app.config.get('ENROLLMENT_QUEUE_ENABLED'):
+        # Modo en cola: se devuelve un ticket de inmediato y el resultado se consulta por sondeo
+        ticket = encolar_inscripcion(current_user.id_usuario, program_id)
+        status_url = url_for('program.enrollment_ticket_status', ticket=ticket)
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'ticket': ticket, 'estado': TICKET_PENDIENTE, 'estado_url': status_url}), 202
+        flash("Recibimos tu solicitud de inscripción. El resultado aparecerá en esta página en unos segundos.", "info")
+        return redirect(url_for('program.view_program_detail', program_id=program_id, ticket=ticket))
 
     try:
-        # Crear nueva inscripción
-        new_inscription = Inscripciones(
-            id_usuario=current_user.id_usuario,
-            id_actividad=program_id
-        )
-        db.session.add(new_inscription)
-        db.session.commit() # Guardar en la BD
-        flash("¡Inscripción exitosa!", "success")
-
+        # Reserva de cupo e inscripción atómicas (contador condicional + restricción única)
+        resultado = inscribir_usuario(current_user.id_usuario, program_id)
     except Exception as e:
-        db.session.rollback() # Revertir en caso de error
         flash(f"Error al procesar la inscripción: {str(e)}", "danger")
         current_app.logger.error(f"Error en inscripción para programa {program_id} por usuario {current_user.id_usuario}: {e}")
+        return redirect(url_for('program.view_program_detail', program_id=program_id))
 
+    if resultado == INSCRITO:
+        notificar_cupos(program_id)
+    mensaje, categoria = MENSAJES_INSCRIPCION.get(resultado, MENSAJES_INSCRIPCION[NO_ABIERTA])
+    flash(mensaje, categoria)
+    return redirect(url_for('program.view_program_detail', program_id=program_id))
+
+# Ruta para consultar el resultado de una inscripción en cola (sondeo)
+@program_bp.route('/enroll/ticket/<ticket>')
+@login_required
+def enrollment_ticket_status(ticket):
+    info = obtener_ticket(ticket)
+    if info is None or info['id_usuario'] != current_user.id_usuario:
+        return jsonify({'error': 'Ticket no encontrado o expirado.'}), 404
+
+    respuesta = {'ticket': ticket, 'estado': info['estado'], 'resultado': info['resultado']}
+    if info['estado'] == TICKET_PROCESADO:
+        respuesta['mensaje'], respuesta['categoria'] = MENSAJES_INSCRIPCION.get(info['resultado'], MENSAJES_INSCRIPCION[NO_ABIERTA])
+    elif info['estado'] == TICKET_ERROR:
+        respuesta['mensaje'], respuesta['categoria'] = "Error al procesar la inscripción. Intenta nuevamente.", "danger"
+    return jsonify(respuesta)
+
+# Ruta para cancelar una inscripción (libera el cupo y promueve la lista de espera)
+@program_bp.route('/<int:program_id>/cancel', methods=['POST'])
+@login_required
+def cancel_enrollment(program_id):
+    try:
+        resultado = cancelar_inscripcion(current_user.id_usuario, program_id)
+    except Exception as e:
+        flash(f"Error al cancelar la inscripción: {str(e)}", "danger")
+        current_app.logger.error(f"Error al cancelar la inscripción al programa {program_id} del usuario {current_user.id_usuario}: {e}")
+        return redirect(url_for('program.view_program_detail', program_id=program_id))
 
+    if resultado == CANCELADA:
+        notificar_cupos(program_id)
+        flash("Tu inscripción fue cancelada.", "success")
+    else:
+        flash("No tienes una inscripción activa en este programa.", "info")
     return redirect(url_for('program.view_program_detail', program_id=program_id))
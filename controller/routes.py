@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, request
-from model.models import Organizaciones, Discapacidades, Actividades, EstadoActividad, Preferencias
-from database.db import db
+from flask import Blueprint, render_template, request, url_for
+from model.models import EstadoActividad
 from controller.program_controller import get_programs_compatibility
+from database.query_stats import presupuesto_consultas
+from services.reference_data import obtener_tipos_actividad, obtener_organizaciones, obtener_discapacidades, obtener_preferencias
 
 main_bp = Blueprint('main', __name__, template_folder='../view/templates')
 
@@ -11,6 +12,7 @@ def home():
     return render_template('home.html')
 
 @main_bp.route('/programs')
+@presupuesto_consultas(14) # En frío: 4 de datos de referencia, 1 del índice y 1 al guardar los puntajes
 def programs():
     """Sirve la página que lista todos los programas, con capacidades de filtrado."""
     tipo_filter = request.args.get('tipo', None)
@@ -18,20 +20,31 @@ def programs():
     estado_filter = request.args.get('estado', None)
     enfoque_inclusivo_filter = request.args.get('enfoque_inclusivo', None)
 
-    tipos = [r[0] for r in db.session.query(Actividades.tipo).distinct().all() if r[0]]
-    organizaciones = Organizaciones.query.order_by(Organizaciones.nombre_org).all()
-    discapacidades = Discapacidades.query.order_by(Discapacidades.nombre).all()
+    # Opciones de los filtros desde la caché de datos de referencia
+    tipos = obtener_tipos_actividad()
+    organizaciones = obtener_organizaciones()
+    discapacidades = obtener_discapacidades()
     estados = [e.value for e in EstadoActividad]
-    preferencias_filter_options = Preferencias.query.order_by(Preferencias.nombre_corto).all()
+    preferencias_filter_options = obtener_preferencias()
 
-    all_programs, compatibility_scores = get_programs_compatibility(
+    orden = request.args.get('orden', None)
+
+    all_programs, compatibility_scores, next_cursor = get_programs_compatibility(
         tipo_filter=tipo_filter,
         organizacion_filter=organizacion_filter,
         estado_filter=estado_filter,
         enfoque_inclusivo=enfoque_inclusivo_filter,
-        preferencia_filter=request.args.get('preferencia', None)
+        preferencia_filter=request.args.get('preferencia', None),
+        cursor=request.args.get('cursor', None),
+        orden=orden,
+        busqueda=request.args.get('q', None)
     )
 
+    # Enlaces de paginación que conservan los filtros actuales
+    filter_args = {key: value for key, value in request.args.items() if key != 'cursor' and value}
+    next_page_url = url_for('main.programs', cursor=next_cursor, **filter_args) if next_cursor else None
+    first_page_url = url_for('main.programs', **filter_args) if request.args.get('cursor') else None
+
     return render_template('programs.html',
                            programs=all_programs,
                            compatibility_scores=compatibility_scores,
@@ -40,7 +53,9 @@ def programs():
                            discapacidades_filter_options=discapacidades,
                            preferencias_filter_options=preferencias_filter_options,
                            estados=estados,
-                           current_filters=request.args)
+                           current_filters=request.args,
+                           next_page_url=next_page_url,
+                           first_page_url=first_page_url)
 
 @main_bp.route('/help')
 def help_page():
@@ -0,0 +1,148 @@
+"""
+Prueba de carga del canal del chat (`chat_message` → `chat_response`).
+
+Conecta N clientes simulados (python-socketio) y cada uno envía mensajes a una tasa fija durante un tiempo
+(carga abierta: el siguiente mensaje sale a su hora aunque la respuesta anterior no haya llegado). Cada
+mensaje lleva un `id` que el servidor devuelve en la respuesta, así que el tiempo de ida y vuelta se mide por
+mensaje aunque las respuestas lleguen desordenadas. Informa:
+- tiempo de establecimiento de las conexiones (p50/p95/p99/máx) y conexiones fallidas;
+- mensajes enviados, respondidos y perdidos (sin respuesta tras el drenaje o que no se pudieron enviar);
+- ida y vuelta p50/p95/p99/máx y respuestas por segundo.
+
+Sin `--url` levanta la aplicación en este mismo proceso (modo threading, puerto libre), lo que basta para
+comparar cambios en `handle_chat_message`; los clientes y el servidor comparten el GIL, así que para medir un
+modo asíncrono o la capacidad de un worker conviene levantar el servidor aparte (ver wsgi.py) y pasar `--url`.
+
+Uso:
+    python -m database.benchmark_chat [--url http://127.0.0.1:8001] [--clientes 50] [--tasa 1]
+                                      [--duracion 10] [--tanda 25] [--transporte polling|websocket]
+"""
+import argparse
+import itertools
+import logging
+import random
+import socket
+import threading
+import time
+
+from database.benchmark_socketio import ClienteBenchmark, conectar_clientes, percentiles
+
+# Mezcla de consultas: intenciones fijas y preguntas que pasan por el índice del catálogo
+CONSULTAS = (
+    'hola',
+    '¿cómo me registro?',
+    'busco voluntariado de educación en Lima',
+    '¿qué actividades son accesibles para personas con discapacidad visual?',
+    'quiero ayudar con el medio ambiente los fines de semana',
+    'gracias',
+)
+
+
+class ClienteChat(ClienteBenchmark):
+    """Cliente que envía mensajes al chat a una tasa fija y mide el tiempo hasta su respuesta."""
+
+    def __init__(self, url, transportes):
+        super().__init__(url, transportes)
+        self._lock = threading.Lock()
+        self.pendientes = {}  # id -> instante de envío
+        self.ida_vuelta = []
+        self.enviados = 0
+        self.fallos_envio = 0
+        self.sio.on('chat_response', self._al_responder)
+
+    def _al_responder(self, datos):
+        with self._lock:
+            enviado = self.pendientes.pop(datos.get('id'), None)
+        if enviado is not None:
+            self.ida_vuelta.append((time.perf_counter() - enviado) * 1000)
+
+    def enviar(self, tasa, duracion, consultas):
+        """Envía mensajes cada 1/tasa segundos (con desfase aleatorio) hasta agotar la duración."""
+        periodo = 1.0 / tasa
+        inicio = time.perf_counter() + random.uniform(0, periodo)
+        fin = inicio + duracion
+        for n in itertools.count():
+            momento = inicio + n * periodo
+            if momento >= fin:
+                break
+            time.sleep(max(0.0, momento - time.perf_counter()))
+            with self._lock:
+                self.pendientes[n] = time.perf_counter()
+            try:
+                self.sio.emit('chat_message', {'query': consultas[n % len(consultas)], 'id': n})
+                self.enviados += 1
+            except Exception:
+                with self._lock:
+                    self.pendientes.pop(n, None)
+                self.fallos_envio += 1
+
+
+def iniciar_servidor_local():
+    """Levanta la aplicación (modo threading) en un puerto libre de este proceso y devuelve su URL."""
+    from main import app, socketio
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        puerto = s.getsockname()[1]
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    threading.Thread(target=socketio.run, args=(app,), name='servidor-benchmark', daemon=True,
+                     kwargs={'host': '127.0.0.1', 'port': puerto, 'debug': False, 'use_reloader': False,
+                             'allow_unsafe_werkzeug': True}).start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return f'http://127.0.0.1:{puerto}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del chat por Socket.IO.")
+    parser.add_argument('--url', action='append', help='URL de una instancia (se puede repetir); sin ella se '
+                                                        'levanta la aplicación en este proceso.')
+    parser.add_argument('--clientes', type=int, default=50)
+    parser.add_argument('--tasa', type=float, default=1.0, help='Mensajes por segundo de cada cliente.')
+    parser.add_argument('--duracion', type=float, default=10.0, help='Segundos enviando mensajes.')
+    parser.add_argument('--drenaje', type=float, default=10.0,
+                        help='Segundos de espera a las respuestas pendientes; después se cuentan como perdidas.')
+    parser.add_argument('--tanda', type=int, default=25, help='Conexiones concurrentes por tanda.')
+    parser.add_argument('--transporte', choices=('polling', 'websocket'), default=None,
+                        help='Forzar un transporte (por defecto polling con mejora a websocket).')
+    args = parser.parse_args()
+    urls = args.url or [iniciar_servidor_local()]
+    transportes = [args.transporte] if args.transporte else None
+
+    clientes, tiempos, errores = conectar_clientes(urls, args.clientes, args.tanda, transportes, clase=ClienteChat)
+    p50, p95, p99, maximo = percentiles(tiempos)
+    print(f"Conexiones: {len(clientes)}/{args.clientes}; establecimiento p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+          f"p99 {p99:.1f} ms, máx {maximo:.1f} ms.")
+    if errores:
+        print(f"  {len(errores)} fallidas; primer error: {errores[0]}")
+
+    hilos = [threading.Thread(target=c.enviar, args=(args.tasa, args.duracion, CONSULTAS), daemon=True)
+             for c in clientes]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    limite = time.monotonic() + args.drenaje
+    while time.monotonic() < limite and any(c.pendientes for c in clientes):
+        time.sleep(0.05)
+    total = time.perf_counter() - inicio
+
+    enviados = sum(c.enviados for c in clientes)
+    ida_vuelta = [ms for c in clientes for ms in c.ida_vuelta]
+    perdidos = sum(len(c.pendientes) + c.fallos_envio for c in clientes)
+    p50, p95, p99, maximo = percentiles(ida_vuelta)
+    print(f"Mensajes: {enviados} enviados, {len(ida_vuelta)} respondidos, {perdidos} perdidos "
+          f"({len(ida_vuelta) / total:.1f} respuestas/s).")
+    print(f"Ida y vuelta: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, máx {maximo:.1f} ms.")
+
+    for cliente in clientes:
+        cliente.desconectar()
+
+
+if __name__ == '__main__':
+    main()
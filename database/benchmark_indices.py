@@ -0,0 +1,168 @@
+"""
+Benchmark de los índices de consultas frecuentes (migración 8b5e0d4a6c13).
+
+Crea una base SQLite temporal con datos sintéticos (`database.datos_sinteticos`), mide las consultas calientes de
+`program_controller`, `dashboard_routes`, `enrollment_service` y `recommendation_service` sin los
+índices secundarios, crea los índices (los mismos que declaran los modelos) y vuelve a medir.
+
+Uso:
+    python -m database.benchmark_indices [--actividades 50000] [--usuarios 20000]
+                                         [--inscripciones 400000] [--repeticiones 30] [--planes]
+
+Con `--planes` se muestra además el plan de ejecución (`EXPLAIN QUERY PLAN`) de cada consulta.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from database.datos_sinteticos import FECHA_BASE, PREFERENCIAS_BASE, generar_datos_sinteticos
+from database.db import db
+import model.models  # noqa: F401  (registra las tablas en la metadata)
+
+ETIQUETAS = [nombre for nombre, _ in PREFERENCIAS_BASE]
+
+# (nombre, SQL, generador de parámetros). Reproducen los filtros y órdenes de las rutas y servicios
+# (el catálogo por fecha lee primero el tramo de actividades con fecha, ver `_page_by_date`).
+CONSULTAS = (
+    ('catalogo: abiertos por fecha',
+     "SELECT id_actividad FROM actividades WHERE estado = 'abierto' "
+     "AND fecha_actividad IS NOT NULL ORDER BY fecha_actividad, id_actividad LIMIT 13",
+     lambda rnd, n: {}),
+    ('catalogo: tipo + estado',
+     "SELECT id_actividad FROM actividades WHERE estado = 'abierto' AND tipo = :tipo "
+     "AND fecha_actividad IS NOT NULL ORDER BY fecha_actividad, id_actividad LIMIT 13",
+     lambda rnd, n: {'tipo': rnd.choice(['presencial', 'virtual'])}),
+    ('catalogo: etiqueta (preferencia) + estado',
+     "SELECT id_actividad FROM actividades WHERE etiqueta = :etiqueta AND estado = 'abierto' "
+     "AND fecha_actividad IS NOT NULL ORDER BY fecha_actividad, id_actividad LIMIT 13",
+     lambda rnd, n: {'etiqueta': rnd.choice(ETIQUETAS)}),
+    ('catalogo: enfoque inclusivo',
+     "SELECT a.id_actividad FROM actividades a JOIN actividad_discapacidad ad ON ad.actividad_id = a.id_actividad "
+     "WHERE ad.discapacidad_id = :discapacidad AND a.estado = 'abierto' LIMIT 13",
+     lambda rnd, n: {'discapacidad': rnd.randint(1, 3)}),
+    ('panel organizador: actividades por fecha',
+     "SELECT id_actividad FROM actividades WHERE id_organizacion = :org ORDER BY fecha_actividad DESC",
+     lambda rnd, n: {'org': rnd.randint(1, n['organizaciones'])}),
+    ('panel voluntario: inscripciones por fecha',
+     "SELECT i.id_inscripcion, a.nombre FROM inscripciones i JOIN actividades a ON a.id_actividad = i.id_actividad "
+     "WHERE i.id_usuario = :usuario AND i.estado_inscripcion != 'cancelada' ORDER BY i.fecha_inscripcion DESC",
+     lambda rnd, n: {'usuario': rnd.randint(1, n['usuarios'])}),
+    ('lista de espera: siguiente en espera',
+     "SELECT id_inscripcion FROM inscripciones WHERE id_actividad = :actividad AND estado_inscripcion = 'en_espera' "
+     "ORDER BY fecha_inscripcion, id_inscripcion LIMIT 1",
+     lambda rnd, n: {'actividad': rnd.randint(1, n['actividades'])}),
+    ('recuento de inscritos confirmados',
+     "SELECT COUNT(id_inscripcion) FROM inscripciones WHERE id_actividad = :actividad AND estado_inscripcion = 'confirmada'",
+     lambda rnd, n: {'actividad': rnd.randint(1, n['actividades'])}),
+    ('recomendaciones del voluntario',
+     "SELECT id_actividad FROM recomendaciones WHERE id_usuario = :usuario AND tipo_recomendacion = 'P' "
+     "ORDER BY score DESC LIMIT 10",
+     lambda rnd, n: {'usuario': rnd.randint(1, n['usuarios'])}),
+    ('gestion de usuarios: perfil + estado',
+     "SELECT id_usuario FROM usuarios WHERE perfil = 'voluntario' AND estado_usuario = 'activo' AND id_usuario > :despues "
+     "ORDER BY id_usuario LIMIT 51",
+     lambda rnd, n: {'despues': rnd.randint(0, n['usuarios'])}),
+)
+
+
+def _indices_secundarios():
+    """Índices `ix_*` declarados en los modelos (los que crea la migración)."""
+    return [index for table in db.metadata.sorted_tables for index in table.indexes if index.name.startswith('ix_')]
+
+
+def _poblar(engine, n, seed):
+    """Inserta datos sintéticos con el generador de `seed-synthetic` y recomendaciones aleatorias."""
+    with engine.begin() as conn:
+        generar_datos_sinteticos(conn, n['usuarios'], n['actividades'], n['inscripciones'],
+                                 organizaciones=n['organizaciones'], seed=seed, contrasena_hash='x')
+        rnd = random.Random(seed)
+        filas = [{'id_usuario': u, 'id_actividad': rnd.randint(1, n['actividades']), 'tipo_recomendacion': 'P',
+                  'score': round(rnd.random(), 4), 'fecha': FECHA_BASE}
+                 for u in range(1, n['usuarios'] + 1) for _ in range(10)]
+        for i in range(0, len(filas), 10000):
+            conn.execute(db.metadata.tables['recomendaciones'].insert(), filas[i:i + 10000])
+
+
+def _medir(engine, repeticiones, n, seed):
+    """Devuelve {consulta: mediana en ms} ejecutando cada consulta con parámetros aleatorios."""
+    resultados = {}
+    with engine.connect() as conn:
+        for nombre, sql, parametros in CONSULTAS:
+            rnd = random.Random(seed)
+            stmt = text(sql)
+            conn.execute(stmt, parametros(rnd, n)).fetchall()  # calentamiento de la caché de páginas
+            tiempos = []
+            for _ in range(repeticiones):
+                params = parametros(rnd, n)
+                inicio = time.perf_counter()
+                conn.execute(stmt, params).fetchall()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = statistics.median(tiempos)
+    return resultados
+
+
+def _planes(engine, n, seed):
+    with engine.connect() as conn:
+        for nombre, sql, parametros in CONSULTAS:
+            plan = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), parametros(random.Random(seed), n)).fetchall()
+            print(f"  {nombre}:")
+            for row in plan:
+                print(f"      {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide las consultas frecuentes antes y después de crear los índices.")
+    parser.add_argument('--actividades', type=int, default=50000)
+    parser.add_argument('--usuarios', type=int, default=20000)
+    parser.add_argument('--organizaciones', type=int, default=200)
+    parser.add_argument('--inscripciones', type=int, default=400000)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--planes', action='store_true', help='Muestra los planes de ejecución después de crear los índices.')
+    args = parser.parse_args()
+    n = {'actividades': args.actividades, 'usuarios': args.usuarios, 'organizaciones': args.organizaciones,
+         'inscripciones': min(args.inscripciones, args.usuarios * args.actividades)}
+
+    with tempfile.TemporaryDirectory() as directorio:
+        engine = create_engine(f"sqlite:///{os.path.join(directorio, 'benchmark.db')}")
+        db.metadata.create_all(engine)
+        indices = _indices_secundarios()
+        for index in indices:
+            index.drop(engine)
+
+        inicio = time.perf_counter()
+        _poblar(engine, n, args.seed)
+        print(f"Datos sintéticos: {n['actividades']} actividades, {n['usuarios']} usuarios, "
+              f"{n['inscripciones']} inscripciones ({time.perf_counter() - inicio:.1f} s).")
+
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        antes = _medir(engine, args.repeticiones, n, args.seed)
+
+        inicio = time.perf_counter()
+        for index in indices:
+            index.create(engine)
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        print(f"{len(indices)} índices creados en {time.perf_counter() - inicio:.1f} s.\n")
+        despues = _medir(engine, args.repeticiones, n, args.seed)
+
+        ancho = max(len(nombre) for nombre, _, _ in CONSULTAS)
+        print(f"{'Consulta':<{ancho}}  {'Antes (ms)':>11}  {'Después (ms)':>13}  {'Mejora':>8}")
+        for nombre, _, _ in CONSULTAS:
+            mejora = antes[nombre] / despues[nombre] if despues[nombre] else float('inf')
+            print(f"{nombre:<{ancho}}  {antes[nombre]:>11.3f}  {despues[nombre]:>13.3f}  {mejora:>7.1f}x")
+
+        if args.planes:
+            print("\nPlanes de ejecución con los índices:")
+            _planes(engine, n, args.seed)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark de capacidad de conexiones de Socket.IO por proceso y de difusión a través del backplane.
+
+Conecta N clientes (python-socketio) en tandas, repartidos entre una o varias instancias de la aplicación,
+los mantiene conectados un tiempo y mide:
+- conexiones logradas y fallidas, y el tiempo de establecimiento (p50/p95/máx);
+- conexiones que siguen vivas al final de la espera;
+- con `--cola`, entrega de un evento difundido desde fuera (gestor de solo escritura del backplane): cuántos
+  clientes lo reciben, en todas las instancias, y en cuánto tiempo.
+
+Uso (con la aplicación ya levantada, ver wsgi.py):
+    python -m database.benchmark_socketio --url http://127.0.0.1:8001 [--url http://127.0.0.1:8002]
+                                          [--clientes 200] [--tanda 25] [--espera 5]
+                                          [--transporte polling|websocket] [--cola local://127.0.0.1:6390]
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+from services.socketio_backplane import gestor_externo
+
+EVENTO_DIFUSION = 'benchmark_difusion'
+
+
+def percentiles(valores):
+    """Devuelve (p50, p95, p99, máximo) de una lista de valores (en la misma unidad)."""
+    if not valores:
+        return (0.0, 0.0, 0.0, 0.0)
+    if len(valores) == 1:
+        return (valores[0],) * 4
+    cortes = statistics.quantiles(valores, n=100, method='inclusive')
+    return cortes[49], cortes[94], cortes[98], max(valores)
+
+
+class ClienteBenchmark:
+    """Cliente simulado: conecta y anota la llegada del evento de difusión."""
+
+    def __init__(self, url, transportes):
+        self.url = url
+        self.transportes = transportes
+        self.sio = socketio.Client(reconnection=False)
+        self.recibido = threading.Event()
+        self.latencia_difusion = None
+        self.sio.on(EVENTO_DIFUSION, self._al_difundir)
+
+    def _al_difundir(self, datos):
+        self.latencia_difusion = (time.time() - datos['enviado']) * 1000
+        self.recibido.set()
+
+    def conectar(self, timeout):
+        inicio = time.perf_counter()
+        self.sio.connect(self.url, transports=self.transportes, wait_timeout=timeout)
+        return (time.perf_counter() - inicio) * 1000
+
+    def desconectar(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+
+def conectar_clientes(urls, n, tanda, transportes, timeout=10, clase=ClienteBenchmark):
+    """Conecta n clientes en tandas concurrentes; devuelve (clientes conectados, tiempos en ms, errores)."""
+    clientes, tiempos, errores = [], [], []
+    with ThreadPoolExecutor(max_workers=tanda) as pool:
+        for inicio in range(0, n, tanda):
+            lote = [clase(urls[i % len(urls)], transportes) for i in range(inicio, min(n, inicio + tanda))]
+            for cliente, futuro in [(c, pool.submit(c.conectar, timeout)) for c in lote]:
+                try:
+                    tiempos.append(futuro.result())
+                    clientes.append(cliente)
+                except Exception as e:
+                    errores.append(str(e))
+    return clientes, tiempos, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide conexiones simultáneas de Socket.IO y la difusión del backplane.")
+    parser.add_argument('--url', action='append', help='URL de una instancia (se puede repetir).')
+    parser.add_argument('--clientes', type=int, default=200)
+    parser.add_argument('--tanda', type=int, default=25, help='Conexiones concurrentes por tanda.')
+    parser.add_argument('--espera', type=float, default=5.0, help='Segundos que se mantienen las conexiones.')
+    parser.add_argument('--transporte', choices=('polling', 'websocket'), default=None,
+                        help='Forzar un transporte (por defecto polling con mejora a websocket).')
+    parser.add_argument('--cola', default=None, help='URL del backplane para difundir un evento a todos los clientes.')
+    parser.add_argument('--canal', default='konectai-socketio', help='Canal del backplane (SOCKETIO_CHANNEL).')
+    args = parser.parse_args()
+    urls = args.url or ['http://127.0.0.1:5000']
+    transportes = [args.transporte] if args.transporte else None
+
+    inicio = time.perf_counter()
+    clientes, tiempos, errores = conectar_clientes(urls, args.clientes, args.tanda, transportes)
+    total = time.perf_counter() - inicio
+    p50, p95, _, maximo = percentiles(tiempos)
+    print(f"Conexiones: {len(clientes)}/{args.clientes} en {total:.1f} s ({len(urls)} instancia(s)); "
+          f"establecimiento p50 {p50:.1f} ms, p95 {p95:.1f} ms, máx {maximo:.1f} ms.")
+    if errores:
+        print(f"  {len(errores)} fallidas; primer error: {errores[0]}")
+
+    time.sleep(args.espera)
+    vivas = sum(1 for cliente in clientes if cliente.sio.connected)
+    print(f"Tras {args.espera:.0f} s siguen conectados {vivas}/{len(clientes)}.")
+
+    if args.cola:
+        gestor_externo(args.cola, args.canal).emit(EVENTO_DIFUSION, {'enviado': time.time()})
+        limite = time.monotonic() + 10
+        for cliente in clientes:
+            cliente.recibido.wait(max(0.0, limite - time.monotonic()))
+        latencias = [c.latencia_difusion for c in clientes if c.latencia_difusion is not None]
+        p50, p95, p99, maximo = percentiles(latencias)
+        print(f"Difusión por el backplane: {len(latencias)}/{len(clientes)} clientes; "
+              f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, máx {maximo:.1f} ms.")
+
+    for cliente in clientes:
+        cliente.desconectar()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from datetime import datetime, date, timezone, timedelta
 from werkzeug.security import generate_password_hash
 from database.db import db
+from services.enrollment_service import recalcular_inscritos
 from model.models import Usuarios, Organizaciones, Preferencias, Discapacidades, Facilidad, Actividades, UsuarioDiscapacidad, Inscripciones, EstadoActividad
 
 # Define peru_tz
@@ -295,4 +296,6 @@ def seed_data():
             print("No se pudieron agregar inscripciones predefinidas")
     # Guardar Commit
     db.session.commit()
+    # Las inscripciones iniciales se insertan directamente: sincronizar el contador de cupos
+    recalcular_inscritos()
     print("Datos iniciales agregados a la base de datos.")
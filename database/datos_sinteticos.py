@@ -0,0 +1,328 @@
+"""
+Generador de datos sintéticos a gran escala (comando `flask seed-synthetic`).
+
+Genera voluntarios, organizadores, organizaciones, preferencias y discapacidades de los usuarios,
+actividades (con sus discapacidades y facilidades), inscripciones y feedback con inserciones masivas
+de SQLAlchemy Core (`executemany` en bloques de `tam_bloque` filas), sin instancias ORM ni consultas
+por fila. Los identificadores se asignan en memoria a continuación de los existentes, de modo que las
+relaciones se enlazan sin leer nada de vuelta y el generador puede ejecutarse sobre una base ya poblada.
+
+Con la misma semilla y los mismos tamaños, el resultado es idéntico (las fechas parten de una fecha base
+fija, no de la hora actual).
+
+Como las inserciones no pasan por el ORM, no se disparan los eventos de SQLAlchemy: quien llama debe
+recalcular los contadores y reconstruir los índices derivados (ver `seed-synthetic` en main.py).
+"""
+import bisect
+import itertools
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from database.db import db
+import model.models  # noqa: F401  (registra las tablas en la metadata)
+
+# Contraseña común de todos los usuarios sintéticos (se calcula un único hash por ejecución)
+CONTRASENA_SINTETICA = 'Sintetico123'
+
+# Fecha base de las fechas generadas
+FECHA_BASE = datetime(2025, 6, 1, 8, 0)
+
+# Catálogos que se crean si la base está vacía (los mismos que `seed_data`)
+PREFERENCIAS_BASE = (
+    ("Niños y Adolescentes", "Trabajar con niños y adolescentes"),
+    ("Educación y formación", "Actividades educativas"),
+    ("Ambiente y sostenibilidad", "Actividades ambientales"),
+    ("Deporte y recreación", "Actividades deportivas"),
+)
+DISCAPACIDADES_BASE = (
+    ("Auditiva", "Dificultad o imposibilidad de usar el sentido del oído"),
+    ("Visual", "Dificultad o imposibilidad de usar el sentido de la vista"),
+    ("Motriz", "Dificultad o imposibilidad de moverse o desplazarse"),
+)
+FACILIDADES_BASE = (
+    ("Rampas", "Acceso con rampas para sillas de ruedas"),
+    ("Intérpretes", "Intérpretes de lengua de señas disponibles"),
+    ("Material braille", "Material disponible en sistema braille"),
+    ("Materiales en audio", "Material accesible en audio"),
+    ("Otros", "Otros o ninguno"),
+)
+
+NOMBRES_F = ("Ana", "María", "Lucía", "Sofía", "Valeria", "Camila", "Rosa", "Carmen", "Elena", "Patricia",
+             "Daniela", "Gabriela", "Andrea", "Fernanda", "Isabel", "Julia", "Natalia", "Paola", "Claudia", "Milagros")
+NOMBRES_M = ("Carlos", "Luis", "Javier", "Pedro", "José", "Miguel", "Jorge", "Diego", "Andrés", "Fernando",
+             "Ricardo", "Manuel", "Raúl", "Sebastián", "Mateo", "Alonso", "Renzo", "Gonzalo", "Víctor", "Hugo")
+APELLIDOS = ("García", "Rodríguez", "Quispe", "Flores", "Sánchez", "Ramírez", "Torres", "Mendoza", "Huamán",
+             "Vargas", "Castillo", "Rojas", "Chávez", "Díaz", "Gutiérrez", "Mamani", "Ruiz", "Espinoza", "Salazar",
+             "Paredes", "Cárdenas", "Vega", "Ccori", "Condori", "Palomino", "Aguilar", "Reyes", "Medina")
+CIUDADES = ("Lima", "Arequipa", "Cusco", "Trujillo", "Piura", "Chiclayo", "Iquitos", "Huancayo", "Puno", "Tacna")
+VIAS = ("Av. Arequipa", "Av. Brasil", "Jr. de la Unión", "Calle Los Olivos", "Av. La Marina", "Jr. Amazonas",
+        "Av. Grau", "Calle Las Flores", "Av. El Sol", "Jr. Junín")
+PREFIJOS_ORG = ("Fundación", "Asociación", "Red", "Colectivo", "Voluntariado", "ONG", "Comunidad")
+LEMAS_ORG = ("Manos Solidarias", "Futuro Verde", "Sonrisas", "Inclusión Activa", "Aprender Juntos", "Vida Sana",
+             "Corazones Unidos", "Tierra Viva", "Puentes", "Nuevo Horizonte")
+
+# Plantillas de actividades por etiqueta (nombre corto de la preferencia): (títulos, habilidades)
+PLANTILLAS_ACTIVIDAD = {
+    "Niños y Adolescentes": (("Taller de lectura infantil", "Apoyo escolar para adolescentes", "Tarde de juegos",
+                              "Campamento de verano", "Cuentacuentos en el albergue"),
+                             "Paciencia, trabajo con niños, creatividad"),
+    "Educación y formación": (("Alfabetización digital", "Clases de matemáticas", "Taller de oratoria",
+                               "Tutoría universitaria", "Curso de emprendimiento"),
+                              "Docencia, comunicación, planificación"),
+    "Ambiente y sostenibilidad": (("Limpieza de playa", "Reforestación", "Campaña de reciclaje",
+                                   "Huerto comunitario", "Monitoreo de aves"),
+                                  "Trabajo en equipo, resistencia física, conciencia ambiental"),
+    "Deporte y recreación": (("Maratón solidaria", "Escuela de fútbol", "Olimpiadas inclusivas",
+                              "Caminata familiar", "Torneo de vóley"),
+                             "Organización de eventos, primeros auxilios, deporte"),
+}
+PLANTILLA_GENERICA = (("Jornada solidaria", "Colecta de alimentos", "Visita al asilo", "Feria comunitaria"),
+                      "Empatía, responsabilidad, trabajo en equipo")
+DESCRIPCIONES = ("Buscamos voluntarios comprometidos para {actividad} en {ciudad}.",
+                 "Actividad de {actividad} dirigida a la comunidad de {ciudad}. Se brindará capacitación previa.",
+                 "Únete a {actividad} en {ciudad} y contribuye a un cambio positivo.",
+                 "{actividad} en {ciudad}: se requieren voluntarios puntuales y con ganas de aprender.")
+COMENTARIOS = {1: ("Mala organización.", "No se cumplió lo anunciado."),
+               2: ("Faltó coordinación.", "Esperaba más apoyo de los organizadores."),
+               3: ("Estuvo bien, se puede mejorar.", "Experiencia correcta."),
+               4: ("Muy buena experiencia.", "Buen equipo de trabajo."),
+               5: ("¡Excelente actividad!", "Repetiría sin dudarlo.", "Muy bien organizada y gratificante.")}
+
+# Pesos de los valores categóricos
+ESTADOS_ACTIVIDAD = (('abierto', 60), ('cerrado', 10), ('finalizada', 25), ('cancelada', 5))
+ESTADOS_USUARIO = (('activo', 90), ('inactivo', 7), ('suspendido', 2), ('bloqueado', 1))
+PUNTUACIONES = ((1, 3), (2, 5), (3, 15), (4, 37), (5, 40))
+
+# Proporciones
+PROPORCION_ORGANIZADORES = 0.05
+PROPORCION_DISCAPACIDAD = 0.12
+PROPORCION_INCLUSIVAS = 0.3
+PROPORCION_CANCELADAS = 0.05
+PROPORCION_FEEDBACK = 0.35
+
+
+def _elegir(rnd, opciones):
+    valores, pesos = zip(*opciones)
+    return rnd.choices(valores, weights=pesos)[0]
+
+
+def _insertar(conn, tabla, filas, tam_bloque):
+    """Inserta las filas de un iterable en bloques con `executemany`; devuelve el total insertado."""
+    table = db.metadata.tables[tabla]
+    total = 0
+    while True:
+        bloque = list(itertools.islice(filas, tam_bloque))
+        if not bloque:
+            return total
+        conn.execute(table.insert(), bloque)
+        total += len(bloque)
+
+
+def _siguiente_id(conn, tabla, columna):
+    return (conn.execute(select(func.max(db.metadata.tables[tabla].c[columna]))).scalar() or 0) + 1
+
+
+def _asegurar_catalogo(conn, tabla, columna_nombre, columna_descripcion, valores):
+    """Crea el catálogo con los valores base si está vacío y devuelve {id: nombre}."""
+    table = db.metadata.tables[tabla]
+    pk = list(table.primary_key.columns)[0]
+    if conn.execute(select(func.count()).select_from(table)).scalar() == 0:
+        conn.execute(table.insert(), [{columna_nombre: nombre, columna_descripcion: descripcion}
+                                      for nombre, descripcion in valores])
+    return {row[0]: row[1] for row in conn.execute(select(pk, table.c[columna_nombre]).order_by(pk))}
+
+
+def _sincronizar_secuencias(conn, tablas):
+    """En PostgreSQL, avanza las secuencias de las claves primarias tras insertar IDs explícitos."""
+    if conn.dialect.name != 'postgresql':
+        return
+    for tabla, columna in tablas:
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{tabla}', '{columna}'), "
+                          f"COALESCE((SELECT MAX({columna}) FROM {tabla}), 1))"))
+
+
+def generar_datos_sinteticos(conn, usuarios, actividades, inscripciones, organizaciones=None, seed=42,
+                             tam_bloque=10000, contrasena_hash=None):
+    """
+    Genera e inserta datos sintéticos en la conexión indicada (no confirma la transacción).
+
+    Args:
+        conn: Conexión de SQLAlchemy (por ejemplo `db.engine.begin()`).
+        usuarios (int): Usuarios a crear (voluntarios y un 5 % de organizadores).
+        actividades (int): Actividades a crear.
+        inscripciones (int): Inscripciones a crear, repartidas entre los voluntarios nuevos (como máximo una
+                             por par voluntario-actividad, así que se limita a voluntarios x actividades).
+        organizaciones (int, optional): Organizaciones a crear. Por defecto una por cada 50 actividades.
+        seed (int): Semilla del generador pseudoaleatorio.
+        tam_bloque (int): Filas por sentencia `executemany`.
+        contrasena_hash (str, optional): Hash de contraseña de los usuarios; por defecto el de
+                                         CONTRASENA_SINTETICA.
+
+    Returns:
+        dict: Filas insertadas por tabla y rangos de IDs creados ('ids_usuarios', 'ids_actividades').
+    """
+    rnd = random.Random(seed)
+    organizaciones = organizaciones if organizaciones is not None else max(1, actividades // 50)
+    if contrasena_hash is None:
+        contrasena_hash = generate_password_hash(CONTRASENA_SINTETICA)
+
+    preferencias = _asegurar_catalogo(conn, 'preferencias', 'nombre_corto', 'descripcion_detallada', PREFERENCIAS_BASE)
+    discapacidades = list(_asegurar_catalogo(conn, 'discapacidades', 'nombre', 'descripcion', DISCAPACIDADES_BASE))
+    facilidades = list(_asegurar_catalogo(conn, 'facilidad', 'nombre_facilidad', 'descripcion', FACILIDADES_BASE))
+    ids_preferencias = list(preferencias)
+
+    primer_org = _siguiente_id(conn, 'organizaciones', 'id_organizacion')
+    primer_usuario = _siguiente_id(conn, 'usuarios', 'id_usuario')
+    primera_actividad = _siguiente_id(conn, 'actividades', 'id_actividad')
+    ids_org = range(primer_org, primer_org + organizaciones)
+    ids_usuarios = range(primer_usuario, primer_usuario + usuarios)
+    ids_actividades = range(primera_actividad, primera_actividad + actividades)
+
+    usuarios_tabla = db.metadata.tables['usuarios']
+    dnis_existentes = {dni for (dni,) in conn.execute(select(usuarios_tabla.c.DNI))}
+    celulares_existentes = {cel for (cel,) in conn.execute(select(usuarios_tabla.c.celular)) if cel}
+    nombres_org_existentes = {nombre for (nombre,) in conn.execute(select(db.metadata.tables['organizaciones'].c.nombre_org))}
+
+    resumen = {}
+
+    # Organizaciones
+    def filas_organizaciones():
+        for id_org in ids_org:
+            nombre = f"{rnd.choice(PREFIJOS_ORG)} {rnd.choice(LEMAS_ORG)} {id_org}"
+            while nombre in nombres_org_existentes:
+                nombre += "'"
+            ciudad = rnd.choice(CIUDADES)
+            yield {'id_organizacion': id_org, 'nombre_org': nombre,
+                   'descripcion_org': f"Organización de voluntariado con sede en {ciudad}.",
+                   'direccion_fisica': f"{rnd.choice(VIAS)} {rnd.randint(100, 2999)}, {ciudad}",
+                   'logo': '♥', 'fecha_registro': FECHA_BASE - timedelta(days=rnd.randint(30, 1500))}
+    resumen['organizaciones'] = _insertar(conn, 'organizaciones', filas_organizaciones(), tam_bloque)
+
+    # Usuarios: el perfil se decide aquí para saber quién es voluntario y quién organizador
+    perfiles = ['organizador' if rnd.random() < PROPORCION_ORGANIZADORES else 'voluntario' for _ in ids_usuarios]
+    voluntarios = [id_usuario for id_usuario, perfil in zip(ids_usuarios, perfiles) if perfil == 'voluntario']
+    organizadores = [id_usuario for id_usuario, perfil in zip(ids_usuarios, perfiles) if perfil == 'organizador']
+    dni_secuencia = itertools.count(20000000 + primer_usuario)
+
+    def filas_usuarios():
+        for id_usuario, perfil in zip(ids_usuarios, perfiles):
+            dni = f"{next(dni_secuencia) % 100000000:08d}"
+            while dni in dnis_existentes:
+                dni = f"{next(dni_secuencia) % 100000000:08d}"
+            celular = f"9{id_usuario % 100000000:08d}"
+            genero = rnd.choice(('masculino', 'femenino'))
+            nombre = rnd.choice(NOMBRES_M if genero == 'masculino' else NOMBRES_F)
+            yield {'id_usuario': id_usuario, 'DNI': dni, 'nombre': nombre,
+                   'apellido': f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+                   'contrasena_hash': contrasena_hash, 'perfil': perfil,
+                   'estado_usuario': _elegir(rnd, ESTADOS_USUARIO),
+                   'fecha_registro': FECHA_BASE - timedelta(minutes=rnd.randint(0, 60 * 24 * 730)),
+                   'celular': None if celular in celulares_existentes else celular,
+                   'email': f"usuario{id_usuario}@sintetico.konectai.pe",
+                   'direccion': f"{rnd.choice(VIAS)} {rnd.randint(100, 2999)}, {rnd.choice(CIUDADES)}",
+                   'fecha_nacimiento': date(1960, 1, 1) + timedelta(days=rnd.randint(0, 365 * 47)),
+                   'genero': genero}
+    resumen['usuarios'] = _insertar(conn, 'usuarios', filas_usuarios(), tam_bloque)
+
+    resumen['usuario_organizacion'] = _insertar(conn, 'usuario_organizacion', (
+        {'usuario_id': id_usuario, 'organizacion_id': rnd.choice(ids_org)} for id_usuario in organizadores), tam_bloque)
+    resumen['usuarios_preferencia'] = _insertar(conn, 'usuarios_preferencia', (
+        {'usuario_id': id_usuario, 'preferencia_id': id_preferencia}
+        for id_usuario in voluntarios
+        for id_preferencia in rnd.sample(ids_preferencias, rnd.randint(1, min(3, len(ids_preferencias))))), tam_bloque)
+    resumen['usuario_discapacidad'] = _insertar(conn, 'usuario_discapacidad', (
+        {'id_usuario': id_usuario, 'id_discapacidad': rnd.choice(discapacidades),
+         'gravedad': rnd.choice(('leve', 'moderada', 'grave')), 'apoyo_requerido': rnd.choice(('interprete', 'otros'))}
+        for id_usuario in voluntarios if rnd.random() < PROPORCION_DISCAPACIDAD), tam_bloque)
+
+    # Actividades: el estado y el cupo se guardan para repartir las inscripciones
+    estados = [_elegir(rnd, ESTADOS_ACTIVIDAD) for _ in ids_actividades]
+    cupos = [rnd.choice((10, 15, 20, 25, 30, 40, 50, 80, 100, 150)) for _ in ids_actividades]
+    inclusivas = [rnd.random() < PROPORCION_INCLUSIVAS for _ in ids_actividades]
+
+    def filas_actividades():
+        for posicion, id_actividad in enumerate(ids_actividades):
+            etiqueta = rnd.choice(list(preferencias.values()))
+            titulos, habilidades = PLANTILLAS_ACTIVIDAD.get(etiqueta, PLANTILLA_GENERICA)
+            ciudad = rnd.choice(CIUDADES)
+            titulo = rnd.choice(titulos)
+            # Las finalizadas quedan en el pasado y las abiertas mayormente en el futuro
+            if estados[posicion] == 'finalizada':
+                dias = -rnd.randint(1, 365)
+            else:
+                dias = rnd.randint(-30, 365)
+            tipo = 'virtual' if rnd.random() < 0.25 else 'presencial'
+            yield {'id_actividad': id_actividad, 'nombre': f"{titulo} en {ciudad}",
+                   'descripcion': rnd.choice(DESCRIPCIONES).format(actividad=titulo.lower(), ciudad=ciudad),
+                   'fecha_actividad': FECHA_BASE + timedelta(days=dias, hours=rnd.randint(0, 10)),
+                   'ubicacion': 'Virtual' if tipo == 'virtual' else f"{rnd.choice(VIAS)} {rnd.randint(100, 2999)}, {ciudad}",
+                   'tipo': tipo, 'habilidades_requeridas': habilidades, 'es_inclusiva': inclusivas[posicion],
+                   'cupo_maximo': cupos[posicion], 'estado': estados[posicion], 'imagen': 'ninguno.jpg',
+                   'inscritos': 0, 'etiqueta': etiqueta, 'id_organizacion': rnd.choice(ids_org)}
+    resumen['actividades'] = _insertar(conn, 'actividades', filas_actividades(), tam_bloque)
+
+    resumen['actividad_discapacidad'] = _insertar(conn, 'actividad_discapacidad', (
+        {'actividad_id': id_actividad, 'discapacidad_id': id_discapacidad}
+        for id_actividad, inclusiva in zip(ids_actividades, inclusivas) if inclusiva
+        for id_discapacidad in rnd.sample(discapacidades, rnd.randint(1, len(discapacidades)))), tam_bloque)
+    resumen['actividad_facilidad'] = _insertar(conn, 'actividad_facilidad', (
+        {'actividad_id': id_actividad, 'facilidad_id': id_facilidad}
+        for id_actividad in ids_actividades
+        for id_facilidad in rnd.sample(facilidades, rnd.randint(0, 2))), tam_bloque)
+
+    # Inscripciones: cada voluntario elige actividades distintas con una popularidad de tipo Zipf (unas
+    # pocas actividades concentran la demanda); se confirman hasta el cupo y el resto queda en espera.
+    # Las fechas crecen con el orden de generación, coherente con el orden de la lista de espera.
+    inscripciones = min(inscripciones, len(voluntarios) * actividades) if voluntarios and actividades else 0
+    pesos = [1.0 / (rango + 1) ** 0.6 for rango in range(actividades)]
+    rnd.shuffle(pesos)
+    acumulados = list(itertools.accumulate(pesos))
+    confirmadas = [0] * actividades
+    feedback = []
+
+    def filas_inscripciones():
+        if not inscripciones:
+            return
+        base, resto = divmod(inscripciones, len(voluntarios))
+        intervalo = timedelta(days=365) / inscripciones
+        fecha = FECHA_BASE - timedelta(days=365)
+        for orden, id_usuario in enumerate(voluntarios):
+            cantidad = base + (1 if orden < resto else 0)
+            elegidas = set()
+            if cantidad > actividades // 2:
+                elegidas.update(rnd.sample(range(actividades), cantidad))
+            while len(elegidas) < cantidad:
+                elegidas.add(bisect.bisect(acumulados, rnd.random() * acumulados[-1]))
+            for posicion in elegidas:
+                if rnd.random() < PROPORCION_CANCELADAS:
+                    estado = 'cancelada'
+                elif confirmadas[posicion] < cupos[posicion]:
+                    estado = 'confirmada'
+                    confirmadas[posicion] += 1
+                    if estados[posicion] == 'finalizada' and rnd.random() < PROPORCION_FEEDBACK:
+                        feedback.append((id_usuario, ids_actividades[posicion]))
+                else:
+                    estado = 'en_espera'
+                fecha += intervalo
+                yield {'id_usuario': id_usuario, 'id_actividad': ids_actividades[posicion],
+                       'estado_inscripcion': estado, 'fecha_inscripcion': fecha}
+    resumen['inscripciones'] = _insertar(conn, 'inscripciones', filas_inscripciones(), tam_bloque)
+
+    def filas_feedback():
+        for id_usuario, id_actividad in feedback:
+            puntuacion = _elegir(rnd, PUNTUACIONES)
+            yield {'id_usuario': id_usuario, 'id_actividad': id_actividad, 'puntuacion': puntuacion,
+                   'comentario': rnd.choice(COMENTARIOS[puntuacion]),
+                   'fecha': FECHA_BASE - timedelta(minutes=rnd.randint(0, 60 * 24 * 30))}
+    resumen['feedback'] = _insertar(conn, 'feedback', filas_feedback(), tam_bloque)
+
+    _sincronizar_secuencias(conn, (('organizaciones', 'id_organizacion'), ('usuarios', 'id_usuario'),
+                                   ('actividades', 'id_actividad'), ('inscripciones', 'id_inscripcion'),
+                                   ('feedback', 'id_feedback'), ('preferencias', 'id_preferencia'),
+                                   ('discapacidades', 'id_discapacidad'), ('facilidad', 'id_facilidad')))
+    resumen['ids_usuarios'] = ids_usuarios
+    resumen['ids_actividades'] = ids_actividades
+    return resumen
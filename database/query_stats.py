@@ -0,0 +1,154 @@
+"""
+Instrumentación de consultas SQL por solicitud.
+
+Usa los eventos `before_cursor_execute`/`after_cursor_execute` de SQLAlchemy para contar y
+cronometrar las consultas que emite cada solicitud (incluidas las cargas perezosas de relaciones
+dentro de bucles, que no se ven en el código de las rutas).
+
+Con `SQL_QUERY_STATS` activo (por defecto, cuando la aplicación está en modo debug):
+- cada respuesta incluye las cabeceras `X-SQL-Query-Count` y `X-SQL-Query-Time-Ms`;
+- cada solicitud se registra en el log, con advertencia si supera el presupuesto de su ruta
+  (ver `presupuesto_consultas`).
+
+Para pruebas, `limite_consultas(n)` falla si un bloque de código emite más de `n` consultas:
+
+    with limite_consultas(14):
+        client.get('/programs')
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app, g, request # Para logging
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Pila de registradores activos en el contexto actual (solicitud y/o bloques `contar_consultas`)
+_recorders = ContextVar('sql_query_recorders', default=())
+
+
+class RegistroConsultas:
+    """Acumula el número, la duración y el texto de las consultas emitidas."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements.append((statement, elapsed))
+
+    @property
+    def total_time_ms(self):
+        return self.total_time * 1000
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _recorders.get():
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorders = _recorders.get()
+    starts = conn.info.get('query_start_time')
+    if not recorders or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for recorder in recorders:
+        recorder.record(statement, elapsed)
+
+
+@contextmanager
+def contar_consultas():
+    """
+    Cuenta las consultas emitidas dentro del bloque.
+
+    Yields:
+        RegistroConsultas: El registro, que se sigue actualizando hasta salir del bloque.
+    """
+    recorder = RegistroConsultas()
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+@contextmanager
+def limite_consultas(max_queries):
+    """
+    Helper de pruebas: lanza AssertionError si el bloque emite más de `max_queries` consultas.
+
+    El mensaje incluye las consultas emitidas para identificar cargas perezosas o consultas N+1.
+    """
+    with contar_consultas() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        detalle = '\n'.join(f"  {statement}" for statement, _ in recorder.statements)
+        raise AssertionError(f"Se esperaban como máximo {max_queries} consultas SQL y se emitieron {recorder.count}:\n{detalle}")
+
+
+def presupuesto_consultas(max_queries):
+    """
+    Decorador que fija el presupuesto de consultas de una ruta.
+
+    Con `SQL_QUERY_STATS` activo, las solicitudes que lo superan se registran como advertencia y
+    la respuesta incluye la cabecera `X-SQL-Query-Budget`.
+    """
+    def decorator(view):
+        # `functools.wraps` (p. ej. en `login_required`) copia el atributo a las funciones envolventes
+        view.presupuesto_consultas = max_queries
+        return view
+    return decorator
+
+
+def _stats_enabled():
+    # None (valor por defecto) sigue el modo debug, que puede activarse después de crear la app (socketio.run(debug=True))
+    enabled = current_app.config.get('SQL_QUERY_STATS')
+    return current_app.debug if enabled is None else enabled
+
+
+def init_query_stats(app):
+    """Registra los hooks de solicitud que miden las consultas cuando `SQL_QUERY_STATS` está activo."""
+    app.config.setdefault('SQL_QUERY_STATS', None)
+
+    @app.before_request
+    def _start_query_stats():
+        if not _stats_enabled():
+            return
+        g.sql_query_recorder = RegistroConsultas()
+        g.sql_query_token = _recorders.set(_recorders.get() + (g.sql_query_recorder,))
+
+    @app.after_request
+    def _report_query_stats(response):
+        recorder = g.get('sql_query_recorder')
+        if recorder is None:
+            return response
+        response.headers['X-SQL-Query-Count'] = str(recorder.count)
+        response.headers['X-SQL-Query-Time-Ms'] = f"{recorder.total_time_ms:.1f}"
+
+        view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+        budget = getattr(view, 'presupuesto_consultas', None)
+        if budget is not None:
+            response.headers['X-SQL-Query-Budget'] = str(budget)
+        if budget is not None and recorder.count > budget:
+            current_app.logger.warning(f"{request.method} {request.path}: {recorder.count} consultas SQL "
+                                       f"({recorder.total_time_ms:.1f} ms) superan el presupuesto de {budget}.")
+        else:
+            current_app.logger.info(f"{request.method} {request.path}: {recorder.count} consultas SQL "
+                                    f"({recorder.total_time_ms:.1f} ms).")
+        return response
+
+    @app.teardown_request
+    def _stop_query_stats(exc):
+        token = g.pop('sql_query_token', None)
+        if token is not None:
+            try:
+                _recorders.reset(token)
+            except ValueError:
+                # El token se creó en otro contexto (p. ej. otro hilo); basta con descartarlo
+                pass
@@ -1,16 +1,32 @@
 import os
-from flask import Flask, send_from_directory
-from flask_socketio import SocketIO, emit
+import time
+import click
+from flask import Flask, send_from_directory, url_for
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from sqlalchemy import inspect
 from database.db import db, init_app
+from database.query_stats import init_query_stats
 from controller.routes import main_bp
 from controller.auth_routes import auth_bp
 from controller.dashboard_routes import dashboard_bp
 from controller.program_controller import program_bp
-from flask_login import LoginManager
+from flask_login import LoginManager, current_user
 from flask_migrate import Migrate
 from model.models import Usuarios
 from database.datos_iniciales import seed_data
+from database.datos_sinteticos import CONTRASENA_SINTETICA, generar_datos_sinteticos
+from services.activity_index_service import rebuild_activity_index
+from services.recommendation_service import generar_recomendaciones
+from services.enrollment_service import recalcular_inscritos
+from services.search_service import crear_indice_busqueda, reconstruir_indice_busqueda
+from services.participation_service import cargar_modelo_registrado, invalidar_modelo_participacion
+from services.reference_data import invalidar_datos_referencia
+from services.prediction_executor import init_prediction_executor
+from services.chatbot_service import responder
+from services.chat_retrieval_service import construir_indice_chat
+from services.chat_log_writer import init_chat_log_writer, registrar_interaccion
+from services.socketio_backplane import opciones_socketio
+from services.seat_updates import init_seat_updates, sala_actividad
 
 
 app = Flask(__name__, instance_relative_config=True, template_folder='view/templates')
@@ -21,8 +37,52 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key968')
 default_sqlite_uri = f"sqlite:///{os.path.join(app.instance_path, 'konectai.db')}"
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', default_sqlite_uri)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Re-entrenar el modelo de participación tras N cambios en inscripciones/actividades o al superar su antigüedad máxima
+app.config['PARTICIPATION_MODEL_RETRAIN_THRESHOLD'] = int(os.environ.get('PARTICIPATION_MODEL_RETRAIN_THRESHOLD', 20))
+app.config['PARTICIPATION_MODEL_MAX_AGE_SECONDS'] = int(os.environ.get('PARTICIPATION_MODEL_MAX_AGE_SECONDS', 3600))
+# Versiones del modelo que se conservan en disco (instance/modelos_participacion/); las anteriores se eliminan al publicar
+app.config['MODEL_REGISTRY_KEEP_VERSIONS'] = int(os.environ.get('MODEL_REGISTRY_KEEP_VERSIONS', 5))
+# Pool de procesos para entrenar y puntuar fuera del hilo de la solicitud (0 = desactivado)
+app.config['PREDICTION_EXECUTOR_WORKERS'] = int(os.environ.get('PREDICTION_EXECUTOR_WORKERS', 2))
+app.config['PREDICTION_EXECUTOR_TIMEOUT_SECONDS'] = float(os.environ.get('PREDICTION_EXECUTOR_TIMEOUT_SECONDS', 2.0))
+app.config['PREDICTION_EXECUTOR_MIN_BATCH'] = int(os.environ.get('PREDICTION_EXECUTOR_MIN_BATCH', 200))
+# Cada cuántos segundos el índice de vectores en memoria descarta las actividades borradas desde otro proceso
+app.config['ACTIVITY_INDEX_FULL_SYNC_SECONDS'] = int(os.environ.get('ACTIVITY_INDEX_FULL_SYNC_SECONDS', 300))
+# Vigencia de los puntajes de compatibilidad guardados por usuario
+app.config['COMPATIBILITY_SCORE_TTL_SECONDS'] = int(os.environ.get('COMPATIBILITY_SCORE_TTL_SECONDS', 900))
+# Recomendaciones personalizadas precalculadas por voluntario
+app.config['RECOMMENDATIONS_TOP_K'] = int(os.environ.get('RECOMMENDATIONS_TOP_K', 20))
+# Vigencia de la caché de datos de referencia (tipos, organizaciones, discapacidades, preferencias)
+app.config['REFERENCE_DATA_TTL_SECONDS'] = int(os.environ.get('REFERENCE_DATA_TTL_SECONDS', 300))
+# Programas por página en el catálogo (paginación por cursor)
+app.config['PROGRAMS_PER_PAGE'] = int(os.environ.get('PROGRAMS_PER_PAGE', 12))
+app.config['ADMIN_USERS_PER_PAGE'] = int(os.environ.get('ADMIN_USERS_PER_PAGE', 50))
+# Conteo y tiempo de consultas SQL por solicitud (sin definir: solo en modo debug)
+app.config['SQL_QUERY_STATS'] = os.environ.get('SQL_QUERY_STATS', '').lower() in ('1', 'true') if 'SQL_QUERY_STATS' in os.environ else None
+# Inscripción en cola para lanzamientos de alta demanda (ticket + lotes por actividad)
+app.config['ENROLLMENT_QUEUE_ENABLED'] = os.environ.get('ENROLLMENT_QUEUE_ENABLED', '').lower() in ('1', 'true')
+app.config['ENROLLMENT_QUEUE_BATCH_SIZE'] = int(os.environ.get('ENROLLMENT_QUEUE_BATCH_SIZE', 50))
+app.config['ENROLLMENT_TICKET_TTL_SECONDS'] = int(os.environ.get('ENROLLMENT_TICKET_TTL_SECONDS', 600))
+# Historial del chat: inserciones por lotes de N interacciones o cada T milisegundos
+app.config['CHAT_LOG_BATCH_SIZE'] = int(os.environ.get('CHAT_LOG_BATCH_SIZE', 50))
+app.config['CHAT_LOG_FLUSH_MS'] = int(os.environ.get('CHAT_LOG_FLUSH_MS', 500))
+app.config['CHAT_LOG_MAX_PENDING'] = int(os.environ.get('CHAT_LOG_MAX_PENDING', 10000))
+# Índice del catálogo para el chat: actividades sugeridas por respuesta y antigüedad máxima antes de reconstruirlo
+app.config['CHAT_RESULTS_TOP_K'] = int(os.environ.get('CHAT_RESULTS_TOP_K', 3))
+app.config['CHAT_INDEX_MAX_AGE_SECONDS'] = int(os.environ.get('CHAT_INDEX_MAX_AGE_SECONDS', 600))
+# Cupos en vivo en el detalle de las actividades: como máximo un envío por actividad cada N milisegundos
+app.config['SEAT_UPDATES_INTERVAL_MS'] = int(os.environ.get('SEAT_UPDATES_INTERVAL_MS', 1000))
 
-socketio = SocketIO(app)
+# Socket.IO: modo asíncrono ('threading', 'eventlet' o 'gevent'; los dos últimos con wsgi.py) y backplane
+# de mensajes para repartir los clientes entre varios procesos (redis://..., amqp://... o local://host:puerto)
+app.config['SOCKETIO_ASYNC_MODE'] = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+app.config['SOCKETIO_CHANNEL'] = os.environ.get('SOCKETIO_CHANNEL', 'konectai-socketio')
+app.config['SOCKETIO_CORS_ALLOWED_ORIGINS'] = [o.strip() for o in os.environ.get('SOCKETIO_CORS_ALLOWED_ORIGINS', '').split(',') if o.strip()] or None
+app.config['SOCKETIO_PING_INTERVAL'] = int(os.environ.get('SOCKETIO_PING_INTERVAL', 25))
+app.config['SOCKETIO_PING_TIMEOUT'] = int(os.environ.get('SOCKETIO_PING_TIMEOUT', 20))
+
+socketio = SocketIO(app, **opciones_socketio(app.config))
 
 try:
     os.makedirs(app.instance_path)
@@ -30,6 +90,7 @@ except OSError:
     pass
 
 init_app(app)
+init_query_stats(app)
 migrate = Migrate(app, db)
 
 def create_tables_if_not_exist(flask_app, db_instance):
@@ -40,15 +101,32 @@ def create_tables_if_not_exist(flask_app, db_instance):
             app.logger.info("Tablas de la base de datos creadas.")
             return True
         else:
+            # Crea solo las tablas agregadas después de la creación inicial (create_all omite las existentes)
+            db_instance.create_all()
             app.logger.info("Tablas de la base de datos ya existen.")
             return False
 
 tables_created = create_tables_if_not_exist(app, db)
 
+# Índice de texto completo de actividades (FTS5 / tsvector); se crea antes de los datos iniciales para indexarlos
+with app.app_context():
+    crear_indice_busqueda()
+
 if tables_created:
     with app.app_context():
         seed_data()
 
+# Índice en memoria del catálogo para las respuestas del chat
+with app.app_context():
+    construir_indice_chat()
+
+# Cargar el último modelo de participación registrado para servir predicciones sin re-entrenar
+with app.app_context():
+    cargar_modelo_registrado()
+init_prediction_executor(app)
+init_chat_log_writer(app)
+init_seat_updates(app, socketio)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
@@ -73,6 +151,66 @@ def seed_db_command():
     with app.app_context():
         seed_data()
 
+@app.cli.command('seed-synthetic')
+@click.option('--users', type=int, default=1000, show_default=True, help='Usuarios a crear (voluntarios y organizadores).')
+@click.option('--activities', type=int, default=200, show_default=True, help='Actividades a crear.')
+@click.option('--enrollments', type=int, default=5000, show_default=True, help='Inscripciones a crear.')
+@click.option('--organizations', type=int, default=None, help='Organizaciones a crear (por defecto una cada 50 actividades).')
+@click.option('--seed', type=int, default=42, show_default=True, help='Semilla; con la misma semilla se generan los mismos datos.')
+@click.option('--chunk-size', type=int, default=10000, show_default=True, help='Filas por inserción masiva.')
+def seed_synthetic_command(users, activities, enrollments, organizations, seed, chunk_size):
+    """Genera datos sintéticos a gran escala con inserciones masivas (para pruebas de rendimiento)."""
+    with app.app_context():
+        inicio = time.perf_counter()
+        with db.engine.begin() as conn:
+            resumen = generar_datos_sinteticos(conn, users, activities, enrollments, organizaciones=organizations,
+                                               seed=seed, tam_bloque=chunk_size)
+        # Las inserciones masivas no disparan los eventos del ORM: contadores, índices y cachés se rehacen aquí
+        recalcular_inscritos()
+        reconstruir_indice_busqueda()
+        # Sin esto, la primera visita a /programs vectorizaría todo el catálogo dentro de la solicitud
+        rebuild_activity_index()
+        construir_indice_chat()
+        invalidar_datos_referencia()
+        invalidar_modelo_participacion()
+        filas = ', '.join(f"{resumen[tabla]} {tabla}" for tabla in
+                          ('usuarios', 'organizaciones', 'actividades', 'inscripciones', 'feedback',
+                           'usuarios_preferencia', 'usuario_discapacidad', 'actividad_discapacidad'))
+        print(f"Datos sintéticos generados en {time.perf_counter() - inicio:.1f} s: {filas}.")
+        print(f"Contraseña de los usuarios sintéticos: {CONTRASENA_SINTETICA}")
+
+@app.cli.command('rebuild-activity-index')
+def rebuild_activity_index_command():
+    """Reconstruye el índice de vectores de actividades usado para la compatibilidad."""
+    with app.app_context():
+        total = rebuild_activity_index()
+        print(f"Índice de actividades reconstruido: {total} vectores.")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Reconstruye el índice de búsqueda de texto completo de las actividades."""
+    with app.app_context():
+        total = reconstruir_indice_busqueda()
+        print(f"Índice de búsqueda reconstruido: {total} actividades.")
+
+@app.cli.command('recount-enrollments')
+def recount_enrollments_command():
+    """Recalcula el contador de inscritos de cada actividad desde las inscripciones confirmadas."""
+    with app.app_context():
+        total = recalcular_inscritos()
+        print(f"Contador de inscritos recalculado para {total} actividades.")
+
+@app.cli.command('compute-recommendations')
+@click.option('--full', is_flag=True, help='Vuelve a puntuar a todos los voluntarios contra todas las actividades abiertas.')
+@click.option('--top-k', type=int, default=None, help='Recomendaciones por voluntario (por defecto RECOMMENDATIONS_TOP_K).')
+def compute_recommendations_command(full, top_k):
+    """Precalcula las recomendaciones personalizadas (top-K) de cada voluntario activo."""
+    with app.app_context():
+        resumen = generar_recomendaciones(incremental=not full, top_k=top_k)
+        print(f"Recomendaciones precalculadas: {resumen['usuarios_completos']} voluntarios puntuados por completo, "
+              f"{resumen['usuarios_actualizados']} actualizados con {resumen['actividades_nuevas']} actividades nuevas, "
+              f"{resumen['filas']} filas.")
+
 # Socket.IO Event Handlers
 @socketio.on('connect')
 def handle_connect():
@@ -83,28 +221,41 @@ def handle_connect():
 def handle_disconnect():
     app.logger.info('Client disconnected from chat')
 
+@socketio.on('seguir_actividad')
+def handle_follow_activity(data):
+    # El detalle de una actividad recibe sus cupos en vivo (`cupos_actualizados`) mientras está abierto
+    try:
+        join_room(sala_actividad(int(data['id_actividad'])))
+    except (KeyError, TypeError, ValueError):
+        pass
+
+@socketio.on('dejar_actividad')
+def handle_unfollow_activity(data):
+    try:
+        leave_room(sala_actividad(int(data['id_actividad'])))
+    except (KeyError, TypeError, ValueError):
+        pass
+
 @socketio.on('chat_message')
 def handle_chat_message(data):
     user_message = data.get('query', '').strip()
     app.logger.info(f"Received chat message: '{user_message}'")
 
-    bot_response = f"KonectaAI ha recibido tu mensaje: '{user_message}'. Pronto te responderé con más inteligencia."
-    user_message_lower = user_message.lower()
-
-    if "hola" in user_message_lower:
-        bot_response = "¡Hola! ¿Cómo puedo ayudarte hoy?"
-    elif "adiós" in user_message_lower or "chao" in user_message_lower:
-        bot_response = "¡Hasta luego! Que tengas un buen día."
-    elif "ayuda" in user_message_lower:
-        bot_response = "Puedes preguntar sobre nuestros programas de voluntariado, cómo registrarte o sobre la accesibilidad."
-    elif "gracias" in user_message_lower:
-        bot_response = "¡De nada! Estoy aquí para ayudar."
+    bot_response, intencion, actividades = responder(user_message, app.config['CHAT_RESULTS_TOP_K'])
+    # El historial se escribe en segundo plano: la respuesta no espera a la base de datos
+    user_id = current_user.id_usuario if current_user.is_authenticated else None
+    registrar_interaccion(user_id, user_message, bot_response)
 
-    app.logger.info(f"Sending bot response: '{bot_response}'")
-    emit('chat_response', {'response': bot_response, 'requires_auth': False})
+    app.logger.info(f"Sending bot response ({intencion or 'sin intención'}): '{bot_response}'")
+    programas = [{'id': a.id_actividad, 'nombre': a.nombre,
+                  'url': url_for('program.view_program_detail', program_id=a.id_actividad)} for a in actividades]
+    respuesta = {'response': bot_response, 'requires_auth': False, 'programas': programas}
+    if 'id' in data:
+        # Identificador opcional del cliente para correlacionar la respuesta (p. ej. database/benchmark_chat.py)
+        respuesta['id'] = data['id']
+    emit('chat_response', respuesta)
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
-    # TODO: DEBUG debe ser False en un entorno de producción
-    # app.run(host='0.0.0.0', port=port, debug=True) # Original Flask dev server
-    socketio.run(app, host='0.0.0.0', port=port, debug=True)
+    # Servidor de desarrollo; en producción usar wsgi.py (modo asíncrono y varios procesos)
+    socketio.run(app, host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG', '1') == '1')
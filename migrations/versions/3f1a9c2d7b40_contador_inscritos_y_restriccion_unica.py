@@ -0,0 +1,46 @@
+"""contador de inscritos y restricción única de inscripciones
+
+Las tablas nuevas se crean con `db.create_all()` al arrancar la aplicación, pero `create_all` no
+modifica tablas existentes. Esta revisión agrega a las bases creadas antes del contador de inscritos
+la columna `actividades.inscritos` (recalculada desde las inscripciones confirmadas) y la restricción
+única (id_usuario, id_actividad) de `inscripciones`. En bases nuevas no hace nada.
+
+Revision ID: 3f1a9c2d7b40
+Revises:
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'uq_inscripcion_usuario_actividad' not in {uq['name'] for uq in inspector.get_unique_constraints('inscripciones')}:
+        # Se conserva la inscripción más antigua de cada par duplicado antes de crear la restricción
+        op.execute("DELETE FROM inscripciones WHERE id_inscripcion NOT IN ("
+                   "SELECT MIN(id_inscripcion) FROM inscripciones GROUP BY id_usuario, id_actividad)")
+        with op.batch_alter_table('inscripciones') as batch_op:
+            batch_op.create_unique_constraint('uq_inscripcion_usuario_actividad', ['id_usuario', 'id_actividad'])
+
+    if 'inscritos' not in {col['name'] for col in inspector.get_columns('actividades')}:
+        with op.batch_alter_table('actividades') as batch_op:
+            batch_op.add_column(sa.Column('inscritos', sa.Integer(), nullable=False, server_default='0'))
+        op.execute("UPDATE actividades SET inscritos = (SELECT COUNT(*) FROM inscripciones "
+                   "WHERE inscripciones.id_actividad = actividades.id_actividad "
+                   "AND inscripciones.estado_inscripcion = 'confirmada')")
+
+
+def downgrade():
+    with op.batch_alter_table('inscripciones') as batch_op:
+        batch_op.drop_constraint('uq_inscripcion_usuario_actividad', type_='unique')
+    with op.batch_alter_table('actividades') as batch_op:
+        batch_op.drop_column('inscritos')
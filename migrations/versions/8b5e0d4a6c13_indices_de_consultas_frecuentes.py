@@ -0,0 +1,52 @@
+"""índices de las consultas frecuentes
+
+Índices compuestos para los filtros y ordenamientos de `program_controller` (catálogo),
+`dashboard_routes` (paneles, perfil y gestión de usuarios), `enrollment_service` y
+`participation_service`. Son los mismos que declaran los modelos, de modo que las bases creadas con
+`db.create_all()` ya los tienen: solo se crean los que faltan.
+
+Revision ID: 8b5e0d4a6c13
+Revises: 3f1a9c2d7b40
+Create Date: 2026-10-18 13:25:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5e0d4a6c13'
+down_revision = '3f1a9c2d7b40'
+branch_labels = None
+depends_on = None
+
+# (tabla, nombre del índice, columnas)
+INDICES = (
+    ('actividades', 'ix_actividades_estado_fecha', ['estado', 'fecha_actividad', 'id_actividad']),
+    ('actividades', 'ix_actividades_organizacion_fecha', ['id_organizacion', 'fecha_actividad']),
+    ('actividades', 'ix_actividades_tipo_estado_fecha', ['tipo', 'estado', 'fecha_actividad', 'id_actividad']),
+    ('actividades', 'ix_actividades_etiqueta_estado_fecha', ['etiqueta', 'estado', 'fecha_actividad', 'id_actividad']),
+    ('inscripciones', 'ix_inscripciones_usuario_fecha', ['id_usuario', 'fecha_inscripcion']),
+    ('inscripciones', 'ix_inscripciones_actividad_estado_fecha', ['id_actividad', 'estado_inscripcion', 'fecha_inscripcion']),
+    ('recomendaciones', 'ix_recomendaciones_usuario_tipo_score', ['id_usuario', 'tipo_recomendacion', 'score']),
+    ('actividad_discapacidad', 'ix_actividad_discapacidad_discapacidad', ['discapacidad_id', 'actividad_id']),
+    ('usuarios', 'ix_usuarios_perfil_estado', ['perfil', 'estado_usuario', 'id_usuario']),
+)
+
+
+def _indices_existentes(inspector, tabla):
+    return {index['name'] for index in inspector.get_indexes(tabla)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for tabla, nombre, columnas in INDICES:
+        if nombre not in _indices_existentes(inspector, tabla):
+            op.create_index(nombre, tabla, columnas)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for tabla, nombre, _ in reversed(INDICES):
+        if nombre in _indices_existentes(inspector, tabla):
+            op.drop_index(nombre, table_name=tabla)
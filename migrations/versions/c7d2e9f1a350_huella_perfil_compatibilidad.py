@@ -0,0 +1,34 @@
+"""huella del perfil en los puntajes de compatibilidad
+
+Agrega `compatibilidad_usuario_actividad.huella_perfil`: los puntajes guardados solo se reutilizan si
+se calcularon con los mismos intereses, habilidades y discapacidades que tiene hoy el voluntario. Las
+filas existentes quedan sin huella y se recalculan en la siguiente visita. En bases nuevas no hace nada.
+
+Revision ID: c7d2e9f1a350
+Revises: 8b5e0d4a6c13
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e9f1a350'
+down_revision = '8b5e0d4a6c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'compatibilidad_usuario_actividad' not in inspector.get_table_names():
+        return
+    if 'huella_perfil' not in {col['name'] for col in inspector.get_columns('compatibilidad_usuario_actividad')}:
+        with op.batch_alter_table('compatibilidad_usuario_actividad') as batch_op:
+            batch_op.add_column(sa.Column('huella_perfil', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('compatibilidad_usuario_actividad') as batch_op:
+        batch_op.drop_column('huella_perfil')
@@ -0,0 +1,58 @@
+"""
+Perfiles de carga (loader options) para las vistas más usadas.
+
+Cada perfil agrupa las opciones `joinedload`/`selectinload` que necesita una vista para no emitir
+una consulta por fila al recorrer relaciones en bucles o plantillas:
+- `PERFIL_TARJETA_PROGRAMA`: listado de programas (organización y discapacidades soportadas).
+- `PERFIL_DETALLE_PROGRAMA`: página de detalle (además, facilidades).
+- `PERFIL_ACTIVIDAD_CON_ORGANIZACION`: listas de inscripciones/recomendaciones que muestran la organización.
+- `PERFIL_VOLUNTARIO`: preferencias y discapacidades del usuario (con el catálogo de cada discapacidad).
+
+Las relaciones muchos-a-uno usan `joinedload` (misma consulta) y las colecciones `selectinload`
+(una consulta `IN` por relación), de modo que N filas se cargan en un número constante de consultas.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database.db import db
+from model.models import Actividades, Preferencias, UsuarioDiscapacidad, Usuarios, usuarios_preferencia_table
+
+PERFIL_TARJETA_PROGRAMA = (
+    joinedload(Actividades.organizacion),
+    selectinload(Actividades.discapacidades),
+)
+
+PERFIL_DETALLE_PROGRAMA = PERFIL_TARJETA_PROGRAMA + (
+    selectinload(Actividades.facilidades),
+)
+
+PERFIL_ACTIVIDAD_CON_ORGANIZACION = (
+    joinedload(Actividades.organizacion),
+)
+
+PERFIL_VOLUNTARIO = (
+    selectinload(Usuarios.preferencias),
+    selectinload(Usuarios.discapacidades_pivot).joinedload(UsuarioDiscapacidad.discapacidad),
+)
+
+
+def cargar_perfil_voluntario(user):
+    """
+    Carga de una vez las preferencias y discapacidades de un usuario ya presente en la sesión
+    (p. ej. `current_user`) y devuelve la misma instancia.
+
+    Equivale a `PERFIL_VOLUNTARIO` sin volver a consultar la fila del usuario: cada colección aún
+    no cargada se obtiene con una consulta y se asigna a la instancia.
+    """
+    unloaded = inspect(user).unloaded
+    if 'preferencias' in unloaded:
+        preferencias = Preferencias.query \
+            .join(usuarios_preferencia_table, usuarios_preferencia_table.c.preferencia_id == Preferencias.id_preferencia) \
+            .filter(usuarios_preferencia_table.c.usuario_id == user.id_usuario).all()
+        set_committed_value(user, 'preferencias', preferencias)
+    if 'discapacidades_pivot' in unloaded:
+        discapacidades = UsuarioDiscapacidad.query.options(joinedload(UsuarioDiscapacidad.discapacidad)) \
+            .filter(UsuarioDiscapacidad.id_usuario == user.id_usuario).all()
+        set_committed_value(user, 'discapacidades_pivot', discapacidades)
+    return user
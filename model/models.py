@@ -1,7 +1,7 @@
 from flask_login import UserMixin
 from database.db import db
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, Boolean, DECIMAL, Table, func
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, Boolean, DECIMAL, Table, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -42,7 +42,9 @@ usuarios_preferencia_table = Table('usuarios_preferencia', db.Model.metadata,
 
 actividad_discapacidad_table = Table('actividad_discapacidad', db.Model.metadata,
     Column('actividad_id', Integer, ForeignKey('actividades.id_actividad'), primary_key=True),
-    Column('discapacidad_id', Integer, ForeignKey('discapacidades.id_discapacidad'), primary_key=True)
+    Column('discapacidad_id', Integer, ForeignKey('discapacidades.id_discapacidad'), primary_key=True),
+    # Filtro "enfoque inclusivo" (de la discapacidad a sus actividades); la PK cubre el sentido inverso
+    Index('ix_actividad_discapacidad_discapacidad', 'discapacidad_id', 'actividad_id')
 )
 
 actividad_facilidad_table = Table('actividad_facilidad', db.Model.metadata,
@@ -53,6 +55,10 @@ actividad_facilidad_table = Table('actividad_facilidad', db.Model.metadata,
 # Modelos
 class Usuarios(db.Model, UserMixin):
     __tablename__ = 'usuarios'
+    __table_args__ = (
+        # Filtros por perfil/estado con paginación por ID (gestión de usuarios, selección de voluntarios)
+        Index('ix_usuarios_perfil_estado', 'perfil', 'estado_usuario', 'id_usuario'),
+    )
     id_usuario = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
     # Campos obligatorios en el registro inicial
@@ -136,6 +142,13 @@ class Discapacidades(db.Model):
 
 class Actividades(db.Model):
     __tablename__ = 'actividades'
+    # Índices de los filtros del catálogo (program_controller), del panel del organizador y de las recomendaciones
+    __table_args__ = (
+        Index('ix_actividades_estado_fecha', 'estado', 'fecha_actividad', 'id_actividad'),
+        Index('ix_actividades_organizacion_fecha', 'id_organizacion', 'fecha_actividad'),
+        Index('ix_actividades_tipo_estado_fecha', 'tipo', 'estado', 'fecha_actividad', 'id_actividad'),
+        Index('ix_actividades_etiqueta_estado_fecha', 'etiqueta', 'estado', 'fecha_actividad', 'id_actividad'),
+    )
     id_actividad = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nombre = db.Column(db.String(255))
     descripcion = db.Column(db.Text)
@@ -148,6 +161,8 @@ class Actividades(db.Model):
     estado = db.Column(db.Enum(EstadoActividad, name='estado_actividad_enum', values_callable=lambda x: [e.value for e in x]), default=EstadoActividad.ABIERTO)
     imagen = db.Column(db.String(255))
     compatibilidad = db.Column(db.DECIMAL(5, 2))
+    # Contador desnormalizado de inscripciones confirmadas (ver services.enrollment_service)
+    inscritos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     etiqueta = db.Column(db.String(100))
     id_organizacion = db.Column(db.Integer, ForeignKey('organizaciones.id_organizacion'))
 
@@ -159,6 +174,15 @@ class Actividades(db.Model):
     inscripciones = relationship("Inscripciones", back_populates="actividad")
 
 
+class VectoresActividad(db.Model):
+    """Vector de términos (conteos normalizados L2) del texto de una actividad, usado por el índice de compatibilidad."""
+    __tablename__ = 'vectores_actividad'
+    id_actividad = db.Column(db.Integer, ForeignKey('actividades.id_actividad', ondelete='CASCADE'), primary_key=True)
+    terminos = db.Column(db.JSON, nullable=False, default=dict)
+    tiene_texto = db.Column(db.Boolean, nullable=False, default=False)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
 class AuditoriaActividad(db.Model):
     __tablename__ = 'auditoria_actividad'
     id_auditoria = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -182,6 +206,13 @@ class Facilidad(db.Model):
 
 class Inscripciones(db.Model):
     __tablename__ = 'inscripciones'
+    __table_args__ = (
+        UniqueConstraint('id_usuario', 'id_actividad', name='uq_inscripcion_usuario_actividad'),
+        # Inscripciones del usuario por fecha (panel y perfil del voluntario)
+        Index('ix_inscripciones_usuario_fecha', 'id_usuario', 'fecha_inscripcion'),
+        # Inscripciones de una actividad por estado (lista de espera, recuento de inscritos)
+        Index('ix_inscripciones_actividad_estado_fecha', 'id_actividad', 'estado_inscripcion', 'fecha_inscripcion'),
+    )
     id_inscripcion = db.Column(db.Integer, primary_key=True, autoincrement=True)
     id_usuario = db.Column(db.Integer, ForeignKey('usuarios.id_usuario'), nullable=False)
     id_actividad = db.Column(db.Integer, ForeignKey('actividades.id_actividad'), nullable=False)
@@ -219,6 +250,10 @@ class Feedback(db.Model):
 
 class Recomendaciones(db.Model):
     __tablename__ = 'recomendaciones'
+    __table_args__ = (
+        # Recomendaciones de un usuario por tipo, de mayor a menor puntaje (panel del voluntario)
+        Index('ix_recomendaciones_usuario_tipo_score', 'id_usuario', 'tipo_recomendacion', 'score'),
+    )
     id_recomendacion = db.Column(db.Integer, primary_key=True, autoincrement=True)
     id_usuario = db.Column(db.Integer, ForeignKey('usuarios.id_usuario'), nullable=False)
     id_actividad = db.Column(db.Integer, ForeignKey('actividades.id_actividad'), nullable=False)
@@ -231,6 +266,25 @@ class Recomendaciones(db.Model):
     actividad = relationship("Actividades")
 
 
+class EstadoRecomendacionesUsuario(db.Model):
+    """Huella del perfil con la que se calcularon las recomendaciones precalculadas de un voluntario."""
+    __tablename__ = 'estado_recomendaciones_usuario'
+    id_usuario = db.Column(db.Integer, ForeignKey('usuarios.id_usuario', ondelete='CASCADE'), primary_key=True)
+    huella_perfil = db.Column(db.String(64), nullable=False)
+    fecha_calculo = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CompatibilidadUsuarioActividad(db.Model):
+    """Puntaje de compatibilidad calculado para un par (voluntario, actividad)."""
+    __tablename__ = 'compatibilidad_usuario_actividad'
+    id_usuario = db.Column(db.Integer, ForeignKey('usuarios.id_usuario', ondelete='CASCADE'), primary_key=True)
+    id_actividad = db.Column(db.Integer, ForeignKey('actividades.id_actividad', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.DECIMAL(5, 2), nullable=False)
+    fecha_calculo = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Huella de los datos del perfil usados al calcular (intereses, habilidades, discapacidades)
+    huella_perfil = db.Column(db.String(40))
+
+
 class Tendencias(db.Model):
     __tablename__ = 'tendencias'
     id_tendencia = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -0,0 +1,242 @@
+"""
+Módulo de servicio para el índice persistente de vectores de actividades.
+
+Este módulo mantiene, por cada actividad, un vector de términos (conteos normalizados L2)
+construido a partir de su descripción y categoría, de modo que el cálculo de compatibilidad
+no tenga que re-vectorizar todo el catálogo en cada solicitud:
+- Los vectores se guardan en la tabla `vectores_actividad` y se actualizan solo para las
+  filas afectadas mediante eventos `after_insert`/`after_update`/`after_delete` de SQLAlchemy.
+- Cada proceso mantiene una copia en memoria (vectores e índice invertido por término) que se
+  sincroniza de forma incremental con la tabla (`get_activity_vectors`). Cada
+  `ACTIVITY_INDEX_FULL_SYNC_SECONDS` se comparan además los IDs de la tabla para descartar las
+  actividades borradas desde otro proceso.
+- `project_user_text` proyecta el texto del usuario contra los vectores ya construidos,
+  con un costo que depende de los términos del usuario y no del tamaño del catálogo.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app # Para logging
+from sqlalchemy import event, inspect as sa_inspect, select
+from sklearn.feature_extraction.text import CountVectorizer
+
+from database.db import db
+from model.models import Actividades, VectoresActividad
+
+# Mismo analizador que usa CountVectorizer en compatibility_service (minúsculas, tokens de 2+ caracteres)
+_analyzer = CountVectorizer().build_analyzer()
+
+# Campos de Actividades que afectan el texto indexado
+CAMPOS_INDEXADOS = ('descripcion', 'etiqueta', 'nombre')
+
+# Margen de relectura al sincronizar, para no perder filas confirmadas con una fecha anterior a la última vista
+VENTANA_SINCRONIZACION = timedelta(seconds=5)
+
+
+def build_activity_text(descripcion, etiqueta, nombre):
+    """
+    Construye el texto comparable de una actividad: descripción + categoría.
+
+    La categoría es la etiqueta o, si no existe, el nombre en minúsculas (igual que en
+    `program_controller` y `dashboard_routes`).
+    """
+    description = descripcion if isinstance(descripcion, str) else ''
+    category = etiqueta if etiqueta else (nombre.lower() if nombre else "")
+    category = category if isinstance(category, str) else ''
+    return (description + ' ' + category).strip()
+
+
+def vectorize_text(text):
+    """
+    Tokeniza un texto y devuelve su vector de conteos normalizado L2 como diccionario {término: peso}.
+    """
+    counts = Counter(_analyzer(text)) if text else Counter()
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    if not norm:
+        return {}
+    return {term: count / norm for term, count in counts.items()}
+
+
+def _vector_row(actividad):
+    text = build_activity_text(actividad.descripcion, actividad.etiqueta, actividad.nombre)
+    return {
+        'id_actividad': actividad.id_actividad,
+        'terminos': vectorize_text(text),
+        'tiene_texto': bool(text),
+        'fecha_actualizacion': datetime.utcnow(),
+    }
+
+
+def _write_vector(connection, actividad):
+    table = VectoresActividad.__table__
+    connection.execute(table.delete().where(table.c.id_actividad == actividad.id_actividad))
+    connection.execute(table.insert().values(**_vector_row(actividad)))
+
+
+@event.listens_for(Actividades, 'after_insert')
+def _index_new_activity(mapper, connection, target):
+    _write_vector(connection, target)
+
+
+@event.listens_for(Actividades, 'after_update')
+def _reindex_activity(mapper, connection, target):
+    state = sa_inspect(target)
+    if any(state.attrs[campo].history.has_changes() for campo in CAMPOS_INDEXADOS):
+        _write_vector(connection, target)
+
+
+@event.listens_for(Actividades, 'after_delete')
+def _unindex_activity(mapper, connection, target):
+    table = VectoresActividad.__table__
+    connection.execute(table.delete().where(table.c.id_actividad == target.id_actividad))
+
+
+class _ActivityVectorCache:
+    """Copia en memoria de `vectores_actividad` con índice invertido por término."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.vectors = {}      # id_actividad -> {término: peso}
+        self.has_text = {}     # id_actividad -> bool
+        self.postings = {}     # término -> {id_actividad: peso}
+        self.last_sync = None
+        self.last_full_sync = None  # time.monotonic() de la última comparación de IDs
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def _remove(self, activity_id):
+        for term in self.vectors.pop(activity_id, {}):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(activity_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.has_text.pop(activity_id, None)
+
+    def _store(self, activity_id, terms, has_text):
+        self._remove(activity_id)
+        self.vectors[activity_id] = terms
+        self.has_text[activity_id] = has_text
+        for term, weight in terms.items():
+            self.postings.setdefault(term, {})[activity_id] = weight
+
+    def sync(self, activity_ids=None):
+        """Carga las filas nuevas o modificadas desde la última sincronización y las que falten de `activity_ids`."""
+        with self._lock:
+            query = VectoresActividad.query
+            if self.last_sync is None:
+                # Carga completa: ya trae exactamente los IDs de la tabla
+                self._clear()
+                self.last_full_sync = time.monotonic()
+            else:
+                query = query.filter(VectoresActividad.fecha_actualizacion >= self.last_sync - VENTANA_SINCRONIZACION)
+            newest = self.last_sync
+            for row in query.all():
+                self._store(row.id_actividad, row.terminos or {}, bool(row.tiene_texto))
+                if newest is None or row.fecha_actualizacion > newest:
+                    newest = row.fecha_actualizacion
+            self.last_sync = newest or datetime.utcnow()
+
+            # Los borrados no dejan fila que sincronizar: cada cierto tiempo se descartan los IDs que ya no están
+            interval = current_app.config.get('ACTIVITY_INDEX_FULL_SYNC_SECONDS', 300)
+            if self.last_full_sync is None or time.monotonic() - self.last_full_sync >= interval:
+                indexed = set(db.session.execute(select(VectoresActividad.id_actividad)).scalars())
+                for activity_id in [aid for aid in self.vectors if aid not in indexed]:
+                    self._remove(activity_id)
+                self.last_full_sync = time.monotonic()
+
+            missing = [aid for aid in (activity_ids or []) if aid not in self.vectors]
+        if missing:
+            rows = _index_missing(missing)
+            with self._lock:
+                for row in rows:
+                    self._store(row['id_actividad'], row['terminos'], row['tiene_texto'])
+
+
+def _index_missing(activity_ids):
+    """
+    Vectoriza una sola vez las actividades creadas antes de que existiera el índice y guarda sus vectores.
+
+    Se usa una conexión y una transacción propias: la sesión de la solicitud (y lo que tenga pendiente)
+    no se confirma desde esta ruta de lectura.
+    """
+    table = VectoresActividad.__table__
+    columns = Actividades.__table__.c
+    rows = []
+    try:
+        with db.engine.begin() as connection:
+            actividades = connection.execute(
+                select(columns.id_actividad, columns.descripcion, columns.etiqueta, columns.nombre)
+                .where(columns.id_actividad.in_(activity_ids))).all()
+            rows = [_vector_row(actividad) for actividad in actividades]
+            if rows:
+                connection.execute(table.delete().where(table.c.id_actividad.in_([r['id_actividad'] for r in rows])))
+                connection.execute(table.insert(), rows)
+        if rows:
+            current_app.logger.info(f"Índice de actividades: {len(rows)} vectores construidos.")
+    except Exception as e:
+        current_app.logger.error(f"Error al guardar vectores de actividades en el índice: {e}")
+    return rows
+
+
+_cache = _ActivityVectorCache()
+
+
+def get_activity_vectors(activity_ids):
+    """
+    Sincroniza el índice en memoria y devuelve el caché para los IDs solicitados.
+
+    Args:
+        activity_ids (list): IDs de actividades que se van a puntuar.
+
+    Returns:
+        _ActivityVectorCache: El caché sincronizado (vectores, indicador de texto e índice invertido).
+    """
+    _cache.sync(activity_ids)
+    return _cache
+
+
+def project_user_text(user_text, activity_ids):
+    """
+    Proyecta el texto del usuario contra los vectores indexados de las actividades indicadas.
+
+    Args:
+        user_text (str): Texto del perfil del usuario (intereses y habilidades).
+        activity_ids (list): IDs de actividades candidatas.
+
+    Returns:
+        tuple: (similitudes, tiene_texto, tiene_terminos, usuario_sin_terminos), donde los tres primeros
+               son diccionarios indexados por id_actividad.
+    """
+    cache = get_activity_vectors(activity_ids)
+    user_vector = vectorize_text(user_text)
+    candidates = set(activity_ids)
+    similarities = dict.fromkeys(activity_ids, 0.0)
+    for term, user_weight in user_vector.items():
+        for activity_id, weight in cache.postings.get(term, {}).items():
+            if activity_id in candidates:
+                similarities[activity_id] += user_weight * weight
+    has_text = {activity_id: cache.has_text.get(activity_id, False) for activity_id in activity_ids}
+    has_terms = {activity_id: bool(cache.vectors.get(activity_id)) for activity_id in activity_ids}
+    return similarities, has_text, has_terms, not user_vector
+
+
+def rebuild_activity_index():
+    """Reconstruye por completo la tabla `vectores_actividad` a partir de todas las actividades."""
+    rows = [_vector_row(actividad) for actividad in Actividades.query.all()]
+    table = VectoresActividad.__table__
+    db.session.execute(table.delete())
+    if rows:
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+    _cache.reset()
+    current_app.logger.info(f"Índice de actividades reconstruido: {len(rows)} vectores.")
+    return len(rows)
@@ -0,0 +1,108 @@
+"""
+Escritura en segundo plano del historial del chat (`interacciones_chatbot`).
+
+El manejador de `chat_message` no abre ninguna transacción: `registrar_interaccion` solo agrega la
+interacción a una cola en memoria. Un hilo escritor la vacía con una inserción masiva (`executemany`)
+cuando se acumulan `CHAT_LOG_BATCH_SIZE` interacciones o cuando pasan `CHAT_LOG_FLUSH_MS` milisegundos
+desde la primera pendiente, lo que ocurra antes. Al terminar el proceso se escriben las pendientes.
+
+La cola está acotada (`CHAT_LOG_MAX_PENDING`): si la base de datos no da abasto, las interacciones que
+no caben se descartan (y se registra una advertencia) en lugar de frenar el chat.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from database.db import db
+from model.models import InteraccionesChatbot
+
+_lock = threading.Lock()
+_estado = {'app': None, 'cola': None, 'hilo': None, 'descartadas': 0}
+
+# Marca enviada a la cola para pedir que se escriba todo lo pendiente
+_VACIAR = object()
+
+
+def init_chat_log_writer(app):
+    """Prepara la cola y arranca el hilo escritor (una sola vez por proceso)."""
+    with _lock:
+        if _estado['hilo'] is not None:
+            return
+        _estado['app'] = app
+        _estado['cola'] = queue.Queue(maxsize=app.config.get('CHAT_LOG_MAX_PENDING', 10000))
+        _estado['hilo'] = threading.Thread(target=_escribir, args=(app, _estado['cola']),
+                                           name='historial-chat', daemon=True)
+        _estado['hilo'].start()
+    atexit.register(vaciar_historial_chat)
+
+
+def registrar_interaccion(user_id, pregunta, respuesta):
+    """Encola una interacción para escribirla en segundo plano; nunca bloquea."""
+    cola = _estado['cola']
+    if cola is None:
+        return False
+    try:
+        cola.put_nowait({'id_usuario': user_id, 'pregunta_usuario': pregunta, 'respuesta_chatbot': respuesta,
+                         'fecha': datetime.utcnow()})
+        return True
+    except queue.Full:
+        with _lock:
+            _estado['descartadas'] += 1
+            descartadas = _estado['descartadas']
+        if descartadas == 1 or descartadas % 1000 == 0:
+            _estado['app'].logger.warning(f"Historial del chat saturado: {descartadas} interacciones descartadas.")
+        return False
+
+
+def vaciar_historial_chat(timeout=5.0):
+    """Pide al escritor que guarde lo pendiente y espera a que termine (para pruebas y el cierre del proceso)."""
+    cola = _estado['cola']
+    if cola is None:
+        return
+    listo = threading.Event()
+    try:
+        cola.put((_VACIAR, listo), timeout=timeout)
+    except queue.Full:
+        return
+    listo.wait(timeout)
+
+
+def _escribir(app, cola):
+    """Bucle del escritor: acumula un lote y lo inserta al llenarse o al vencer el plazo."""
+    tamano = app.config.get('CHAT_LOG_BATCH_SIZE', 50)
+    plazo = app.config.get('CHAT_LOG_FLUSH_MS', 500) / 1000
+    lote = []
+    limite = None  # momento en que debe escribirse el lote en curso
+    while True:
+        try:
+            item = cola.get(timeout=None if limite is None else max(0.0, limite - time.monotonic()))
+        except queue.Empty:
+            item = None
+
+        listo = None
+        if isinstance(item, tuple) and item[0] is _VACIAR:
+            listo = item[1]
+        elif item is not None:
+            lote.append(item)
+            if limite is None:
+                limite = time.monotonic() + plazo
+
+        if lote and (listo is not None or len(lote) >= tamano or time.monotonic() >= limite):
+            _insertar(app, lote)
+            lote, limite = [], None
+        if listo is not None:
+            listo.set()
+
+
+def _insertar(app, lote):
+    with app.app_context():
+        try:
+            db.session.execute(InteraccionesChatbot.__table__.insert(), lote)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error al guardar {len(lote)} interacciones del chat: {e}")
+        finally:
+            db.session.remove()
@@ -0,0 +1,281 @@
+"""
+Índice de recuperación en memoria del catálogo para el chat de ayuda.
+
+Permite responder preguntas como "¿qué actividades hay para discapacidad visual en Cusco?" sin consultar
+la base de datos por mensaje. Cada actividad se representa con un vector TF-IDF construido a partir de su
+nombre, descripción, ubicación y etiqueta, más los nombres (y sinónimos) de sus discapacidades atendidas
+y de sus facilidades de accesibilidad.
+
+Se usa el esquema lnc.ltc: los documentos llevan tf logarítmico normalizado (sin idf) y el idf se aplica
+a la consulta al buscar. Así, agregar, modificar o quitar una actividad solo toca sus propios términos,
+sin recalcular los demás vectores. La búsqueda acumula con numpy solo las listas invertidas de los términos
+de la pregunta y selecciona el top-k con `argpartition`.
+
+El índice se construye al arrancar (`construir_indice_chat`) y se actualiza de forma incremental: los
+eventos de SQLAlchemy anotan las actividades modificadas y, tras el commit, se vuelven a indexar en la
+siguiente búsqueda (una consulta por lote de cambios). Los cambios hechos por otros procesos o con
+inserciones masivas se incorporan al reconstruir el índice completo, en segundo plano, cuando supera
+`CHAT_INDEX_MAX_AGE_SECONDS`.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+from flask import current_app # Para logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.db import db
+from model.models import (Actividades, Discapacidades, EstadoActividad, Facilidad, actividad_discapacidad_table,
+                          actividad_facilidad_table)
+from services.search_service import plegar_texto
+
+ResultadoChat = namedtuple('ResultadoChat', ['id_actividad', 'nombre', 'ubicacion', 'fecha_actividad', 'score'])
+
+# Peso (repeticiones) de cada campo en el texto indexado
+PESOS_CAMPOS = {'nombre': 2, 'descripcion': 1, 'ubicacion': 2, 'etiqueta': 1, 'discapacidades': 2, 'facilidades': 1}
+
+# Términos que se añaden a las actividades que atienden cada discapacidad, para entender preguntas coloquiales
+SINONIMOS_DISCAPACIDAD = {
+    'Auditiva': 'auditiva sordo sorda sordera hipoacusia oido lengua señas',
+    'Visual': 'visual ciego ciega ceguera invidente baja vision vista',
+    'Motriz': 'motriz fisica movilidad reducida silla ruedas',
+}
+
+# Palabras vacías y genéricas de las preguntas (ya plegadas): no aportan para distinguir actividades
+PALABRAS_VACIAS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante con como cual cuales cuando de del donde el ella en entre es esa
+ese esta estan este esto hay hacer la las le lo los me mi mis muy necesito para pero por puedo que quiero se ser si
+sin sobre su sus tengo tiene tienen un una unas uno unos y yo ver busco buscando existe existen ofrecen disponibles
+actividad actividades programa programas voluntariado voluntariados voluntario voluntaria oportunidad oportunidades
+persona personas gente hola gracias favor
+""".split())
+
+_PALABRA = re.compile(r'\w+')
+
+_lock = threading.Lock()
+_estado = {'indice': None, 'construido_en': 0.0, 'pendientes': set(), 'reconstruyendo': False}
+
+# Clave de `Session.info` con las actividades modificadas en la transacción en curso
+_CLAVE_SESION = 'chat_actividades_modificadas'
+
+
+def _raiz(token):
+    # Normalización mínima del plural en -s ("inclusivas" -> "inclusiva"), igual para documentos y preguntas
+    return token[:-1] if len(token) > 4 and token.endswith('s') else token
+
+
+def terminos(texto):
+    """Tokeniza un texto (sin acentos, en minúsculas y sin palabras vacías) en términos del índice."""
+    return [_raiz(token) for token in _PALABRA.findall(plegar_texto(texto))
+            if len(token) > 1 and token not in PALABRAS_VACIAS]
+
+
+class _IndiceCatalogo:
+    """
+    Vectores lnc por actividad y listas invertidas por término.
+
+    Cada actividad ocupa una posición fija; por término se guarda un diccionario {posición: peso} (para las
+    actualizaciones) y, al buscar, su versión en arreglos de numpy, que se rehace solo si el término cambió.
+    """
+
+    def __init__(self):
+        self.posiciones = {}  # id_actividad -> posición
+        self.ids = []         # posición -> id_actividad (None si se quitó)
+        self.abiertas = []    # posición -> la actividad está abierta
+        self.datos = {}       # id_actividad -> (nombre, ubicacion, fecha_actividad)
+        self.vectores = {}    # id_actividad -> {término: peso}
+        self.listas = {}      # término -> {posición: peso}
+        self._arreglos = {}   # término -> (posiciones, pesos) en numpy
+        self._cerradas = None # posiciones no abiertas en numpy
+
+    def guardar(self, actividad_id, campos, datos, abierta):
+        self.quitar(actividad_id)
+        conteos = Counter()
+        for campo, texto in campos.items():
+            for termino in terminos(texto):
+                conteos[termino] += PESOS_CAMPOS[campo]
+        pesos = {termino: 1 + math.log(conteo) for termino, conteo in conteos.items()}
+        norma = math.sqrt(sum(peso * peso for peso in pesos.values())) or 1.0
+
+        posicion = self.posiciones.get(actividad_id)
+        if posicion is None:
+            posicion = self.posiciones[actividad_id] = len(self.ids)
+            self.ids.append(actividad_id)
+            self.abiertas.append(abierta)
+        else:
+            self.abiertas[posicion] = abierta
+        self._cerradas = None
+        self.datos[actividad_id] = datos
+        self.vectores[actividad_id] = pesos
+        for termino, peso in pesos.items():
+            self.listas.setdefault(termino, {})[posicion] = peso / norma
+            self._arreglos.pop(termino, None)
+
+    def quitar(self, actividad_id):
+        posicion = self.posiciones.get(actividad_id)
+        if posicion is None:
+            return
+        for termino in self.vectores.pop(actividad_id, {}):
+            lista = self.listas.get(termino)
+            if lista is not None:
+                lista.pop(posicion, None)
+                self._arreglos.pop(termino, None)
+                if not lista:
+                    del self.listas[termino]
+        self.abiertas[posicion] = False
+        self._cerradas = None
+        self.datos.pop(actividad_id, None)
+
+    def _arreglo(self, termino):
+        arreglo = self._arreglos.get(termino)
+        if arreglo is None:
+            lista = self.listas[termino]
+            arreglo = self._arreglos[termino] = (np.fromiter(lista.keys(), dtype=np.int64, count=len(lista)),
+                                                 np.fromiter(lista.values(), dtype=np.float64, count=len(lista)))
+        return arreglo
+
+    def buscar(self, consulta, k):
+        conteos = Counter(t for t in terminos(consulta) if t in self.listas)
+        if not conteos:
+            return []
+        total = len(self.vectores)
+        pesos = {t: (1 + math.log(c)) * math.log((total + 1) / len(self.listas[t])) for t, c in conteos.items()}
+        norma = math.sqrt(sum(peso * peso for peso in pesos.values()))
+        if not norma:
+            return []
+
+        # Acumulación de q·d sobre las listas de los términos de la pregunta (en C, sin recorrer el catálogo)
+        arreglos = [self._arreglo(termino) for termino in pesos]
+        puntajes = np.bincount(np.concatenate([posiciones for posiciones, _ in arreglos]),
+                               weights=np.concatenate([pesos_doc * (pesos[termino] / norma)
+                                                       for termino, (_, pesos_doc) in zip(pesos, arreglos)]),
+                               minlength=len(self.ids))
+        if self._cerradas is None:
+            self._cerradas = np.flatnonzero(~np.array(self.abiertas, dtype=bool))
+        puntajes[self._cerradas] = 0.0
+        candidatas = np.flatnonzero(puntajes)
+        if len(candidatas) > k:
+            candidatas = candidatas[np.argpartition(puntajes[candidatas], -k)[-k:]]
+        mejores = sorted(candidatas.tolist(), key=lambda posicion: (-puntajes[posicion], self.ids[posicion]))
+        return [ResultadoChat(self.ids[posicion], *self.datos[self.ids[posicion]], round(float(puntajes[posicion]), 4))
+                for posicion in mejores]
+
+
+def _leer(actividad_ids=None):
+    """
+    Lee las actividades (todas o las indicadas) con sus discapacidades y facilidades, en tres consultas.
+
+    Returns:
+        tuple: (lista de (id_actividad, campos, datos, abierta), IDs solicitados que ya no existen).
+    """
+    query = db.session.query(Actividades.id_actividad, Actividades.nombre, Actividades.descripcion, Actividades.ubicacion,
+                             Actividades.etiqueta, Actividades.fecha_actividad, Actividades.estado)
+    discapacidades_q = db.session.query(actividad_discapacidad_table.c.actividad_id, Discapacidades.nombre) \
+        .join(Discapacidades, Discapacidades.id_discapacidad == actividad_discapacidad_table.c.discapacidad_id)
+    facilidades_q = db.session.query(actividad_facilidad_table.c.actividad_id, Facilidad.nombre_facilidad,
+                                     Facilidad.descripcion) \
+        .join(Facilidad, Facilidad.id_facilidad == actividad_facilidad_table.c.facilidad_id)
+    if actividad_ids is not None:
+        query = query.filter(Actividades.id_actividad.in_(actividad_ids))
+        discapacidades_q = discapacidades_q.filter(actividad_discapacidad_table.c.actividad_id.in_(actividad_ids))
+        facilidades_q = facilidades_q.filter(actividad_facilidad_table.c.actividad_id.in_(actividad_ids))
+
+    discapacidades = {}
+    for actividad_id, nombre in discapacidades_q:
+        nombre = getattr(nombre, 'value', nombre)
+        discapacidades.setdefault(actividad_id, []).append(
+            f"discapacidad {nombre} {SINONIMOS_DISCAPACIDAD.get(nombre, '')}")
+    facilidades = {}
+    for actividad_id, nombre, descripcion in facilidades_q:
+        facilidades.setdefault(actividad_id, []).append(f"{nombre} {descripcion or ''}")
+
+    filas = []
+    for row in query.yield_per(1000):
+        campos = {'nombre': row.nombre, 'descripcion': row.descripcion, 'ubicacion': row.ubicacion,
+                  'etiqueta': row.etiqueta, 'discapacidades': ' '.join(discapacidades.get(row.id_actividad, ())),
+                  'facilidades': ' '.join(facilidades.get(row.id_actividad, ()))}
+        filas.append((row.id_actividad, campos, (row.nombre, row.ubicacion, row.fecha_actividad),
+                      row.estado == EstadoActividad.ABIERTO))
+    eliminadas = set(actividad_ids or ()) - {actividad_id for actividad_id, _, _, _ in filas}
+    return filas, eliminadas
+
+
+def construir_indice_chat():
+    """Construye el índice completo desde la base de datos y lo publica. Devuelve el número de actividades."""
+    indice = _IndiceCatalogo()
+    filas, _ = _leer()
+    for fila in filas:
+        indice.guardar(*fila)
+    total = len(filas)
+    with _lock:
+        _estado['indice'] = indice
+        _estado['construido_en'] = time.monotonic()
+    current_app.logger.info(f"Índice del chat construido: {total} actividades, {len(indice.listas)} términos.")
+    return total
+
+
+def _reconstruir_en_segundo_plano(app):
+    try:
+        with app.app_context():
+            construir_indice_chat()
+            db.session.remove()
+    except Exception as e:
+        app.logger.error(f"Error al reconstruir el índice del chat: {e}")
+    finally:
+        with _lock:
+            _estado['reconstruyendo'] = False
+
+
+def buscar_actividades(consulta, k=3):
+    """
+    Devuelve las k actividades abiertas más relevantes para una pregunta del chat.
+
+    Returns:
+        list[ResultadoChat]: De mayor a menor puntaje; vacía si la pregunta no tiene términos del catálogo.
+    """
+    app = current_app._get_current_object()
+    with _lock:
+        indice = _estado['indice']
+        pendientes, _estado['pendientes'] = _estado['pendientes'], set()
+        vencido = time.monotonic() - _estado['construido_en'] > app.config.get('CHAT_INDEX_MAX_AGE_SECONDS', 600)
+        if indice is not None and vencido and not _estado['reconstruyendo']:
+            _estado['reconstruyendo'] = True
+            threading.Thread(target=_reconstruir_en_segundo_plano, args=(app,), name='indice-chat', daemon=True).start()
+    if indice is None:
+        construir_indice_chat()
+        indice = _estado['indice']
+    elif pendientes:
+        filas, eliminadas = _leer(list(pendientes))
+        with _lock:
+            for fila in filas:
+                indice.guardar(*fila)
+            for actividad_id in eliminadas:
+                indice.quitar(actividad_id)
+    with _lock:
+        return indice.buscar(consulta, k)
+
+
+@event.listens_for(Actividades, 'after_insert')
+@event.listens_for(Actividades, 'after_update')
+@event.listens_for(Actividades, 'after_delete')
+def _anotar_actividad(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_CLAVE_SESION, set()).add(target.id_actividad)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_cambios(session):
+    actividad_ids = session.info.pop(_CLAVE_SESION, None)
+    if actividad_ids:
+        with _lock:
+            _estado['pendientes'] |= actividad_ids
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_cambios(session, previous_transaction):
+    session.info.pop(_CLAVE_SESION, None)
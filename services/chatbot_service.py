@@ -0,0 +1,142 @@
+"""
+Motor de intenciones del chat de ayuda (evento Socket.IO `chat_message`).
+
+Las palabras clave y sinónimos de cada intención se compilan una sola vez, al importar el módulo, en un
+autómata de Aho-Corasick sobre palabras: el mensaje (sin acentos y en minúsculas, ver
+`search_service.plegar_texto`) se tokeniza y se recorre en una sola pasada, con independencia del número
+de intenciones y frases. Las frases pueden tener varias palabras ("crear cuenta") y solo coinciden con
+palabras completas ("chao" no coincide dentro de "chaolin").
+
+Si el mensaje activa varias intenciones, gana la que aparece primero en INTENCIONES. Las preguntas sobre
+programas o accesibilidad, y las que no activan ninguna intención, se responden además con las actividades
+abiertas más relevantes del índice en memoria del catálogo (`chat_retrieval_service`).
+"""
+import re
+from collections import deque, namedtuple
+
+from services.chat_retrieval_service import buscar_actividades
+from services.search_service import plegar_texto
+
+Intencion = namedtuple('Intencion', ['nombre', 'frases', 'respuesta'])
+
+# Intenciones en orden de prioridad: las informativas antes que las de cortesía ("hola, ¿qué programas hay?"
+# responde sobre programas). Las frases se escriben con acentos: se pliegan al compilar.
+INTENCIONES = (
+    Intencion('registro', ('registrarme', 'registro', 'registrar', 'crear cuenta', 'crear una cuenta', 'inscribirme',
+                           'iniciar sesión', 'contraseña'),
+              "Para participar crea tu cuenta en «Registrarse» con tu DNI y correo. Luego inicia sesión e "
+              "inscríbete desde la página de cada programa."),
+    Intencion('accesibilidad', ('accesibilidad', 'accesible', 'discapacidad', 'inclusiva', 'inclusivo', 'inclusión',
+                                'silla de ruedas', 'braille', 'intérprete', 'lengua de señas'),
+              "Muchos programas son inclusivos: en el catálogo puedes filtrar por enfoque inclusivo (auditiva, "
+              "visual o motriz) y en cada programa verás sus facilidades (rampas, intérpretes, material braille)."),
+    Intencion('programas', ('programas', 'programa', 'actividades', 'actividad', 'voluntariado', 'voluntariados',
+                            'convocatorias', 'oportunidades'),
+              "Puedes ver los programas de voluntariado en «Programas»: busca por nombre y filtra por tipo, "
+              "organización, preferencia o enfoque inclusivo."),
+    Intencion('ayuda', ('ayuda', 'ayúdame', 'ayudar', 'cómo funciona', 'no entiendo', 'información'),
+              "Puedes preguntar sobre nuestros programas de voluntariado, cómo registrarte o sobre la accesibilidad."),
+    Intencion('saludo', ('hola', 'buenas', 'buenos días', 'buenas tardes', 'buenas noches', 'qué tal', 'saludos'),
+              "¡Hola! ¿Cómo puedo ayudarte hoy?"),
+    Intencion('despedida', ('adiós', 'chao', 'chau', 'hasta luego', 'nos vemos', 'hasta pronto'),
+              "¡Hasta luego! Que tengas un buen día."),
+    Intencion('agradecimiento', ('gracias', 'muchas gracias', 'te agradezco', 'genial'),
+              "¡De nada! Estoy aquí para ayudar."),
+)
+
+RESPUESTA_POR_DEFECTO = "KonectaAI ha recibido tu mensaje: '{mensaje}'. Pronto te responderé con más inteligencia."
+
+# Intenciones (además de ninguna) cuyas preguntas se buscan en el catálogo
+INTENCIONES_CATALOGO = (None, 'programas', 'accesibilidad')
+
+_PALABRA = re.compile(r'\w+')
+
+
+def _tokens(texto):
+    return _PALABRA.findall(plegar_texto(texto))
+
+
+class _AutomataIntenciones:
+    """Autómata de Aho-Corasick cuyo alfabeto son palabras; cada estado final guarda las intenciones que acepta."""
+
+    def __init__(self, intenciones):
+        self._transiciones = [{}]  # estado -> {palabra: estado}
+        self._fallo = [0]
+        self._salida = [set()]     # estado -> posiciones (prioridad) de las intenciones reconocidas
+        for prioridad, intencion in enumerate(intenciones):
+            for frase in intencion.frases:
+                self._agregar(_tokens(frase), prioridad)
+        self._construir_fallos()
+
+    def _agregar(self, palabras, prioridad):
+        estado = 0
+        for palabra in palabras:
+            siguiente = self._transiciones[estado].get(palabra)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones[estado][palabra] = siguiente
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._salida.append(set())
+            estado = siguiente
+        self._salida[estado].add(prioridad)
+
+    def _construir_fallos(self):
+        # Recorrido en anchura: el fallo de un estado es el sufijo propio más largo que también es prefijo
+        pendientes = deque(self._transiciones[0].values())
+        while pendientes:
+            estado = pendientes.popleft()
+            for palabra, siguiente in self._transiciones[estado].items():
+                fallo = self._fallo[estado]
+                while fallo and palabra not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[siguiente] = self._transiciones[fallo].get(palabra, 0)
+                self._salida[siguiente] |= self._salida[self._fallo[siguiente]]
+                pendientes.append(siguiente)
+
+    def buscar(self, palabras):
+        """Devuelve las prioridades de todas las intenciones presentes en la secuencia de palabras."""
+        encontradas = set()
+        estado = 0
+        for palabra in palabras:
+            while estado and palabra not in self._transiciones[estado]:
+                estado = self._fallo[estado]
+            estado = self._transiciones[estado].get(palabra, 0)
+            encontradas |= self._salida[estado]
+        return encontradas
+
+
+_automata = _AutomataIntenciones(INTENCIONES)
+
+
+def detectar_intencion(mensaje):
+    """Devuelve la intención de mayor prioridad presente en el mensaje, o None si no hay ninguna."""
+    encontradas = _automata.buscar(_tokens(mensaje))
+    return INTENCIONES[min(encontradas)] if encontradas else None
+
+
+def _formatear_actividades(actividades):
+    lineas = ["Estas actividades podrían interesarte:"]
+    for actividad in actividades:
+        detalle = ', '.join(filter(None, [actividad.ubicacion, actividad.fecha_actividad.strftime('%d/%m/%Y')
+                                          if actividad.fecha_actividad else None]))
+        lineas.append(f"• {actividad.nombre}" + (f" ({detalle})" if detalle else ""))
+    return '\n'.join(lineas)
+
+
+def responder(mensaje, top_k=3):
+    """
+    Calcula la respuesta del chatbot a un mensaje.
+
+    Returns:
+        tuple: (respuesta, nombre de la intención o None si no se reconoció ninguna,
+                lista de `ResultadoChat` con las actividades sugeridas).
+    """
+    intencion = detectar_intencion(mensaje)
+    nombre = intencion.nombre if intencion else None
+    actividades = buscar_actividades(mensaje, top_k) if nombre in INTENCIONES_CATALOGO else []
+    if actividades:
+        return _formatear_actividades(actividades), nombre, actividades
+    if intencion is None:
+        return RESPUESTA_POR_DEFECTO.format(mensaje=mensaje), None, []
+    return intencion.respuesta, nombre, []
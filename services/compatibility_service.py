@@ -1,7 +1,8 @@
 from flask import current_app # Para logging
+import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-# random y numpy ya no son necesarios
+from sklearn.preprocessing import normalize
 
 # TODO: Si se implementa una llamada real a una API, podría ser necesaria la biblioteca 'requests'.
 
@@ -112,3 +113,181 @@ def get_compatibility_scores(user_profile, programs_or_activities):
 
     current_app.logger.info(f"Puntajes de compatibilidad calculados: {scores}")
     return scores
+
+
+
+def _build_user_text(user_profile):
+    """Une intereses y habilidades del perfil en un solo texto (igual que `get_compatibility_scores`)."""
+    user_interests = user_profile.get('interests', [])
+    user_skills = user_profile.get('skills', [])
+    user_interests_text = ' '.join(user_interests) if isinstance(user_interests, list) else ''
+    user_skills_text = ' '.join(user_skills) if isinstance(user_skills, list) else ''
+    return (user_interests_text + ' ' + user_skills_text).strip()
+
+
+def _apply_inclusion_adjustments(normalized_scores, user_disabilities, item_inclusive, item_supported):
+    """
+    Aplica de forma vectorizada los aumentos por inclusión: +5 si el programa es inclusivo y el
+    usuario tiene discapacidad, y +10 adicional si alguna discapacidad del usuario está soportada.
+    """
+    if not user_disabilities:
+        return normalized_scores
+    inclusive_mask = np.array(item_inclusive, dtype=bool)
+    match_mask = inclusive_mask & np.array(
+        [any(disability in supported for disability in user_disabilities) for supported in item_supported],
+        dtype=bool
+    )
+    normalized_scores = np.where(inclusive_mask, np.minimum(100.0, normalized_scores + 5.0), normalized_scores)
+    return np.where(match_mask, np.minimum(100.0, normalized_scores + 10.0), normalized_scores)
+
+
+def get_compatibility_scores_batch(user_profile, programs_or_activities):
+    """
+    Versión por lotes de `get_compatibility_scores`.
+
+    Construye un único vocabulario para todo el conjunto de candidatos, calcula la
+    similitud del coseno de todas las actividades con un solo producto matriz dispersa–vector
+    y aplica los ajustes por inclusión/discapacidad como operaciones vectorizadas.
+    Devuelve exactamente el mismo mapeo {id: puntaje} que `get_compatibility_scores`.
+
+    Args:
+        user_profile (dict): Perfil del usuario (mismo formato que `get_compatibility_scores`).
+        programs_or_activities (list): Lista de diccionarios de programas o actividades.
+
+    Returns:
+        dict: Un diccionario que mapea item_id a un puntaje de compatibilidad (0.0 a 100.0).
+    """
+    scores = {}
+    if not user_profile or not isinstance(user_profile, dict) or \
+       not programs_or_activities or not isinstance(programs_or_activities, list):
+        current_app.logger.warning("Entrada inválida para get_compatibility_scores_batch.")
+        return scores
+
+    user_text = _build_user_text(user_profile)
+
+    if not user_text:
+        current_app.logger.warning("Perfil de usuario no contiene texto para comparar (intereses/habilidades).")
+        return scores
+
+    # Cada entrada guarda (item_id, posición en la matriz) o (item_id, None) si recibe 0.0 directamente
+    entries = []
+    item_texts = []
+    item_inclusive = []
+    item_supported = []
+    for program in programs_or_activities:
+        if not isinstance(program, dict) or 'id' not in program:
+            current_app.logger.warning(f"Omitiendo item inválido (no es dict o falta 'id'): {program}")
+            continue
+
+        item_id = program.get('id')
+        program_description = program.get('description', '')
+        program_category = program.get('category', '')
+        program_description = program_description if isinstance(program_description, str) else ''
+        program_category = program_category if isinstance(program_category, str) else ''
+        program_text = (program_description + ' ' + program_category).strip()
+
+        if not program_text:
+            entries.append((item_id, None))
+            continue
+
+        supported = program.get('discapacidades_soportadas', [])
+        entries.append((item_id, len(item_texts)))
+        item_texts.append(program_text)
+        item_inclusive.append(bool(program.get('es_inclusiva', False)))
+        item_supported.append(supported if isinstance(supported, list) else [])
+
+    if not item_texts:
+        return {item_id: 0.0 for item_id, _ in entries}
+
+    try:
+        # Un solo vocabulario para el usuario y todos los candidatos
+        vectorizer = CountVectorizer()
+        X = vectorizer.fit_transform([user_text] + item_texts)
+    except ValueError:
+        # Vocabulario vacío: ningún texto contiene términos comparables
+        current_app.logger.warning("No hay términos comparables entre el usuario y las actividades.")
+        return {item_id: 0.0 for item_id, _ in entries}
+
+    user_vector = normalize(X[0:1])
+    programs_matrix = normalize(X[1:])
+    similarities = np.asarray((programs_matrix @ user_vector.T).todense()).ravel()
+
+    # Se usa round() de Python para reproducir exactamente el redondeo del cálculo individual
+    normalized_scores = np.array([round(sim * 100, 1) for sim in similarities], dtype=float)
+
+    normalized_scores = _apply_inclusion_adjustments(normalized_scores, user_profile.get('disabilities', []),
+                                                     item_inclusive, item_supported)
+
+    # Con un vocabulario individual vacío (usuario y programa sin términos) el cálculo
+    # individual falla y asigna 0.0 sin ajustes; se replica ese comportamiento.
+    if X[0].nnz == 0:
+        empty_mask = np.diff(X[1:].indptr) == 0
+        normalized_scores = np.where(empty_mask, 0.0, normalized_scores)
+
+    normalized_scores = normalized_scores.tolist()
+    for item_id, position in entries:
+        scores[item_id] = 0.0 if position is None else normalized_scores[position]
+
+    current_app.logger.info(f"Puntajes de compatibilidad calculados por lotes: {len(scores)} items.")
+    return scores
+
+
+def get_compatibility_scores_indexed(user_profile, programs_or_activities):
+    """
+    Calcula la compatibilidad usando el índice persistente de vectores de actividades.
+
+    A diferencia de `get_compatibility_scores_batch`, no necesita la descripción ni la categoría
+    de cada actividad: solo proyecta el texto del usuario contra los vectores ya indexados
+    (ver `services.activity_index_service`).
+
+    Args:
+        user_profile (dict): Perfil del usuario (mismo formato que `get_compatibility_scores`).
+        programs_or_activities (list): Lista de diccionarios con 'id' y, opcionalmente,
+                                       'es_inclusiva' y 'discapacidades_soportadas'.
+
+    Returns:
+        dict: Un diccionario que mapea item_id a un puntaje de compatibilidad (0.0 a 100.0).
+    """
+    from services.activity_index_service import project_user_text
+
+    scores = {}
+    if not user_profile or not isinstance(user_profile, dict) or \
+       not programs_or_activities or not isinstance(programs_or_activities, list):
+        current_app.logger.warning("Entrada inválida para get_compatibility_scores_indexed.")
+        return scores
+
+    user_text = _build_user_text(user_profile)
+    if not user_text:
+        current_app.logger.warning("Perfil de usuario no contiene texto para comparar (intereses/habilidades).")
+        return scores
+
+    items = []
+    for program in programs_or_activities:
+        if not isinstance(program, dict) or 'id' not in program:
+            current_app.logger.warning(f"Omitiendo item inválido (no es dict o falta 'id'): {program}")
+            continue
+        items.append(program)
+    if not items:
+        return scores
+
+    item_ids = [program.get('id') for program in items]
+    similarities, has_text, has_terms, user_without_terms = project_user_text(user_text, item_ids)
+
+    normalized_scores = np.array([round(similarities[item_id] * 100, 1) for item_id in item_ids], dtype=float)
+    supported_lists = [program.get('discapacidades_soportadas', []) for program in items]
+    normalized_scores = _apply_inclusion_adjustments(
+        normalized_scores, user_profile.get('disabilities', []),
+        [bool(program.get('es_inclusiva', False)) for program in items],
+        [supported if isinstance(supported, list) else [] for supported in supported_lists]
+    )
+
+    # Actividades sin texto (o sin términos comparables en ambos lados) reciben 0.0 sin ajustes
+    flat_zero = np.array([not has_text[item_id] or (user_without_terms and not has_terms[item_id])
+                          for item_id in item_ids], dtype=bool)
+    normalized_scores = np.where(flat_zero, 0.0, normalized_scores)
+
+    for item_id, score in zip(item_ids, normalized_scores.tolist()):
+        scores[item_id] = score
+
+    current_app.logger.info(f"Puntajes de compatibilidad calculados desde el índice: {len(scores)} items.")
+    return scores
@@ -0,0 +1,137 @@
+"""
+Almacén de puntajes de compatibilidad por (usuario, actividad).
+
+Los puntajes personales de cada voluntario se guardan en la tabla `compatibilidad_usuario_actividad`
+en lugar de la columna compartida `Actividades.compatibilidad`, de modo que los voluntarios no se
+sobrescriben entre sí ni generan bloqueos de fila sobre `actividades`:
+- Las lecturas devuelven los puntajes guardados que siguen frescos: más recientes que
+  `COMPATIBILITY_SCORE_TTL_SECONDS` y que la última actualización del vector de la actividad, y
+  calculados con el perfil actual (misma `huella_perfil`), de modo que editar las preferencias o
+  discapacidades invalida los puntajes al instante.
+- Solo se calculan los puntajes que faltan y se guardan con un único upsert por solicitud, en una
+  transacción propia: la sesión de la solicitud no se confirma (ni se expiran sus objetos cargados).
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app # Para logging
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.db import db
+from model.models import CompatibilidadUsuarioActividad, VectoresActividad
+from services.compatibility_service import get_compatibility_scores_indexed
+
+
+def huella_perfil(user_profile):
+    """Huella (SHA-1) de los datos del perfil que intervienen en el puntaje."""
+    datos = [sorted(str(valor) for valor in (user_profile.get(campo) or []))
+             for campo in ('interests', 'skills', 'disabilities')]
+    return hashlib.sha1(json.dumps(datos, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def obtener_puntajes_frescos(user_id, activity_ids, huella=None):
+    """
+    Devuelve los puntajes guardados y todavía vigentes de un usuario.
+
+    Args:
+        user_id (int): ID del usuario.
+        activity_ids (list): IDs de las actividades a consultar.
+        huella (str): Huella del perfil actual (`huella_perfil`); si se indica, los puntajes
+                      calculados con otro perfil no se consideran frescos.
+
+    Returns:
+        dict: {id_actividad: puntaje (float)} solo para los puntajes frescos.
+    """
+    if not activity_ids:
+        return {}
+    ttl = current_app.config.get('COMPATIBILITY_SCORE_TTL_SECONDS', 900)
+    limite = datetime.utcnow() - timedelta(seconds=ttl)
+    query = db.session.query(CompatibilidadUsuarioActividad.id_actividad, CompatibilidadUsuarioActividad.score) \
+        .outerjoin(VectoresActividad, VectoresActividad.id_actividad == CompatibilidadUsuarioActividad.id_actividad) \
+        .filter(CompatibilidadUsuarioActividad.id_usuario == user_id,
+                CompatibilidadUsuarioActividad.id_actividad.in_(activity_ids),
+                CompatibilidadUsuarioActividad.fecha_calculo >= limite,
+                (VectoresActividad.fecha_actualizacion == None) |
+                (VectoresActividad.fecha_actualizacion <= CompatibilidadUsuarioActividad.fecha_calculo))
+    if huella is not None:
+        query = query.filter(CompatibilidadUsuarioActividad.huella_perfil == huella)
+    rows = query.all()
+    return {row.id_actividad: float(row.score) for row in rows}
+
+
+def guardar_puntajes(user_id, scores, huella=None, connection=None):
+    """
+    Guarda (insertando o actualizando) los puntajes de un usuario con una sola sentencia.
+
+    No confirma la transacción; el llamador decide cuándo hacer commit.
+
+    Args:
+        user_id (int): ID del usuario.
+        scores (dict): {id_actividad: puntaje}.
+        huella (str): Huella del perfil con que se calcularon (`huella_perfil`).
+        connection: Conexión donde escribir; por defecto la sesión actual.
+    """
+    if not scores:
+        return
+    ejecutor = connection if connection is not None else db.session
+    now = datetime.utcnow()
+    rows = [{'id_usuario': user_id, 'id_actividad': activity_id, 'score': round(float(score), 2), 'fecha_calculo': now,
+             'huella_perfil': huella}
+            for activity_id, score in scores.items()]
+    table = CompatibilidadUsuarioActividad.__table__
+    dialect = (connection.dialect if connection is not None else db.session.get_bind().dialect).name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id_usuario, table.c.id_actividad],
+            set_={'score': stmt.excluded.score, 'fecha_calculo': stmt.excluded.fecha_calculo,
+                  'huella_perfil': stmt.excluded.huella_perfil}
+        )
+        ejecutor.execute(stmt)
+    else:
+        ejecutor.execute(table.delete().where(table.c.id_usuario == user_id,
+                                              table.c.id_actividad.in_(list(scores))))
+        ejecutor.execute(table.insert(), rows)
+
+
+def get_compatibility_scores_cached(user_profile, programs_or_activities):
+    """
+    Calcula la compatibilidad reutilizando los puntajes frescos del almacén.
+
+    Recibe los mismos argumentos que `get_compatibility_scores_indexed`. Solo calcula los puntajes
+    de las actividades sin puntaje vigente y los guarda con un único upsert.
+
+    Returns:
+        dict: Un diccionario que mapea item_id a un puntaje de compatibilidad (0.0 a 100.0),
+              en el mismo orden que `programs_or_activities`.
+    """
+    user_id = user_profile.get('id') if isinstance(user_profile, dict) else None
+    if user_id is None or not isinstance(programs_or_activities, list):
+        return get_compatibility_scores_indexed(user_profile, programs_or_activities)
+
+    item_ids = [item.get('id') for item in programs_or_activities if isinstance(item, dict) and 'id' in item]
+    huella = huella_perfil(user_profile)
+    stored = obtener_puntajes_frescos(user_id, item_ids, huella)
+    missing_items = [item for item in programs_or_activities
+                     if isinstance(item, dict) and 'id' in item and item['id'] not in stored]
+
+    computed = {}
+    if missing_items:
+        computed = get_compatibility_scores_indexed(user_profile, missing_items)
+        try:
+            with db.engine.begin() as connection:
+                guardar_puntajes(user_id, computed, huella, connection)
+            current_app.logger.info(f"{len(computed)} puntajes de compatibilidad guardados para el usuario {user_id}.")
+        except Exception as e:
+            current_app.logger.error(f"Error al guardar puntajes de compatibilidad: {e}")
+
+    scores = {}
+    for item_id in item_ids:
+        score = computed.get(item_id, stored.get(item_id))
+        if score is not None:
+            scores[item_id] = score
+    return scores
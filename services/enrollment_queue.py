@@ -0,0 +1,192 @@
+"""
+Modo de inscripción en cola para lanzamientos de alta demanda.
+
+Con `ENROLLMENT_QUEUE_ENABLED` activo, `POST /program/<id>/enroll` no abre una transacción por
+solicitud: la solicitud se agrega a una cola en memoria de la actividad y se devuelve de inmediato
+un ticket. Un único consumidor (hilo) por actividad procesa la cola en lotes de hasta
+`ENROLLMENT_QUEUE_BATCH_SIZE` solicitudes con una sola transacción por lote: reserva de una vez los
+cupos disponibles y deja al resto en lista de espera (`estado_inscripcion='en_espera'`). El resultado
+se consulta con `obtener_ticket` (endpoint de sondeo).
+
+La cola y los tickets viven en el proceso (sustituto local de un broker): con varios procesos, el
+sondeo debe llegar al mismo proceso que recibió la solicitud (sesiones persistentes).
+"""
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app # Para logging
+from sqlalchemy.exc import IntegrityError
+
+from database.db import db
+from model.models import Actividades, EstadoActividad, Inscripciones
+from services.enrollment_service import (ESTADO_CANCELADA, ESTADO_CONFIRMADA, ESTADO_EN_ESPERA, EN_ESPERA, INSCRITO,
+                                         NO_ABIERTA, NO_ENCONTRADA, YA_INSCRITO, _reactivar, _reservar_cupo,
+                                         inscribir_usuario)
+from services.seat_updates import notificar_cupos
+
+# Estados de un ticket
+TICKET_PENDIENTE = 'pendiente'
+TICKET_PROCESADO = 'procesado'
+TICKET_ERROR = 'error'
+
+# Segundos sin solicitudes tras los cuales termina el consumidor de una actividad
+ESPERA_CONSUMIDOR = 30
+
+# Reintentos de la reserva de cupos de un lote si otras inscripciones cambian el contador a la vez
+REINTENTOS_RESERVA = 5
+
+_lock = threading.Lock()
+_colas = {}      # id_actividad -> queue.Queue de (ticket, id_usuario)
+_tickets = {}    # ticket -> dict con estado, resultado, id_usuario, id_actividad y creado
+_ultima_limpieza = [0.0]
+
+
+def encolar_inscripcion(user_id, activity_id):
+    """
+    Agrega una solicitud de inscripción a la cola de la actividad y devuelve su ticket.
+
+    Crea el consumidor de la actividad si no está en marcha.
+    """
+    app = current_app._get_current_object()
+    ticket = uuid.uuid4().hex
+    with _lock:
+        _limpiar_tickets(app.config.get('ENROLLMENT_TICKET_TTL_SECONDS', 600))
+        _tickets[ticket] = {'estado': TICKET_PENDIENTE, 'resultado': None, 'id_usuario': user_id,
+                            'id_actividad': activity_id, 'creado': time.monotonic()}
+        cola = _colas.get(activity_id)
+        if cola is None:
+            cola = _colas[activity_id] = queue.Queue()
+            threading.Thread(target=_consumir, args=(app, activity_id, cola),
+                             name=f"inscripciones-{activity_id}", daemon=True).start()
+        cola.put((ticket, user_id))
+    return ticket
+
+
+def obtener_ticket(ticket):
+    """Devuelve una copia del estado del ticket, o None si no existe o ya expiró."""
+    with _lock:
+        info = _tickets.get(ticket)
+        return dict(info) if info else None
+
+
+def _limpiar_tickets(ttl):
+    # Se ejecuta como máximo una vez por minuto, con `_lock` tomado
+    now = time.monotonic()
+    if now - _ultima_limpieza[0] < 60:
+        return
+    _ultima_limpieza[0] = now
+    for ticket in [t for t, info in _tickets.items() if info['estado'] != TICKET_PENDIENTE and now - info['creado'] > ttl]:
+        del _tickets[ticket]
+
+
+def _consumir(app, activity_id, cola):
+    """Bucle del consumidor de una actividad: toma lotes de la cola y los procesa en orden de llegada."""
+    batch_size = app.config.get('ENROLLMENT_QUEUE_BATCH_SIZE', 50)
+    with app.app_context():
+        while True:
+            try:
+                lote = [cola.get(timeout=ESPERA_CONSUMIDOR)]
+            except queue.Empty:
+                with _lock:
+                    if cola.empty():
+                        del _colas[activity_id]
+                        return
+                continue
+            while len(lote) < batch_size:
+                try:
+                    lote.append(cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                resultados = _procesar_lote(activity_id, [user_id for _, user_id in lote])
+                estado = TICKET_PROCESADO
+            except Exception as e:
+                app.logger.error(f"Error al procesar un lote de inscripciones de la actividad {activity_id}: {e}")
+                resultados, estado = [None] * len(lote), TICKET_ERROR
+            finally:
+                db.session.remove()
+
+            if INSCRITO in resultados:
+                notificar_cupos(activity_id)
+            with _lock:
+                for (ticket, _), resultado in zip(lote, resultados):
+                    if ticket in _tickets:
+                        _tickets[ticket].update(estado=estado, resultado=resultado)
+
+
+def _procesar_lote(activity_id, user_ids):
+    """
+    Procesa un lote de solicitudes de una actividad en una sola transacción.
+
+    Returns:
+        list: Resultado de cada solicitud (INSCRITO, EN_ESPERA, YA_INSCRITO, NO_ABIERTA o NO_ENCONTRADA),
+              en el orden de `user_ids`.
+    """
+    existing = {row.id_usuario: row for row in
+                db.session.query(Inscripciones.id_usuario, Inscripciones.id_inscripcion, Inscripciones.estado_inscripcion)
+                .filter(Inscripciones.id_actividad == activity_id, Inscripciones.id_usuario.in_(set(user_ids))).all()}
+
+    resultados = [None] * len(user_ids)
+    nuevos = []  # posiciones del lote que necesitan una inscripción
+    vistos = set()
+    for position, user_id in enumerate(user_ids):
+        row = existing.get(user_id)
+        if user_id in vistos or (row and row.estado_inscripcion != ESTADO_CANCELADA):
+            resultados[position] = YA_INSCRITO
+        else:
+            vistos.add(user_id)
+            nuevos.append(position)
+    if not nuevos:
+        return resultados
+
+    for _ in range(REINTENTOS_RESERVA):
+        actividad = db.session.query(Actividades.estado, Actividades.cupo_maximo, Actividades.inscritos) \
+            .filter(Actividades.id_actividad == activity_id).first()
+        if actividad is None or actividad.estado != EstadoActividad.ABIERTO:
+            motivo = NO_ENCONTRADA if actividad is None else NO_ABIERTA
+            for position in nuevos:
+                resultados[position] = motivo
+            db.session.rollback()
+            return resultados
+
+        libres = len(nuevos) if actividad.cupo_maximo is None else max(0, actividad.cupo_maximo - (actividad.inscritos or 0))
+        seats = min(libres, len(nuevos))
+        if seats == 0 or _reservar_cupo(activity_id, seats):
+            break
+        # El contador cambió entre la lectura y la reserva (inscripciones directas): volver a leer
+        db.session.rollback()
+    else:
+        return _procesar_uno_a_uno(activity_id, user_ids, nuevos, resultados)
+
+    try:
+        for index, position in enumerate(nuevos):
+            user_id = user_ids[position]
+            estado = ESTADO_CONFIRMADA if index < seats else ESTADO_EN_ESPERA
+            row = existing.get(user_id)
+            if row:
+                if not _reactivar(row.id_inscripcion, estado):
+                    raise _ConflictoInscripcion()
+            else:
+                db.session.add(Inscripciones(id_usuario=user_id, id_actividad=activity_id,
+                                             estado_inscripcion=estado, fecha_inscripcion=datetime.utcnow()))
+            resultados[position] = INSCRITO if estado == ESTADO_CONFIRMADA else EN_ESPERA
+        db.session.commit()
+    except (IntegrityError, _ConflictoInscripcion):
+        # Alguna inscripción directa del mismo usuario llegó antes: se procesa el lote uno a uno
+        db.session.rollback()
+        return _procesar_uno_a_uno(activity_id, user_ids, nuevos, resultados)
+    return resultados
+
+
+class _ConflictoInscripcion(Exception):
+    """Una inscripción del lote cambió de estado mientras se procesaba."""
+
+
+def _procesar_uno_a_uno(activity_id, user_ids, positions, resultados):
+    for position in positions:
+        resultados[position] = inscribir_usuario(user_ids[position], activity_id)
+    return resultados
@@ -0,0 +1,235 @@
+"""
+Módulo de servicio para las inscripciones a actividades.
+
+La reserva de cupo se hace con un contador desnormalizado (`Actividades.inscritos`) que se incrementa
+con un `UPDATE` condicional en la misma transacción que inserta la inscripción:
+
+    UPDATE actividades SET inscritos = inscritos + 1
+    WHERE id_actividad = :id AND estado = 'abierto' AND (cupo_maximo IS NULL OR inscritos < cupo_maximo)
+
+La base de datos serializa las actualizaciones de la misma fila, de modo que nunca se supera el cupo
+aunque muchos voluntarios se inscriban a la vez, y la restricción única (id_usuario, id_actividad)
+impide inscripciones duplicadas. Si la inserción falla, el rollback deshace también el incremento.
+
+Cuando no queda cupo, la inscripción se guarda con `estado_inscripcion='en_espera'` (lista de espera).
+Al cancelar una inscripción confirmada se libera el cupo y se promueve automáticamente a las personas
+en espera, en orden de llegada (`promover_lista_espera`).
+"""
+from datetime import datetime
+
+from flask import current_app # Para logging
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from database.db import db
+from model.models import Actividades, EstadoActividad, Inscripciones, Notificaciones
+
+# Valores de Inscripciones.estado_inscripcion (solo las confirmadas ocupan cupo)
+ESTADO_CONFIRMADA = 'confirmada'
+ESTADO_EN_ESPERA = 'en_espera'
+ESTADO_CANCELADA = 'cancelada'
+
+# Resultados de `inscribir_usuario` y `cancelar_inscripcion`
+INSCRITO = 'inscrito'
+EN_ESPERA = 'en_espera'
+YA_INSCRITO = 'ya_inscrito'
+NO_ABIERTA = 'no_abierta'
+NO_ENCONTRADA = 'no_encontrada'
+CANCELADA = 'cancelada'
+NO_INSCRITO = 'no_inscrito'
+
+
+def _reservar_cupo(activity_id, seats=1):
+    """Incrementa `inscritos` en `seats` si la actividad está abierta y tiene cupo; devuelve True si se reservó."""
+    table = Actividades.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id_actividad == activity_id,
+               table.c.estado == EstadoActividad.ABIERTO,
+               (table.c.cupo_maximo == None) | (table.c.inscritos + seats <= table.c.cupo_maximo))
+        .values(inscritos=table.c.inscritos + seats)
+    )
+    return result.rowcount == 1
+
+
+def _liberar_cupo(activity_id):
+    table = Actividades.__table__
+    db.session.execute(table.update()
+                       .where(table.c.id_actividad == activity_id, table.c.inscritos > 0)
+                       .values(inscritos=table.c.inscritos - 1))
+
+
+def _motivo_rechazo(activity_id):
+    """Devuelve NO_ENCONTRADA, NO_ABIERTA o, si la actividad está abierta (sin cupo), EN_ESPERA."""
+    estado = db.session.query(Actividades.estado).filter(Actividades.id_actividad == activity_id).scalar()
+    if estado is None:
+        return NO_ENCONTRADA
+    if estado != EstadoActividad.ABIERTO:
+        return NO_ABIERTA
+    return EN_ESPERA
+
+
+def _reactivar(inscripcion_id, estado):
+    """Reutiliza una inscripción cancelada (la restricción única impide crear otra fila para el mismo par)."""
+    table = Inscripciones.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id_inscripcion == inscripcion_id, table.c.estado_inscripcion == ESTADO_CANCELADA)
+        .values(estado_inscripcion=estado, fecha_inscripcion=datetime.utcnow())
+    )
+    return result.rowcount == 1
+
+
+def inscribir_usuario(user_id, activity_id):
+    """
+    Inscribe a un usuario en una actividad de forma atómica.
+
+    Si la actividad está abierta pero sin cupo, el usuario queda en lista de espera.
+
+    Args:
+        user_id (int): ID del voluntario.
+        activity_id (int): ID de la actividad.
+
+    Returns:
+        str: Uno de INSCRITO, EN_ESPERA, YA_INSCRITO, NO_ABIERTA o NO_ENCONTRADA.
+    """
+    # Comprobación previa barata (índice único); la restricción cubre las carreras entre solicitudes
+    existing = db.session.query(Inscripciones.id_inscripcion, Inscripciones.estado_inscripcion) \
+        .filter_by(id_usuario=user_id, id_actividad=activity_id).first()
+    if existing and existing.estado_inscripcion != ESTADO_CANCELADA:
+        return YA_INSCRITO
+
+    try:
+        if _reservar_cupo(activity_id):
+            estado, resultado = ESTADO_CONFIRMADA, INSCRITO
+        else:
+            resultado = _motivo_rechazo(activity_id)
+            if resultado != EN_ESPERA:
+                db.session.rollback()
+                return resultado
+            estado = ESTADO_EN_ESPERA
+
+        if existing:
+            if not _reactivar(existing.id_inscripcion, estado):
+                db.session.rollback()
+                return YA_INSCRITO
+        else:
+            db.session.add(Inscripciones(id_usuario=user_id, id_actividad=activity_id, estado_inscripcion=estado))
+        db.session.commit()
+        return resultado
+    except IntegrityError:
+        # Otra solicitud del mismo usuario se inscribió primero; el rollback libera el cupo reservado
+        db.session.rollback()
+        return YA_INSCRITO
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def cancelar_inscripcion(user_id, activity_id):
+    """
+    Cancela la inscripción (confirmada o en espera) de un usuario.
+
+    Si estaba confirmada, libera su cupo y promueve a la lista de espera.
+
+    Returns:
+        str: CANCELADA o NO_INSCRITO.
+    """
+    existing = db.session.query(Inscripciones.id_inscripcion, Inscripciones.estado_inscripcion) \
+        .filter_by(id_usuario=user_id, id_actividad=activity_id).first()
+    if not existing or existing.estado_inscripcion == ESTADO_CANCELADA:
+        return NO_INSCRITO
+
+    table = Inscripciones.__table__
+    try:
+        # Condicionado al estado leído: dos cancelaciones simultáneas no liberan el cupo dos veces
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id_inscripcion == existing.id_inscripcion,
+                   table.c.estado_inscripcion == existing.estado_inscripcion)
+            .values(estado_inscripcion=ESTADO_CANCELADA)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return NO_INSCRITO
+        if existing.estado_inscripcion == ESTADO_CONFIRMADA:
+            _liberar_cupo(activity_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if existing.estado_inscripcion == ESTADO_CONFIRMADA:
+        promover_lista_espera(activity_id)
+    return CANCELADA
+
+
+def promover_lista_espera(activity_id):
+    """
+    Confirma a las personas en lista de espera, en orden de llegada, mientras haya cupo.
+
+    Cada promoción reserva el cupo y cambia el estado en una transacción propia, y notifica al usuario.
+
+    Returns:
+        list: IDs de los usuarios promovidos.
+    """
+    table = Inscripciones.__table__
+    promoted = []
+    while True:
+        try:
+            if not _reservar_cupo(activity_id):
+                db.session.rollback()
+                break
+            candidate = db.session.query(Inscripciones.id_inscripcion, Inscripciones.id_usuario) \
+                .filter(Inscripciones.id_actividad == activity_id,
+                        Inscripciones.estado_inscripcion == ESTADO_EN_ESPERA) \
+                .order_by(Inscripciones.fecha_inscripcion, Inscripciones.id_inscripcion).first()
+            if candidate is None:
+                db.session.rollback()
+                break
+            result = db.session.execute(
+                table.update()
+                .where(table.c.id_inscripcion == candidate.id_inscripcion,
+                       table.c.estado_inscripcion == ESTADO_EN_ESPERA)
+                .values(estado_inscripcion=ESTADO_CONFIRMADA)
+            )
+            if result.rowcount != 1:
+                # Otro proceso promovió o canceló a esta persona; se libera el cupo reservado y se reintenta
+                db.session.rollback()
+                continue
+            nombre = db.session.query(Actividades.nombre).filter(Actividades.id_actividad == activity_id).scalar()
+            db.session.add(Notificaciones(id_usuario=candidate.id_usuario, prioridad='alta',
+                                          mensaje=f"Se liberó un cupo en '{nombre}': tu inscripción pasó de la lista de espera a confirmada."))
+            db.session.commit()
+            promoted.append(candidate.id_usuario)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error al promover la lista de espera de la actividad {activity_id}: {e}")
+            break
+
+    if promoted:
+        current_app.logger.info(f"Actividad {activity_id}: {len(promoted)} usuario(s) promovidos desde la lista de espera.")
+    return promoted
+
+
+def recalcular_inscritos(activity_ids=None):
+    """
+    Recalcula `Actividades.inscritos` desde las inscripciones confirmadas con un solo UPDATE correlacionado.
+
+    Se usa tras cargas masivas que insertan inscripciones directamente (p. ej. los datos iniciales).
+
+    Returns:
+        int: Número de actividades actualizadas.
+    """
+    table = Actividades.__table__
+    confirmadas = select(func.count(Inscripciones.id_inscripcion)) \
+        .where(Inscripciones.id_actividad == table.c.id_actividad,
+               Inscripciones.estado_inscripcion == ESTADO_CONFIRMADA) \
+        .scalar_subquery()
+    stmt = table.update().values(inscritos=confirmadas)
+    if activity_ids is not None:
+        stmt = stmt.where(table.c.id_actividad.in_(activity_ids))
+    result = db.session.execute(stmt)
+    db.session.commit()
+    current_app.logger.info(f"Contador de inscritos recalculado para {result.rowcount} actividades.")
+    return result.rowcount
@@ -0,0 +1,213 @@
+"""
+Registro en disco de versiones del modelo de participación.
+
+Cada modelo entrenado se serializa con joblib en la carpeta de instancia de la aplicación
+(`instance/modelos_participacion/`), bajo un número de versión y el hash SHA-256 de su contenido,
+junto con un archivo de metadatos (filas de entrenamiento, métricas, nombres de características).
+El archivo `latest.json` apunta a la versión más reciente y se reemplaza de forma atómica, de modo
+que cada proceso worker puede cargar el último modelo al arrancar y detectar versiones nuevas
+publicadas por otros procesos con una simple llamada a `os.stat`.
+
+El número de versión se asigna bajo un bloqueo de archivo (`.registro.lock`, con `fcntl.flock`), de
+modo que dos procesos que publican a la vez no reutilizan el mismo número. En plataformas sin `fcntl`
+(Windows) solo se serializan los hilos del proceso y dos procesos podrían publicar con el mismo
+número de versión; el hash en el nombre del archivo evita que se pisen.
+
+Tras publicar se conservan las últimas `MODEL_REGISTRY_KEEP_VERSIONS` versiones (por defecto 5) y se
+eliminan los archivos .joblib, .json y .dot de las anteriores.
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+import joblib
+from flask import current_app # Para logging
+
+DIRECTORIO_MODELOS = 'modelos_participacion'
+ARCHIVO_ULTIMA_VERSION = 'latest.json'
+ARCHIVO_BLOQUEO = '.registro.lock'
+_PATRON_VERSION = re.compile(r'^v(\d+)-([0-9a-f]+)\.(?:joblib|json)$')
+
+_lock = threading.Lock()
+_latest_cache = {'mtime_ns': None, 'metadata': None}
+
+
+def _registry_dir():
+    path = os.path.join(current_app.instance_path, DIRECTORIO_MODELOS)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _atomic_write(path, data):
+    """Escribe `data` (bytes) en un archivo temporal del mismo directorio y lo renombra sobre `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def _bloqueo_registro(registry_dir):
+    """Serializa la publicación de versiones entre hilos y, donde hay `fcntl`, entre procesos."""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(registry_dir, ARCHIVO_BLOQUEO), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def obtener_version_mas_reciente():
+    """
+    Devuelve los metadatos de la versión más reciente del registro, o None si está vacío.
+
+    El contenido de `latest.json` solo se vuelve a leer cuando cambia su fecha de modificación.
+    """
+    latest_path = os.path.join(_registry_dir(), ARCHIVO_ULTIMA_VERSION)
+    try:
+        mtime_ns = os.stat(latest_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        if _latest_cache['mtime_ns'] != mtime_ns:
+            try:
+                with open(latest_path, encoding='utf-8') as latest_file:
+                    _latest_cache['metadata'] = json.load(latest_file)
+                _latest_cache['mtime_ns'] = mtime_ns
+            except (OSError, ValueError) as e:
+                current_app.logger.error(f"Error al leer {latest_path}: {e}")
+                return _latest_cache['metadata']
+        return _latest_cache['metadata']
+
+
+def registrar_modelo(modelo, metadata):
+    """
+    Serializa un modelo entrenado y lo publica como la nueva versión más reciente.
+
+    Args:
+        modelo: Estimador de scikit-learn ya entrenado.
+        metadata (dict): Metadatos serializables en JSON (p. ej. 'entrenado_en', 'filas_entrenamiento',
+                         'metricas', 'feature_names').
+
+    Returns:
+        dict: Los metadatos completados con 'version', 'hash' y 'archivo'.
+    """
+    registry_dir = _registry_dir()
+    fd, tmp_path = tempfile.mkstemp(dir=registry_dir, prefix='.tmp-', suffix='.joblib')
+    os.close(fd)
+    try:
+        joblib.dump(modelo, tmp_path)
+        with open(tmp_path, 'rb') as model_file:
+            content_hash = hashlib.sha256(model_file.read()).hexdigest()
+
+        with _bloqueo_registro(registry_dir):
+            latest = _read_latest_unlocked(registry_dir)
+            version = (latest['version'] if latest else 0) + 1
+            file_name = f"v{version:04d}-{content_hash[:12]}.joblib"
+            os.replace(tmp_path, os.path.join(registry_dir, file_name))
+
+            metadata = dict(metadata, version=version, hash=content_hash, archivo=file_name)
+            payload = json.dumps(metadata, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+            _atomic_write(os.path.join(registry_dir, f"v{version:04d}-{content_hash[:12]}.json"), payload)
+            # Publicar al final: los demás procesos solo ven la versión cuando ya está completa en disco
+            _atomic_write(os.path.join(registry_dir, ARCHIVO_ULTIMA_VERSION), payload)
+            _podar_versiones(registry_dir, version, current_app.config.get('MODEL_REGISTRY_KEEP_VERSIONS', 5))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    current_app.logger.info(f"Modelo de participación registrado: versión {version} ({content_hash[:12]}).")
+    return metadata
+
+
+def _podar_versiones(registry_dir, latest_version, keep):
+    """Elimina los archivos de las versiones anteriores a las últimas `keep`. Requiere el bloqueo del registro."""
+    if keep < 1:
+        return
+    min_version = latest_version - keep + 1
+    kept_hashes = set()
+    to_remove = []
+    for file_name in os.listdir(registry_dir):
+        match = _PATRON_VERSION.match(file_name)
+        if not match:
+            continue
+        if int(match.group(1)) >= min_version:
+            kept_hashes.add(match.group(2))
+        else:
+            to_remove.append(file_name)
+    # El .dot se nombra con el hash completo; los archivos de versión, con sus primeros 12 caracteres
+    for path in glob.glob(os.path.join(registry_dir, 'arbol-*.dot')):
+        if os.path.basename(path)[len('arbol-'):][:12] not in kept_hashes:
+            to_remove.append(os.path.basename(path))
+
+    for file_name in to_remove:
+        try:
+            os.remove(os.path.join(registry_dir, file_name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            current_app.logger.warning(f"No se pudo eliminar la versión antigua {file_name} del registro: {e}")
+    if to_remove:
+        current_app.logger.info(f"Registro de modelos: {len(to_remove)} archivos de versiones anteriores a la {min_version} eliminados.")
+
+
+def _read_latest_unlocked(registry_dir):
+    try:
+        with open(os.path.join(registry_dir, ARCHIVO_ULTIMA_VERSION), encoding='utf-8') as latest_file:
+            return json.load(latest_file)
+    except (OSError, ValueError):
+        return None
+
+
+def ruta_modelo(metadata):
+    """Devuelve la ruta absoluta del archivo joblib de una versión del registro."""
+    return os.path.join(_registry_dir(), metadata['archivo'])
+
+
+def ruta_arbol(metadata):
+    """Devuelve la ruta del artefacto .dot del árbol de decisión de una versión, nombrado por su hash."""
+    return os.path.join(_registry_dir(), f"arbol-{metadata['hash']}.dot")
+
+
+def cargar_modelo(metadata):
+    """
+    Carga desde disco el estimador de una versión del registro.
+
+    Args:
+        metadata (dict): Metadatos de la versión (según `obtener_version_mas_reciente`).
+
+    Returns:
+        El estimador deserializado, o None si el archivo no existe o su hash no coincide.
+    """
+    path = ruta_modelo(metadata)
+    try:
+        with open(path, 'rb') as model_file:
+            content = model_file.read()
+    except OSError as e:
+        current_app.logger.error(f"No se pudo leer el modelo {path}: {e}")
+        return None
+
+    if hashlib.sha256(content).hexdigest() != metadata.get('hash'):
+        current_app.logger.error(f"El hash del modelo {path} no coincide con sus metadatos.")
+        return None
+    return joblib.load(path)
@@ -2,23 +2,75 @@
 Módulo de servicio para predecir los niveles de participación en actividades.
 
 Este módulo proporciona funciones para:
-- Extraer características para una actividad dada (`obtener_features`).
-- Entrenar un modelo RandomForest y predecir la probabilidad de alta participación
-  para una actividad específica (`predecir_participacion`).
+- Extraer características para varias actividades con una sola consulta (`obtener_features_bulk`)
+  o para una actividad dada (`obtener_features`).
+- Entrenar un modelo RandomForest una sola vez, mantenerlo en caché y predecir la
+  probabilidad de alta participación para una actividad específica (`predecir_participacion`)
+  o para varias actividades a la vez (`predecir_participacion_batch`).
 """
+import os
+import tempfile
+import threading
+from datetime import datetime
 from flask import current_app # Para logging
+from sqlalchemy import event, inspect as sa_inspect
 from model.models import Inscripciones, Actividades, db
+from services.model_registry import obtener_version_mas_reciente, registrar_modelo, cargar_modelo, ruta_modelo, ruta_arbol
+from services.prediction_executor import (get_executor, esperar_resultado, ajustar_modelo,
+                                          enviar_entrenamiento, enviar_puntuacion)
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import export_graphviz
-from sklearn.model_selection import train_test_split
+
+FEATURE_NAMES = ['current_inscriptions', 'cupo_maximo', 'historico_similar', 'habilidades_voluntarios']
+
+def obtener_features_bulk(actividad_ids=None):
+    """
+    Obtiene las características (features) de varias actividades con una sola consulta agregada.
+
+    Usa un `LEFT OUTER JOIN` de actividades con inscripciones agrupado por `id_actividad`,
+    de modo que el costo en consultas es constante sin importar cuántas actividades se pidan.
+
+    Args:
+        actividad_ids (iterable, opcional): IDs de las actividades. Si es None, se obtienen
+                                            las características de todas las actividades.
+
+    Returns:
+        pandas.DataFrame: Un DataFrame indexado por `id_actividad` con las columnas de
+                          `FEATURE_NAMES` (ver `obtener_features`). Las actividades que no
+                          existen simplemente no aparecen.
+    """
+    # `inscritos` solo cuenta las inscripciones confirmadas (no la lista de espera ni las canceladas)
+    query = db.session.query(
+        Actividades.id_actividad,
+        Actividades.cupo_maximo,
+        Actividades.inscritos.label('current_inscriptions')
+    )
+
+    if actividad_ids is not None:
+        actividad_ids = list(actividad_ids)
+        if not actividad_ids:
+            return pd.DataFrame(columns=FEATURE_NAMES).rename_axis('id_actividad')
+        query = query.filter(Actividades.id_actividad.in_(actividad_ids))
+
+    rows = query.order_by(Actividades.id_actividad).all()
+    features_df = pd.DataFrame(
+        [{'id_actividad': row.id_actividad,
+          'current_inscriptions': row.current_inscriptions,
+          'cupo_maximo': row.cupo_maximo} for row in rows],
+        columns=['id_actividad', 'current_inscriptions', 'cupo_maximo']
+    ).set_index('id_actividad')
+
+    # Placeholders, igual que en la versión por actividad
+    features_df['historico_similar'] = 0.5
+    features_df['habilidades_voluntarios'] = 3
+    return features_df[FEATURE_NAMES]
 
 def obtener_features(actividad_id):
     """
     Obtiene y calcula características (features) de una actividad específica.
 
     Estas características se utilizan como entrada para el modelo de predicción
-    de participación.
+    de participación. Es un envoltorio de `obtener_features_bulk` para una sola actividad.
 
     Args:
         actividad_id (int): El ID de la actividad para la cual obtener características.
@@ -34,24 +86,304 @@ def obtener_features(actividad_id):
                                                requeridas/disponibles (actualmente 3).
         Retorna None si la actividad no se encuentra.
     """
-    actividad = Actividades.query.get(actividad_id)
-    if not actividad:
+    features_df = obtener_features_bulk([actividad_id])
+    if features_df.empty:
         current_app.logger.warning(f"Actividad con ID {actividad_id} no encontrada.")
         return None
 
-    cupo_maximo = actividad.cupo_maximo
-    current_inscriptions = Inscripciones.query.filter_by(id_actividad=actividad_id).count()
+    row = features_df.iloc[0]
+    return {
+        "current_inscriptions": int(row['current_inscriptions']),
+        "cupo_maximo": None if pd.isna(row['cupo_maximo']) else int(row['cupo_maximo']),
+        "historico_similar": float(row['historico_similar']),
+        "habilidades_voluntarios": int(row['habilidades_voluntarios'])
+    }
+
+class _ParticipationModelCache:
+    """
+    Caché en memoria del modelo de participación entrenado.
+
+    Los modelos entrenados se publican en el registro en disco (`services.model_registry`) y cada
+    proceso adopta la versión más reciente del registro en cuanto aparece, sin re-entrenar.
+    El modelo se entrena una sola vez y se reutiliza para todas las predicciones hasta que:
+    - el número de cambios en `Inscripciones`/`Actividades` desde el último entrenamiento
+      alcance el umbral `PARTICIPATION_MODEL_RETRAIN_THRESHOLD`, o
+    - la antigüedad del modelo supere `PARTICIPATION_MODEL_MAX_AGE_SECONDS`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entry = None
+        self._pending = None
+        self.changes_since_training = 0
+
+    def record_change(self):
+        self.changes_since_training += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.entry = None
+
+    def is_stale(self):
+        if self.entry is None:
+            return True
+        threshold = current_app.config.get('PARTICIPATION_MODEL_RETRAIN_THRESHOLD', 20)
+        max_age = current_app.config.get('PARTICIPATION_MODEL_MAX_AGE_SECONDS', 3600)
+        age = (datetime.utcnow() - self.entry['entrenado_en']).total_seconds()
+        return self.changes_since_training >= threshold or age >= max_age
+
+    def refresh_from_registry(self):
+        """
+        Carga la versión más reciente del registro en disco si es más nueva que la que está en memoria.
+
+        La nueva entrada se construye por completo antes de asignarla, de modo que el cambio de
+        modelo es atómico para las solicitudes concurrentes.
+        """
+        try:
+            metadata = obtener_version_mas_reciente()
+        except Exception as e:
+            current_app.logger.error(f"Error al consultar el registro de modelos: {e}")
+            return False
+        if not metadata:
+            return False
+
+        current = self.entry
+        trained_at = datetime.fromisoformat(metadata['entrenado_en'])
+        if current is not None and (current.get('hash') == metadata['hash'] or current['entrenado_en'] >= trained_at):
+            return False
+
+        modelo = cargar_modelo(metadata)
+        if modelo is None:
+            return False
+        self.entry = {
+            'modelo': modelo,
+            'feature_names': metadata['feature_names'],
+            'metricas': metadata['metricas'],
+            'filas_entrenamiento': metadata.get('filas_entrenamiento'),
+            'entrenado_en': trained_at,
+            'version': metadata['version'],
+            'hash': metadata['hash'],
+            'archivo': metadata['archivo']
+        }
+        self.changes_since_training = 0
+        current_app.logger.info(f"Modelo de participación versión {metadata['version']} cargado desde el registro.")
+        return True
+
+    def _publish(self, entry):
+        """Registra en disco la entrada (si tiene modelo) y la deja como entrada vigente."""
+        entry.update(version=None, hash=None, archivo=None)
+        if entry['modelo'] is not None:
+            try:
+                metadata = registrar_modelo(entry['modelo'], {
+                    'entrenado_en': entry['entrenado_en'].isoformat(),
+                    'filas_entrenamiento': entry['filas_entrenamiento'],
+                    'metricas': entry['metricas'],
+                    'feature_names': entry['feature_names']
+                })
+                entry.update(version=metadata['version'], hash=metadata['hash'], archivo=metadata['archivo'])
+            except Exception as e:
+                current_app.logger.error(f"Error al registrar el modelo de participación: {e}")
+        self.entry = entry
+        current_app.logger.info(f"Modelo de participación versión {entry['version']} listo ({entry['entrenado_en'].isoformat()}).")
+        return entry
+
+    def _adopt_pending(self):
+        """Si el entrenamiento enviado al pool ya terminó, publica su resultado. Requiere el lock."""
+        if self._pending is None or not self._pending['future'].done():
+            return
+        pending, self._pending = self._pending, None
+        try:
+            resultado = pending['future'].result()
+        except Exception as e:
+            self._publish(_completar_entrenamiento(pending['entry'], pending['y_series'], error=e))
+            return
+        self._publish(_completar_entrenamiento(pending['entry'], pending['y_series'], resultado=resultado))
+
+    def _pending_entry(self):
+        return {'modelo': None, 'feature_names': FEATURE_NAMES, 'metricas': "Modelo en entrenamiento",
+                'filas_entrenamiento': 0, 'entrenado_en': datetime.utcnow(),
+                'version': None, 'hash': None, 'archivo': None, 'probabilidad_defecto': 0.5,
+                'info': "Predicción por defecto mientras el modelo se entrena."}
+
+    def get(self):
+        """
+        Devuelve la entrada vigente del modelo, re-entrenándolo solo si está desactualizada.
+
+        Con el pool de procesos activo (`services.prediction_executor`), el entrenamiento se
+        envía al pool: si ya existe un modelo (aunque esté desactualizado) se sigue usando
+        mientras tanto; si no existe, se espera como máximo `PREDICTION_EXECUTOR_TIMEOUT_SECONDS`
+        y luego se devuelve una entrada con la predicción por defecto.
+        """
+        self.refresh_from_registry()
+        if self._pending is None and not self.is_stale():
+            return self.entry
 
-    historico_similar = 0.5
-    habilidades_voluntarios = 3
+        with self._lock:
+            self._adopt_pending()
+            # Otro proceso pudo haber publicado un modelo nuevo mientras se esperaba el lock
+            self.refresh_from_registry()
+            if not self.is_stale():
+                return self.entry
 
-    features = {
-        "current_inscriptions": current_inscriptions,
-        "cupo_maximo": cupo_maximo,
-        "historico_similar": historico_similar,
-        "habilidades_voluntarios": habilidades_voluntarios
+            if get_executor() is None:
+                self.changes_since_training = 0
+                return self._publish(_entrenar_modelo())
+
+            if self._pending is None:
+                self.changes_since_training = 0
+                entry, X_df, y_series = _preparar_entrenamiento()
+                if X_df is None:
+                    return self._publish(entry)
+                future = enviar_entrenamiento(X_df, y_series)
+                if future is None:
+                    # El pool dejó de estar disponible: entrenar en línea
+                    try:
+                        return self._publish(_completar_entrenamiento(entry, y_series, resultado=ajustar_modelo(X_df, y_series)))
+                    except Exception as e:
+                        return self._publish(_completar_entrenamiento(entry, y_series, error=e))
+                self._pending = {'future': future, 'entry': entry, 'y_series': y_series}
+            pending = self._pending
+            if self.entry is not None:
+                return self.entry
+
+        timeout = current_app.config.get('PREDICTION_EXECUTOR_TIMEOUT_SECONDS', 2.0)
+        try:
+            listo, _ = esperar_resultado(pending['future'], timeout)
+        except Exception:
+            listo = True # El error se registra al adoptar el resultado
+        if not listo:
+            current_app.logger.info("El modelo de participación sigue en entrenamiento; se usa la predicción por defecto.")
+            return self._pending_entry()
+        with self._lock:
+            self._adopt_pending()
+            return self.entry if self.entry is not None else self._pending_entry()
+
+
+_model_cache = _ParticipationModelCache()
+
+
+@event.listens_for(Inscripciones, 'after_insert')
+@event.listens_for(Inscripciones, 'after_update')
+@event.listens_for(Inscripciones, 'after_delete')
+@event.listens_for(Actividades, 'after_insert')
+@event.listens_for(Actividades, 'after_delete')
+def _registrar_cambio(mapper, connection, target):
+    _model_cache.record_change()
+
+
+@event.listens_for(Actividades, 'after_update')
+def _registrar_cambio_actividad(mapper, connection, target):
+    # Solo el cupo afecta a las características del modelo; otras columnas (p. ej. compatibilidad) no cuentan
+    if sa_inspect(target).attrs.cupo_maximo.history.has_changes():
+        _model_cache.record_change()
+
+
+def cargar_modelo_registrado():
+    """Carga al arrancar el proceso la última versión publicada en el registro de modelos, si existe."""
+    return _model_cache.refresh_from_registry()
+
+
+def invalidar_modelo_participacion():
+    """Descarta el modelo en caché para que se re-entrene en la siguiente predicción."""
+    _model_cache.invalidate()
+
+
+def obtener_info_modelo():
+    """
+    Devuelve la versión, hash y fecha de entrenamiento del modelo en caché.
+
+    Returns:
+        dict: {'version': int o None, 'hash': str o None, 'entrenado_en': datetime o None,
+               'cambios_desde_entrenamiento': int}
+    """
+    entry = _model_cache.entry
+    return {
+        'version': entry['version'] if entry else None,
+        'hash': entry['hash'] if entry else None,
+        'entrenado_en': entry['entrenado_en'] if entry else None,
+        'cambios_desde_entrenamiento': _model_cache.changes_since_training
     }
-    return features
+
+
+def _preparar_entrenamiento():
+    """
+    Prepara los datos de entrenamiento del modelo RandomForestClassifier.
+
+    - Obtiene características para todas las actividades históricas.
+    - Crea una variable objetivo ('y') basada en un proxy:
+      Se considera 'alta participación' (1) si la ocupación actual
+      (inscripciones / cupo_maximo) es >= 60%, de lo contrario 'baja' (0).
+      Esta es una simplificación y podría necesitar ajustes.
+    - Si hay menos de 10 muestras o solo una clase, no hay entrenamiento y la
+      entrada devuelta ya contiene la predicción por defecto.
+
+    Returns:
+        tuple: (entry, X_df, y_series). `entry` es la entrada de caché con 'modelo' (None hasta
+               completar el entrenamiento), 'feature_names', 'metricas',
+               'filas_entrenamiento', 'entrenado_en' y, si no hay modelo, 'probabilidad_defecto'
+               e 'info'. `X_df`/`y_series` son None cuando no se debe entrenar.
+    """
+    entry = {'modelo': None, 'feature_names': FEATURE_NAMES, 'metricas': None,
+             'filas_entrenamiento': 0, 'entrenado_en': datetime.utcnow()}
+
+    # Una sola consulta agregada para todas las actividades
+    X_df = obtener_features_bulk().reset_index(drop=True)
+    if X_df.empty:
+        current_app.logger.info("No hay actividades en la base de datos para entrenar el modelo.")
+        entry.update(probabilidad_defecto=0.5, metricas="Sin datos de entrenamiento",
+                     info="Predicción por defecto debido a falta de actividades.")
+        return entry, None, None
+
+    current_app.logger.info(f"Procesando {len(X_df)} actividades para datos de entrenamiento.")
+    entry['filas_entrenamiento'] = len(X_df)
+    cupo = pd.to_numeric(X_df['cupo_maximo'], errors='coerce')
+    ocupacion = X_df['current_inscriptions'] / cupo.where(cupo > 0)
+    # Sin cupo máximo o con cupo 0 se considera baja participación (la comparación con NaN da False)
+    y_series = (ocupacion >= 0.6).astype(int)
+
+    MIN_SAMPLES_FOR_TRAINING = 10
+    if len(X_df) < MIN_SAMPLES_FOR_TRAINING or len(y_series.unique()) < 2:
+        current_app.logger.info(f"Datos insuficientes para entrenar el modelo. Muestras: {len(X_df)}, Clases: {len(y_series.unique())}.")
+        default_proba = y_series.mean() if len(y_series) > 0 and len(y_series.unique()) == 1 else 0.5
+        entry.update(probabilidad_defecto=default_proba, metricas="Datos insuficientes para entrenar",
+                     info=f"Predicción por defecto. Muestras: {len(X_df)}, Clases: {len(y_series.unique())}")
+        return entry, None, None
+
+    current_app.logger.info(f"Datos de entrenamiento preparados: {X_df.shape[0]} muestras.")
+    return entry, X_df, y_series
+
+
+def _completar_entrenamiento(entry, y_series, resultado=None, error=None):
+    """
+    Completa la entrada de caché con el resultado de `ajustar_modelo` o con la predicción
+    por defecto si el entrenamiento falló.
+    """
+    if error is not None:
+        current_app.logger.error(f"Error durante el entrenamiento del modelo: {error}")
+        entry.update(probabilidad_defecto=y_series.mean() if len(y_series) > 0 else 0.5,
+                     metricas=f"Error de entrenamiento: {error}",
+                     info="Predicción por defecto debido a error de entrenamiento.")
+        return entry
+
+    modelo, metricas, feature_names = resultado
+    current_app.logger.info("Modelo RandomForestClassifier entrenado exitosamente.")
+
+    current_app.logger.info(f"Métricas del modelo: {metricas}")
+    entry.update(modelo=modelo, feature_names=feature_names, metricas=metricas)
+    return entry
+
+
+def _entrenar_modelo():
+    """Prepara los datos y entrena el modelo en el proceso actual (sin pool de procesos)."""
+    entry, X_df, y_series = _preparar_entrenamiento()
+    if X_df is None:
+        return entry
+    try:
+        resultado = ajustar_modelo(X_df, y_series)
+    except Exception as e:
+        return _completar_entrenamiento(entry, y_series, error=e)
+    return _completar_entrenamiento(entry, y_series, resultado=resultado)
+
 
 def predecir_participacion(actividad_id):
     """
@@ -59,20 +391,12 @@ def predecir_participacion(actividad_id):
 
     El proceso incluye:
     1. Obtener características para la actividad objetivo.
-    2. Preparar datos de entrenamiento:
-        - Obtener características para todas las actividades históricas.
-        - Crear una variable objetivo ('y') basada en un proxy:
-          Se considera 'alta participación' (1) si la ocupación actual
-          (inscripciones / cupo_maximo) es >= 60%, de lo contrario 'baja' (0).
-          Esta es una simplificación y podría necesitar ajustes.
-    3. Manejar datos insuficientes (si hay menos de 10 muestras o solo una clase,
-       devuelve una predicción por defecto).
-    4. Entrenar un modelo RandomForestClassifier con los datos históricos.
-       El modelo se re-entrena con cada llamada a esta función.
-    5. Generar una predicción de probabilidad para la actividad objetivo.
-    6. Opcionalmente, exportar una visualización del primer árbol del modelo
-       a un archivo .dot (si Graphviz está disponible).
-    7. Calcular métricas básicas (precisión) sobre un conjunto de prueba.
+    2. Obtener el modelo desde el caché en memoria (`_ParticipationModelCache`). El modelo
+       solo se re-entrena (ver `_entrenar_modelo`) cuando los cambios en inscripciones/actividades
+       superan el umbral configurado o el modelo supera la antigüedad máxima.
+    3. Si no hay modelo (datos insuficientes o error de entrenamiento), devolver la
+       predicción por defecto calculada durante el entrenamiento.
+    4. Generar una predicción de probabilidad para la actividad objetivo.
 
     Args:
         actividad_id (int): El ID de la actividad para la cual predecir la participación.
@@ -84,8 +408,11 @@ def predecir_participacion(actividad_id):
             - 'metricas' (dict or str): Un diccionario con métricas como 'accuracy' (precisión),
                                         o un string indicando por qué no se calcularon
                                         (ej., "Sin datos de entrenamiento", "Datos insuficientes para entrenar").
-            - 'tree_dot_file' (str or None): Nombre del archivo .dot generado para la visualización
-                                             del árbol (ej., "tree.dot"), o None si no se generó.
+            - 'modelo_hash' (str or None): Hash de contenido del modelo registrado, usado para
+                                           exportar bajo demanda el árbol de decisión
+                                           (ver `exportar_arbol_modelo`).
+            - 'modelo_version' (int): Versión del modelo en caché que generó la predicción.
+            - 'entrenado_en' (datetime): Fecha y hora (UTC) del entrenamiento de esa versión.
             - 'error' (str, opcional): Un mensaje de error si ocurrió un problema crítico.
             - 'info' (str, opcional): Un mensaje informativo, especialmente si se devuelve
                                      una predicción por defecto debido a datos insuficientes.
@@ -97,91 +424,144 @@ def predecir_participacion(actividad_id):
         current_app.logger.warning(f"No se pudieron obtener features para la actividad {actividad_id}. Abortando.")
         return {"error": "No se encontraron características de la actividad."}
 
-    feature_names = ['current_inscriptions', 'cupo_maximo', 'historico_similar', 'habilidades_voluntarios']
+    entry = _model_cache.get()
+    version_info = {'modelo_version': entry['version'], 'modelo_hash': entry['hash'], 'entrenado_en': entry['entrenado_en']}
+
+    if entry['modelo'] is None:
+        return {"probabilidad": entry['probabilidad_defecto'],
+                "metricas": entry['metricas'],
+                "info": entry['info'],
+                **version_info}
+
     try:
-        target_activity_df = pd.DataFrame([target_activity_features_dict], columns=feature_names)
+        target_activity_df = pd.DataFrame([target_activity_features_dict], columns=FEATURE_NAMES)[entry['feature_names']]
+        proba = entry['modelo'].predict_proba(target_activity_df)[0][1]
+        current_app.logger.info(f"Predicción de probabilidad para actividad {actividad_id}: {proba}")
     except Exception as e:
-        current_app.logger.error(f"Error al crear DataFrame para actividad específica: {e}")
-        return {"error": "Fallo al crear DataFrame para la actividad objetivo."}
+        current_app.logger.error(f"Error durante la predicción para la actividad {actividad_id}: {e}")
+        return {"error": f"Error de predicción: {e}"}
 
-    all_activities = Actividades.query.all()
-    if not all_activities:
-        current_app.logger.info("No hay actividades en la base de datos para entrenar el modelo.")
-        return {"probabilidad": 0.5, "metricas": "Sin datos de entrenamiento", "tree_dot_file": None, "info": "Predicción por defecto debido a falta de actividades."}
+    return {
+        'probabilidad': proba,
+        'metricas': entry['metricas'],
+        **version_info
+    }
 
-    X_data = []
-    y_data = []
 
-    current_app.logger.info(f"Procesando {len(all_activities)} actividades para datos de entrenamiento.")
-    for activity in all_activities:
-        features_dict = obtener_features(activity.id_actividad)
-        if features_dict:
-            X_data.append(features_dict)
-            if features_dict['cupo_maximo'] is not None and features_dict['cupo_maximo'] > 0:
-                ocupacion = features_dict['current_inscriptions'] / features_dict['cupo_maximo']
-                y_data.append(1 if ocupacion >= 0.6 else 0)
-            else: # Si no hay cupo máximo o es 0, se considera baja participación por defecto para y_data
-                y_data.append(0)
+def predecir_participacion_batch(actividad_ids):
+    """
+    Predice la probabilidad de alta participación para varias actividades a la vez.
 
-    if not X_data:
-        current_app.logger.warning("No se pudieron extraer features para ninguna actividad de entrenamiento.")
-        return {"probabilidad": 0.5, "metricas": "Sin datos de entrenamiento", "tree_dot_file": None, "info": "Predicción por defecto debido a falta de datos de características."}
+    Construye una sola matriz de características (`obtener_features_bulk`) y hace una sola
+    llamada a `predict_proba` con el modelo en caché, en lugar de llamar a
+    `predecir_participacion` una vez por actividad.
 
-    X_df = pd.DataFrame(X_data, columns=feature_names)
-    y_series = pd.Series(y_data)
+    Args:
+        actividad_ids (iterable): IDs de las actividades para las cuales predecir la participación.
 
-    MIN_SAMPLES_FOR_TRAINING = 10
-    if len(X_df) < MIN_SAMPLES_FOR_TRAINING or len(y_series.unique()) < 2:
-        current_app.logger.info(f"Datos insuficientes para entrenar el modelo. Muestras: {len(X_df)}, Clases: {len(y_series.unique()) if X_data else 0}.")
-        default_proba = y_series.mean() if len(y_series) > 0 and len(y_series.unique()) == 1 else 0.5
-        return {"probabilidad": default_proba,
-                "metricas": "Datos insuficientes para entrenar",
-                "tree_dot_file": None,
-                "info": f"Predicción por defecto. Muestras: {len(X_df)}, Clases: {len(y_series.unique()) if X_data else 0}"}
+    Returns:
+        dict: Un diccionario que mapea cada id de actividad al mismo diccionario de salida que
+              devuelve `predecir_participacion` ('probabilidad', 'metricas', 'modelo_hash',
+              'modelo_version', 'entrenado_en' y, según el caso, 'info' o 'error').
+    """
+    actividad_ids = list(dict.fromkeys(actividad_ids))
+    if not actividad_ids:
+        return {}
 
-    current_app.logger.info(f"Datos de entrenamiento preparados: {X_df.shape[0]} muestras.")
+    current_app.logger.info(f"Iniciando predicción de participación por lotes para {len(actividad_ids)} actividades.")
 
-    try:
-        X_train, X_test, y_train, y_test = train_test_split(X_df, y_series, test_size=0.2, random_state=42, stratify=y_series if len(y_series.unique()) > 1 else None)
-        modelo = RandomForestClassifier(random_state=42, class_weight='balanced')
-        modelo.fit(X_train, y_train)
-        current_app.logger.info("Modelo RandomForestClassifier entrenado exitosamente.")
-    except Exception as e:
-        current_app.logger.error(f"Error durante el entrenamiento del modelo: {e}")
-        return {"probabilidad": y_series.mean() if len(y_series) > 0 else 0.5, "metricas": f"Error de entrenamiento: {e}", "tree_dot_file": None, "info": "Predicción por defecto debido a error de entrenamiento."}
+    features_df = obtener_features_bulk(actividad_ids)
+    predictions = {actividad_id: {"error": "No se encontraron características de la actividad."}
+                   for actividad_id in actividad_ids if actividad_id not in features_df.index}
+    if features_df.empty:
+        return predictions
 
-    try:
-        # Asegurar que el DataFrame de la actividad objetivo tenga las mismas columnas que X_df (datos de entrenamiento)
-        # Esto es importante si la actividad objetivo tiene valores nulos que resultaron en menos columnas al crear target_activity_df inicialmente
-        target_activity_df = pd.DataFrame([target_activity_features_dict], columns=feature_names)[X_df.columns]
-        proba = modelo.predict_proba(target_activity_df)[0][1]
-        current_app.logger.info(f"Predicción de probabilidad para actividad {actividad_id}: {proba}")
-    except Exception as e:
-        current_app.logger.error(f"Error durante la predicción para la actividad {actividad_id}: {e}")
-        return {"error": f"Error de predicción: {e}"}
+    entry = _model_cache.get()
+    version_info = {'modelo_version': entry['version'], 'modelo_hash': entry['hash'], 'entrenado_en': entry['entrenado_en']}
 
-    tree_dot_file_path = 'tree.dot'
-    try:
-        estimator = modelo.estimators_[0]
-        export_graphviz(estimator, out_file=tree_dot_file_path,
-                        feature_names=X_df.columns,
-                        class_names=['Baja', 'Alta'], # Clases deben estar en español si es posible
-                        rounded=True, proportion=False, precision=2, filled=True)
-        current_app.logger.info(f"Visualización del árbol de decisión guardada en: {tree_dot_file_path}")
-    except Exception as e:
-        current_app.logger.warning(f"Error al exportar el árbol de decisión: {e}. Graphviz podría no estar instalado.")
-        tree_dot_file_path = None
+    if entry['modelo'] is None:
+        for actividad_id in features_df.index:
+            predictions[actividad_id] = {"probabilidad": entry['probabilidad_defecto'],
+                                         "metricas": entry['metricas'],
+                                         "info": entry['info'],
+                                         **version_info}
+        return predictions
 
     try:
-        accuracy = modelo.score(X_test, y_test)
-        metricas = {"accuracy": accuracy} # 'accuracy' es un término común, se puede mantener o traducir a 'precision_global'
-        current_app.logger.info(f"Métricas del modelo: {metricas}")
+        probas = _puntuar(entry, features_df[entry['feature_names']])
+        if probas is None:
+            current_app.logger.info("La puntuación por lotes no terminó a tiempo; se usa la predicción por defecto.")
+            for actividad_id in features_df.index:
+                predictions[actividad_id] = {"probabilidad": 0.5,
+                                             "metricas": entry['metricas'],
+                                             "info": "Predicción por defecto: el cálculo no terminó a tiempo.",
+                                             **version_info}
+            return predictions
     except Exception as e:
-        current_app.logger.error(f"Error al calcular métricas: {e}")
-        metricas = {"accuracy": "Error al calcular métricas"}
+        current_app.logger.error(f"Error durante la predicción por lotes: {e}")
+        for actividad_id in features_df.index:
+            predictions[actividad_id] = {"error": f"Error de predicción: {e}"}
+        return predictions
 
-    return {
-        'probabilidad': proba,
-        'metricas': metricas,
-        'tree_dot_file': tree_dot_file_path
-    }
+    for actividad_id, proba in zip(features_df.index, probas):
+        predictions[actividad_id] = {
+            'probabilidad': proba,
+            'metricas': entry['metricas'],
+            **version_info
+        }
+    return predictions
+
+
+def _puntuar(entry, features_df):
+    """
+    Calcula las probabilidades de un lote de características.
+
+    Los lotes de al menos `PREDICTION_EXECUTOR_MIN_BATCH` filas de un modelo registrado se envían
+    al pool de procesos; si no terminan en `PREDICTION_EXECUTOR_TIMEOUT_SECONDS` devuelve None.
+    El resto se calcula en línea con el modelo en memoria.
+    """
+    min_batch = current_app.config.get('PREDICTION_EXECUTOR_MIN_BATCH', 200)
+    if get_executor() is None or entry.get('archivo') is None or len(features_df) < min_batch:
+        return entry['modelo'].predict_proba(features_df)[:, 1]
+
+    future = enviar_puntuacion(ruta_modelo(entry), entry['hash'], features_df)
+    if future is None:
+        return entry['modelo'].predict_proba(features_df)[:, 1]
+    listo, probas = esperar_resultado(future, current_app.config.get('PREDICTION_EXECUTOR_TIMEOUT_SECONDS', 2.0))
+    return probas if listo else None
+
+
+def exportar_arbol_modelo():
+    """
+    Exporta bajo demanda el primer árbol del bosque del modelo vigente en formato Graphviz (.dot).
+
+    El archivo se genera una sola vez por versión del modelo y se guarda en el registro bajo el
+    hash de contenido del modelo; se escribe en un archivo temporal y se renombra, de modo que
+    varios workers pueden pedirlo a la vez sin pisarse.
+
+    Returns:
+        tuple or None: (ruta_del_archivo, hash_del_modelo, version), o None si no hay un modelo
+                       registrado o la exportación falló.
+    """
+    entry = _model_cache.get()
+    if entry['modelo'] is None or not entry.get('hash'):
+        return None
+
+    path = ruta_arbol(entry)
+    if not os.path.exists(path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix='.dot')
+        os.close(fd)
+        try:
+            export_graphviz(entry['modelo'].estimators_[0], out_file=tmp_path,
+                            feature_names=entry['feature_names'],
+                            class_names=['Baja', 'Alta'], # Clases deben estar en español si es posible
+                            rounded=True, proportion=False, precision=2, filled=True)
+            os.replace(tmp_path, path)
+            current_app.logger.info(f"Visualización del árbol de decisión guardada en: {path}")
+        except Exception as e:
+            current_app.logger.warning(f"Error al exportar el árbol de decisión: {e}.")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path, entry['hash'], entry['version']
@@ -0,0 +1,167 @@
+"""
+Servicio de ejecución de predicciones fuera del hilo de la solicitud.
+
+Entrenar un RandomForest o puntuar muchas actividades dentro de una solicitud de Flask/Socket.IO
+bloquea el worker y retiene el GIL, de modo que el chat y las páginas servidas por el mismo proceso
+se detienen mientras tanto. Este módulo mantiene un `ProcessPoolExecutor` configurable donde se
+ejecutan el entrenamiento (`ajustar_modelo`) y la puntuación masiva (`puntuar_actividades`).
+
+Las funciones que se ejecutan en los procesos del pool no usan la aplicación Flask ni la base de
+datos: reciben los datos ya preparados por el proceso principal.
+
+El pool se crea la primera vez que se usa (`get_executor`), no al importar la aplicación: los comandos
+`flask` y los workers que nunca predicen no lanzan procesos. Con los modos asíncronos de Socket.IO
+`eventlet` o `gevent` (ver wsgi.py) el pool no se usa y todo se ejecuta en línea.
+
+Configuración (en `app.config`):
+- `PREDICTION_EXECUTOR_WORKERS`: número de procesos del pool (0 desactiva el pool y todo se
+  ejecuta en línea, como antes).
+- `SOCKETIO_ASYNC_MODE`: con 'eventlet' o 'gevent' el pool se desactiva.
+- `PREDICTION_EXECUTOR_TIMEOUT_SECONDS`: tiempo máximo que una solicitud espera un resultado
+  antes de usar la predicción por defecto.
+- `PREDICTION_EXECUTOR_MIN_BATCH`: cantidad mínima de actividades para enviar la puntuación al
+  pool; los lotes más pequeños se puntúan en línea porque el viaje al pool costaría más.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+_executor = None
+_lock = threading.Lock()
+_estado = {'workers': 0, 'logger': logging.getLogger(__name__)}
+
+# Modos asíncronos con parcheo de la biblioteca estándar: crear procesos desde ellos no es seguro
+MODOS_SIN_POOL = ('eventlet', 'gevent')
+
+# Caché de modelos por proceso del pool, indexado por hash de contenido
+_worker_models = {}
+
+
+def _mp_context():
+    """
+    Contexto de multiprocessing para el pool.
+
+    El pool se crea con el servidor ya en marcha (con hilos), así que no se usa 'fork': se usa
+    'forkserver', que bifurca desde un proceso limpio con este módulo (y scikit-learn) ya importado.
+    En plataformas sin 'forkserver' se usa 'spawn'. En ambos casos los procesos del pool importan el
+    script principal como `__mp_main__`: los scripts que usen el pool deben proteger su punto de
+    entrada con `if __name__ == '__main__'` (main.py, wsgi.py y los comandos `flask`/gunicorn lo hacen).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def init_prediction_executor(app):
+    """Guarda la configuración del pool; los procesos se lanzan en el primer uso (`get_executor`)."""
+    workers = app.config.get('PREDICTION_EXECUTOR_WORKERS', 0)
+    if app.config.get('SOCKETIO_ASYNC_MODE') in MODOS_SIN_POOL:
+        app.logger.info(f"Modo asíncrono '{app.config['SOCKETIO_ASYNC_MODE']}': las predicciones se ejecutan en línea.")
+        workers = 0
+    _estado['workers'] = workers
+    _estado['logger'] = app.logger
+
+
+def shutdown_prediction_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _submit(fn, *args):
+    """Envía un trabajo al pool; si el pool se rompió (un proceso murió) lo desactiva y devuelve None."""
+    executor = get_executor()
+    if executor is None:
+        return None
+    try:
+        return executor.submit(fn, *args)
+    except BrokenProcessPool:
+        shutdown_prediction_executor()
+        _estado['workers'] = 0
+        return None
+
+
+def get_executor():
+    """Devuelve el pool de procesos (creándolo en el primer uso), o None si está desactivado."""
+    global _executor
+    # Los procesos del pool (o un script principal re-importado por 'spawn') nunca crean su propio pool
+    if _executor is not None or _estado['workers'] <= 0 or multiprocessing.parent_process() is not None:
+        return _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=_estado['workers'], mp_context=_mp_context())
+            atexit.register(shutdown_prediction_executor)
+            _estado['logger'].info(f"Pool de predicción iniciado con {_estado['workers']} procesos.")
+    return _executor
+
+
+def esperar_resultado(future, timeout):
+    """
+    Espera el resultado de un `Future` como máximo `timeout` segundos.
+
+    Returns:
+        tuple: (listo, resultado). Si no terminó a tiempo devuelve (False, None); las
+               excepciones del trabajo se propagan.
+    """
+    try:
+        return True, future.result(timeout=timeout)
+    except FutureTimeoutError:
+        return False, None
+
+
+def ajustar_modelo(X_df, y_series):
+    """
+    Entrena el RandomForestClassifier y calcula su precisión sobre el conjunto de prueba.
+
+    Se puede ejecutar en línea o dentro del pool (no depende de Flask).
+
+    Returns:
+        tuple: (modelo, metricas, feature_names)
+    """
+    X_train, X_test, y_train, y_test = train_test_split(X_df, y_series, test_size=0.2, random_state=42, stratify=y_series if len(y_series.unique()) > 1 else None)
+    modelo = RandomForestClassifier(random_state=42, class_weight='balanced')
+    modelo.fit(X_train, y_train)
+
+    try:
+        metricas = {"accuracy": float(modelo.score(X_test, y_test))}
+    except Exception:
+        metricas = {"accuracy": "Error al calcular métricas"}
+    return modelo, metricas, list(X_df.columns)
+
+
+def puntuar_actividades(model_path, content_hash, features_df):
+    """
+    Calcula `predict_proba` (clase 1) para un DataFrame de características dentro del pool.
+
+    El modelo se carga desde el registro en disco la primera vez y queda en memoria del
+    proceso del pool, indexado por su hash, para las siguientes llamadas.
+
+    Returns:
+        list: Probabilidades de alta participación, en el orden de `features_df`.
+    """
+    modelo = _worker_models.get(content_hash)
+    if modelo is None:
+        modelo = joblib.load(model_path)
+        _worker_models.clear()
+        _worker_models[content_hash] = modelo
+    return modelo.predict_proba(features_df)[:, 1].tolist()
+
+
+def enviar_entrenamiento(X_df, y_series):
+    """Envía `ajustar_modelo` al pool y devuelve el `Future`, o None si el pool no está disponible."""
+    return _submit(ajustar_modelo, X_df, y_series)
+
+
+def enviar_puntuacion(model_path, content_hash, features_df):
+    """Envía `puntuar_actividades` al pool y devuelve el `Future`, o None si el pool no está disponible."""
+    return _submit(puntuar_actividades, model_path, content_hash, features_df)
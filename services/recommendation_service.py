@@ -0,0 +1,338 @@
+"""
+Módulo de servicio para las recomendaciones personalizadas precalculadas.
+
+En lugar de puntuar todas las actividades abiertas cada vez que un voluntario abre su panel,
+`generar_recomendaciones` puntúa fuera de línea a todos los voluntarios activos contra todas las
+actividades abiertas con un producto de matrices dispersas usuarios×actividades, y guarda las
+K mejores de cada usuario en `Recomendaciones` con `TipoRecomendacion.PERSONALIZADA`.
+
+En modo incremental solo se vuelve a puntuar:
+- a los voluntarios cuyo perfil (preferencias o discapacidades) cambió desde el último cálculo,
+  detectado comparando una huella del perfil guardada en `estado_recomendaciones_usuario`;
+- las actividades cuyo vector del índice se creó o actualizó después del último cálculo, que se
+  combinan con las recomendaciones ya guardadas del resto de voluntarios.
+"""
+import hashlib
+from datetime import datetime
+
+import numpy as np
+from flask import current_app # Para logging
+from scipy import sparse
+
+from database.db import db
+from model.models import (Actividades, EstadoActividad, EstadoRecomendacionesUsuario, EstadoUsuario, Preferencias,
+                          Recomendaciones, TipoRecomendacion, UsuarioDiscapacidad, Usuarios, VectoresActividad,
+                          actividad_discapacidad_table, usuarios_preferencia_table)
+from model.load_profiles import PERFIL_ACTIVIDAD_CON_ORGANIZACION
+from services.activity_index_service import get_activity_vectors, vectorize_text
+from services.compatibility_service import _build_user_text
+
+# Habilidades usadas para el perfil del voluntario (las mismas que usaba el panel al puntuar en línea)
+HABILIDADES_PREDETERMINADAS = ['writing', 'gardening']
+
+# Usuarios por bloque del producto de matrices, para acotar la memoria de la matriz densa de puntajes
+USUARIOS_POR_BLOQUE = 1000
+
+# Tamaño máximo de las listas IN en borrados masivos
+TAMANO_LOTE_IN = 500
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _cargar_perfiles(user_ids):
+    """
+    Carga intereses y discapacidades de los voluntarios con una consulta por tabla.
+
+    Returns:
+        dict: {id_usuario: {'interests': [...], 'preference_ids': [...], 'disability_ids': set()}}
+    """
+    perfiles = {uid: {'interests': [], 'preference_ids': [], 'disability_ids': set()} for uid in user_ids}
+    if not perfiles:
+        return perfiles
+
+    preference_rows = db.session.query(usuarios_preferencia_table.c.usuario_id, Preferencias.id_preferencia,
+                                       Preferencias.nombre_corto) \
+        .join(Preferencias, Preferencias.id_preferencia == usuarios_preferencia_table.c.preferencia_id) \
+        .filter(usuarios_preferencia_table.c.usuario_id.in_(user_ids)) \
+        .order_by(usuarios_preferencia_table.c.usuario_id, Preferencias.id_preferencia) \
+        .all()
+    for user_id, preference_id, nombre_corto in preference_rows:
+        perfiles[user_id]['preference_ids'].append(preference_id)
+        perfiles[user_id]['interests'].append(nombre_corto)
+
+    disability_rows = db.session.query(UsuarioDiscapacidad.id_usuario, UsuarioDiscapacidad.id_discapacidad) \
+        .filter(UsuarioDiscapacidad.id_usuario.in_(user_ids)).all()
+    for user_id, disability_id in disability_rows:
+        perfiles[user_id]['disability_ids'].add(disability_id)
+    return perfiles
+
+
+def _huella_perfil(perfil):
+    """Hash estable de los datos del perfil que influyen en el puntaje."""
+    contenido = '|'.join([
+        ','.join(str(pid) for pid in sorted(perfil['preference_ids'])),
+        ','.join(str(did) for did in sorted(perfil['disability_ids'])),
+        ','.join(HABILIDADES_PREDETERMINADAS),
+    ])
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def _puntuar(user_ids, perfiles, activity_ids, activity_info, top_k):
+    """
+    Puntúa a los usuarios contra las actividades y devuelve sus K mejores.
+
+    La similitud del coseno se obtiene con un producto disperso (usuarios × términos) · (términos × actividades)
+    usando los vectores ya normalizados del índice de actividades; después se aplican los mismos ajustes por
+    inclusión que en `get_compatibility_scores_indexed`.
+
+    Returns:
+        dict: {id_usuario: [(id_actividad, puntaje 0-100), ...]} ordenado de mayor a menor.
+    """
+    resultado = {}
+    if not user_ids or not activity_ids:
+        return resultado
+
+    cache = get_activity_vectors(activity_ids)
+
+    user_vectors = {}
+    for user_id in user_ids:
+        user_text = _build_user_text({'interests': perfiles[user_id]['interests'], 'skills': HABILIDADES_PREDETERMINADAS})
+        if user_text:
+            user_vectors[user_id] = vectorize_text(user_text)
+    scored_users = list(user_vectors)
+    if not scored_users:
+        return resultado
+
+    # Vocabulario: solo los términos de los usuarios aportan al producto
+    vocabulary = {}
+    for vector in user_vectors.values():
+        for term in vector:
+            vocabulary.setdefault(term, len(vocabulary))
+
+    rows, cols, data = [], [], []
+    for column, activity_id in enumerate(activity_ids):
+        for term, weight in cache.vectors.get(activity_id, {}).items():
+            term_index = vocabulary.get(term)
+            if term_index is not None:
+                rows.append(term_index)
+                cols.append(column)
+                data.append(weight)
+    activities_matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(vocabulary), len(activity_ids)))
+
+    inclusive = np.array([activity_info[aid]['es_inclusiva'] for aid in activity_ids], dtype=bool)
+    has_text = np.array([cache.has_text.get(aid, False) for aid in activity_ids], dtype=bool)
+    has_terms = np.array([bool(cache.vectors.get(aid)) for aid in activity_ids], dtype=bool)
+    disability_ids = sorted({did for info in activity_info.values() for did in info['discapacidades']})
+    disability_index = {did: i for i, did in enumerate(disability_ids)}
+    supported_matrix = sparse.csr_matrix(
+        ([1.0] * sum(len(activity_info[aid]['discapacidades']) for aid in activity_ids),
+         ([disability_index[did] for aid in activity_ids for did in activity_info[aid]['discapacidades']],
+          [column for column, aid in enumerate(activity_ids) for _ in activity_info[aid]['discapacidades']])),
+        shape=(len(disability_ids), len(activity_ids))
+    )
+
+    k = min(top_k, len(activity_ids))
+    for block in _chunks(scored_users, USUARIOS_POR_BLOQUE):
+        u_rows, u_cols, u_data = [], [], []
+        d_rows, d_cols = [], []
+        for row, user_id in enumerate(block):
+            for term, weight in user_vectors[user_id].items():
+                u_rows.append(row)
+                u_cols.append(vocabulary[term])
+                u_data.append(weight)
+            for did in perfiles[user_id]['disability_ids']:
+                if did in disability_index:
+                    d_rows.append(row)
+                    d_cols.append(disability_index[did])
+        users_matrix = sparse.csr_matrix((u_data, (u_rows, u_cols)), shape=(len(block), len(vocabulary)))
+        scores = np.round((users_matrix @ activities_matrix).toarray() * 100, 1)
+
+        # +5 si la actividad es inclusiva y el usuario tiene discapacidad; +10 si además soporta alguna de ellas
+        with_disability = np.array([bool(perfiles[uid]['disability_ids']) for uid in block], dtype=bool)[:, None]
+        inclusive_mask = with_disability & inclusive[None, :]
+        users_disabilities = sparse.csr_matrix(([1.0] * len(d_rows), (d_rows, d_cols)), shape=(len(block), len(disability_ids)))
+        match_mask = inclusive_mask & ((users_disabilities @ supported_matrix).toarray() > 0)
+        scores = np.where(inclusive_mask, np.minimum(100.0, scores + 5.0), scores)
+        scores = np.where(match_mask, np.minimum(100.0, scores + 10.0), scores)
+
+        # Actividades sin texto (o usuario y actividad sin términos comparables) reciben 0.0 sin ajustes
+        without_terms = np.array([not user_vectors[uid] for uid in block], dtype=bool)[:, None]
+        scores = np.where(~has_text[None, :] | (without_terms & ~has_terms[None, :]), 0.0, scores)
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, user_id in enumerate(block):
+            ordered = top[row][np.argsort(-scores[row, top[row]], kind='stable')]
+            resultado[user_id] = [(activity_ids[column], float(scores[row, column])) for column in ordered]
+    return resultado
+
+
+def _recomendaciones_guardadas(user_ids, activity_ids):
+    """Devuelve {id_usuario: [(id_actividad, puntaje 0-100)]} de las filas PERSONALIZADA de las actividades indicadas."""
+    guardadas = {uid: [] for uid in user_ids}
+    for block in _chunks(user_ids, TAMANO_LOTE_IN):
+        rows = db.session.query(Recomendaciones.id_usuario, Recomendaciones.id_actividad, Recomendaciones.score) \
+            .filter(Recomendaciones.tipo_recomendacion == TipoRecomendacion.PERSONALIZADA,
+                    Recomendaciones.id_usuario.in_(block),
+                    Recomendaciones.id_actividad.in_(activity_ids)) \
+            .all()
+        for user_id, activity_id, score in rows:
+            guardadas[user_id].append((activity_id, float(score or 0) * 100))
+    return guardadas
+
+
+def _guardar(recomendaciones, fecha, huellas, connection=None):
+    """
+    Reemplaza las filas PERSONALIZADA de los usuarios indicados y actualiza su estado.
+
+    No confirma la transacción. `connection` es la conexión donde escribir; por defecto la sesión actual.
+    """
+    ejecutor = connection if connection is not None else db.session
+    user_ids = list(recomendaciones)
+    rec_table = Recomendaciones.__table__
+    state_table = EstadoRecomendacionesUsuario.__table__
+    for block in _chunks(user_ids, TAMANO_LOTE_IN):
+        ejecutor.execute(rec_table.delete().where(rec_table.c.id_usuario.in_(block),
+                                                  rec_table.c.tipo_recomendacion == TipoRecomendacion.PERSONALIZADA))
+        ejecutor.execute(state_table.delete().where(state_table.c.id_usuario.in_(block)))
+
+    rows = [{
+        'id_usuario': user_id,
+        'id_actividad': activity_id,
+        'tipo_recomendacion': TipoRecomendacion.PERSONALIZADA,
+        # La columna score guarda 0-1 (DECIMAL(5, 4)); el panel lo muestra como porcentaje
+        'score': round(score / 100, 4),
+        'descripcion': 'Recomendación precalculada por compatibilidad con el perfil',
+        'fecha': fecha,
+    } for user_id, items in recomendaciones.items() for activity_id, score in items]
+    if rows:
+        ejecutor.execute(rec_table.insert(), rows)
+    state_rows = [{'id_usuario': uid, 'huella_perfil': huellas[uid], 'fecha_calculo': fecha} for uid in user_ids]
+    if state_rows:
+        ejecutor.execute(state_table.insert(), state_rows)
+
+
+def generar_recomendaciones(incremental=True, top_k=None, user_ids=None, transaccion_propia=False):
+    """
+    Calcula y guarda las K mejores actividades abiertas de cada voluntario activo.
+
+    Args:
+        incremental (bool): Si es True, solo vuelve a puntuar a los voluntarios con perfil nuevo o
+                            modificado y las actividades nuevas o modificadas desde el último cálculo.
+        top_k (int, opcional): Recomendaciones por usuario (por defecto `RECOMMENDATIONS_TOP_K`).
+        user_ids (list, opcional): Limita el cálculo a estos usuarios.
+        transaccion_propia (bool): Si es True, escribe en una transacción propia en lugar de hacer
+                                   commit de la sesión; dentro de una solicitud evita expirar los
+                                   objetos ya cargados (p. ej. `current_user`).
+
+    Returns:
+        dict: Resumen con 'usuarios_completos', 'usuarios_actualizados', 'actividades_nuevas' y 'filas'.
+    """
+    top_k = top_k or current_app.config.get('RECOMMENDATIONS_TOP_K', 20)
+    # La fecha se toma antes de leer los vectores: lo que cambie durante el cálculo se verá en la siguiente ejecución
+    fecha = datetime.utcnow()
+
+    volunteers_query = db.session.query(Usuarios.id_usuario).filter(Usuarios.perfil == 'voluntario',
+                                                                    Usuarios.estado_usuario == EstadoUsuario.ACTIVO)
+    if user_ids is not None:
+        volunteers_query = volunteers_query.filter(Usuarios.id_usuario.in_(user_ids))
+    volunteer_ids = [row.id_usuario for row in volunteers_query.all()]
+
+    activity_rows = db.session.query(Actividades.id_actividad, Actividades.es_inclusiva) \
+        .filter(Actividades.estado == EstadoActividad.ABIERTO).order_by(Actividades.id_actividad).all()
+    activity_ids = [row.id_actividad for row in activity_rows]
+    activity_info = {row.id_actividad: {'es_inclusiva': bool(row.es_inclusiva), 'discapacidades': []} for row in activity_rows}
+    if activity_ids:
+        for activity_id, disability_id in db.session.query(actividad_discapacidad_table.c.actividad_id,
+                                                           actividad_discapacidad_table.c.discapacidad_id) \
+                .filter(actividad_discapacidad_table.c.actividad_id.in_(activity_ids)).all():
+            activity_info[activity_id]['discapacidades'].append(disability_id)
+
+    perfiles = _cargar_perfiles(volunteer_ids)
+    huellas = {uid: _huella_perfil(perfil) for uid, perfil in perfiles.items()}
+
+    full_users, merge_users, new_activity_ids = volunteer_ids, [], []
+    if incremental:
+        estados = {estado.id_usuario: estado for estado in
+                   EstadoRecomendacionesUsuario.query.filter(EstadoRecomendacionesUsuario.id_usuario.in_(volunteer_ids)).all()} \
+            if volunteer_ids else {}
+        full_users = [uid for uid in volunteer_ids if uid not in estados or estados[uid].huella_perfil != huellas[uid]]
+        unchanged = [uid for uid in volunteer_ids if uid in estados and estados[uid].huella_perfil == huellas[uid]]
+        if unchanged and activity_ids:
+            desde = min(estados[uid].fecha_calculo for uid in unchanged)
+            new_activity_ids = [row.id_actividad for row in
+                                db.session.query(VectoresActividad.id_actividad)
+                                .filter(VectoresActividad.id_actividad.in_(activity_ids),
+                                        VectoresActividad.fecha_actualizacion > desde)
+                                .order_by(VectoresActividad.id_actividad).all()]
+            merge_users = unchanged if new_activity_ids else []
+
+    recomendaciones = _puntuar(full_users, perfiles, activity_ids, activity_info, top_k)
+    for user_id in full_users:
+        recomendaciones.setdefault(user_id, [])
+
+    if merge_users:
+        nuevas = _puntuar(merge_users, perfiles, new_activity_ids, activity_info, top_k)
+        new_set = set(new_activity_ids)
+        kept_ids = [aid for aid in activity_ids if aid not in new_set]
+        guardadas = _recomendaciones_guardadas(merge_users, kept_ids) if kept_ids else {uid: [] for uid in merge_users}
+        for user_id in merge_users:
+            combinadas = guardadas[user_id] + nuevas.get(user_id, [])
+            combinadas.sort(key=lambda item: -item[1])
+            recomendaciones[user_id] = combinadas[:top_k]
+
+    try:
+        if transaccion_propia:
+            with db.engine.begin() as connection:
+                _guardar(recomendaciones, fecha, huellas, connection)
+        else:
+            _guardar(recomendaciones, fecha, huellas)
+            db.session.commit()
+    except Exception as e:
+        if not transaccion_propia:
+            db.session.rollback()
+        current_app.logger.error(f"Error al guardar las recomendaciones precalculadas: {e}")
+        raise
+
+    resumen = {
+        'usuarios_completos': len(full_users),
+        'usuarios_actualizados': len(merge_users),
+        'actividades_nuevas': len(new_activity_ids),
+        'filas': sum(len(items) for items in recomendaciones.values()),
+    }
+    current_app.logger.info(f"Recomendaciones precalculadas: {resumen}")
+    return resumen
+
+
+def obtener_recomendaciones_usuario(user_id, min_score=None):
+    """
+    Devuelve las recomendaciones precalculadas de un voluntario sobre actividades todavía abiertas.
+
+    Si el voluntario aún no tiene recomendaciones calculadas (p. ej. recién registrado), se calculan
+    solo para él en ese momento.
+
+    Args:
+        user_id (int): ID del voluntario.
+        min_score (float, opcional): Puntaje mínimo (0-100) para incluir una actividad.
+
+    Returns:
+        list: Tuplas (Actividades, puntaje 0-100) ordenadas de mayor a menor puntaje.
+    """
+    if db.session.get(EstadoRecomendacionesUsuario, user_id) is None:
+        # Sin estado guardado el cálculo incremental sería completo de todos modos
+        generar_recomendaciones(incremental=False, user_ids=[user_id], transaccion_propia=True)
+
+    rows = db.session.query(Actividades, Recomendaciones.score) \
+        .join(Recomendaciones, Recomendaciones.id_actividad == Actividades.id_actividad) \
+        .options(*PERFIL_ACTIVIDAD_CON_ORGANIZACION) \
+        .filter(Recomendaciones.id_usuario == user_id,
+                Recomendaciones.tipo_recomendacion == TipoRecomendacion.PERSONALIZADA,
+                Actividades.estado == EstadoActividad.ABIERTO) \
+        .order_by(Recomendaciones.score.desc(), Actividades.id_actividad) \
+        .all()
+    recomendaciones = [(actividad, round(float(score or 0) * 100, 1)) for actividad, score in rows]
+    if min_score is not None:
+        recomendaciones = [(actividad, score) for actividad, score in recomendaciones if score > min_score]
+    return recomendaciones
@@ -0,0 +1,182 @@
+"""
+Caché en memoria de los datos de referencia (catálogos casi estáticos).
+
+Los filtros de `/programs` y el formulario de registro muestran en cada solicitud los tipos de
+actividad, las organizaciones, las discapacidades y las preferencias. Este módulo guarda esas listas
+por proceso durante `REFERENCE_DATA_TTL_SECONDS` y las descarta en cuanto se escribe en las tablas
+correspondientes (eventos de SQLAlchemy), de modo que las páginas más visitadas no consultan la
+base de datos para obtenerlas.
+
+Las entradas son instantáneas inmutables (namedtuples), no instancias ORM: se comparten entre hilos
+y solicitudes sin depender de ninguna sesión. Las escrituras hechas por otros procesos, o con
+sentencias masivas que no pasan por el ORM, se reflejan al vencer el TTL o con una llamada explícita
+a `invalidar_datos_referencia`.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from database.db import db
+from model.models import Actividades, Discapacidades, Organizaciones, Preferencias
+
+OrganizacionRef = namedtuple('OrganizacionRef', ['id_organizacion', 'nombre_org'])
+DiscapacidadRef = namedtuple('DiscapacidadRef', ['id_discapacidad', 'nombre', 'descripcion'])
+PreferenciaRef = namedtuple('PreferenciaRef', ['id_preferencia', 'nombre_corto', 'descripcion_detallada'])
+
+# Claves de la caché
+TIPOS = 'tipos'
+ORGANIZACIONES = 'organizaciones'
+DISCAPACIDADES = 'discapacidades'
+PREFERENCIAS = 'preferencias'
+
+# Clave de `Session.info` con las entradas modificadas en la transacción en curso
+_CLAVE_SESION = 'datos_referencia_modificados'
+
+
+class _CacheDatosReferencia:
+    """
+    Caché con TTL por clave.
+
+    Cada invalidación incrementa la versión de la clave: una carga que empezó antes de la invalidación
+    no guarda su resultado, para no volver a publicar datos ya desactualizados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}   # clave -> (expira_en, valor)
+        self._versions = {}  # clave -> número de invalidaciones
+
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            version = self._versions.get(key, 0)
+
+        value = loader()
+        ttl = current_app.config.get('REFERENCE_DATA_TTL_SECONDS', 300)
+        with self._lock:
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = (time.monotonic() + ttl, value)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys or (TIPOS, ORGANIZACIONES, DISCAPACIDADES, PREFERENCIAS):
+                self._entries.pop(key, None)
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+
+_cache = _CacheDatosReferencia()
+
+
+def _cargar_tipos():
+    return tuple(sorted(tipo for (tipo,) in db.session.query(Actividades.tipo).distinct() if tipo))
+
+
+def _cargar_organizaciones():
+    return tuple(OrganizacionRef(*row) for row in
+                 db.session.query(Organizaciones.id_organizacion, Organizaciones.nombre_org)
+                 .order_by(Organizaciones.nombre_org))
+
+
+def _cargar_discapacidades():
+    return tuple(DiscapacidadRef(*row) for row in
+                 db.session.query(Discapacidades.id_discapacidad, Discapacidades.nombre, Discapacidades.descripcion)
+                 .order_by(Discapacidades.nombre))
+
+
+def _cargar_preferencias():
+    return tuple(PreferenciaRef(*row) for row in
+                 db.session.query(Preferencias.id_preferencia, Preferencias.nombre_corto, Preferencias.descripcion_detallada)
+                 .order_by(Preferencias.nombre_corto))
+
+
+def obtener_tipos_actividad():
+    """Devuelve los tipos de actividad distintos (ordenados alfabéticamente)."""
+    return _cache.get(TIPOS, _cargar_tipos)
+
+
+def obtener_organizaciones():
+    """Devuelve las organizaciones (id y nombre) ordenadas por nombre."""
+    return _cache.get(ORGANIZACIONES, _cargar_organizaciones)
+
+
+def obtener_discapacidades():
+    """Devuelve el catálogo de discapacidades ordenado por nombre."""
+    return _cache.get(DISCAPACIDADES, _cargar_discapacidades)
+
+
+def obtener_preferencias():
+    """Devuelve el catálogo de preferencias ordenado por nombre corto."""
+    return _cache.get(PREFERENCIAS, _cargar_preferencias)
+
+
+def obtener_preferencia(preferencia_id):
+    """Devuelve la preferencia con ese ID desde la caché, o None si no existe."""
+    return next((p for p in obtener_preferencias() if p.id_preferencia == preferencia_id), None)
+
+
+def invalidar_datos_referencia(*claves):
+    """Descarta las entradas indicadas (todas si no se indica ninguna) de la caché de este proceso."""
+    _cache.invalidate(*claves)
+
+
+def _marcar_modificado(target, key):
+    # Se invalida ya (lecturas dentro de la misma transacción) y de nuevo al confirmar, por si otra
+    # solicitud recargó la entrada entre el flush y el commit con los datos anteriores
+    _cache.invalidate(key)
+    session = sa_inspect(target).session
+    if session is not None:
+        session.info.setdefault(_CLAVE_SESION, set()).add(key)
+
+
+@event.listens_for(Organizaciones, 'after_insert')
+@event.listens_for(Organizaciones, 'after_update')
+@event.listens_for(Organizaciones, 'after_delete')
+def _organizacion_modificada(mapper, connection, target):
+    _marcar_modificado(target, ORGANIZACIONES)
+
+
+@event.listens_for(Discapacidades, 'after_insert')
+@event.listens_for(Discapacidades, 'after_update')
+@event.listens_for(Discapacidades, 'after_delete')
+def _discapacidad_modificada(mapper, connection, target):
+    _marcar_modificado(target, DISCAPACIDADES)
+
+
+@event.listens_for(Preferencias, 'after_insert')
+@event.listens_for(Preferencias, 'after_update')
+@event.listens_for(Preferencias, 'after_delete')
+def _preferencia_modificada(mapper, connection, target):
+    _marcar_modificado(target, PREFERENCIAS)
+
+
+@event.listens_for(Actividades, 'after_insert')
+@event.listens_for(Actividades, 'after_delete')
+def _actividad_creada_o_eliminada(mapper, connection, target):
+    _marcar_modificado(target, TIPOS)
+
+
+@event.listens_for(Actividades, 'after_update')
+def _actividad_modificada(mapper, connection, target):
+    # Solo un cambio de tipo afecta a la lista de tipos (inscripciones, cupos, etc. no cuentan)
+    if sa_inspect(target).attrs.tipo.history.has_changes():
+        _marcar_modificado(target, TIPOS)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_al_confirmar(session):
+    keys = session.info.pop(_CLAVE_SESION, None)
+    if keys:
+        _cache.invalidate(*keys)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_al_revertir(session, previous_transaction):
+    session.info.pop(_CLAVE_SESION, None)
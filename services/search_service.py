@@ -0,0 +1,215 @@
+"""
+Módulo de servicio para la búsqueda de texto completo en las actividades.
+
+Indexa `nombre`, `descripcion`, `habilidades_requeridas` y `etiqueta` con el motor nativo de la base de datos:
+- SQLite (`konectai.db` por defecto): tabla virtual FTS5 `actividades_fts` (rowid = id_actividad) con el
+  tokenizador `unicode61 remove_diacritics 2` y ranking BM25 ponderado por columna.
+- PostgreSQL: tabla `actividades_busqueda` con un `tsvector` (configuración 'spanish', pesos A-D por
+  columna) e índice GIN; el ranking usa `ts_rank_cd` (Postgres no ofrece BM25).
+- Otros motores: sin índice; la búsqueda recurre a `LIKE` sobre las cuatro columnas.
+
+El índice se mantiene con eventos `after_insert`/`after_update`/`after_delete` de SQLAlchemy (igual que
+`activity_index_service`). Las cargas masivas que no pasan por el ORM deben llamar a
+`reconstruir_indice_busqueda` (comando `flask rebuild-search-index`).
+
+Los acentos se pliegan en el texto indexado y en la consulta ("educacion" encuentra "Educación"), y
+cada término de la consulta se busca también como prefijo.
+"""
+import re
+import unicodedata
+
+from flask import current_app # Para logging
+from sqlalchemy import Float, Integer, and_, column, event, inspect as sa_inspect, literal, or_, select, text
+
+from database.db import db
+from model.models import Actividades
+
+# Columnas indexadas, en el orden de la tabla FTS5
+CAMPOS_BUSQUEDA = ('nombre', 'descripcion', 'habilidades_requeridas', 'etiqueta')
+
+# Pesos BM25 de SQLite por columna (mismo orden que CAMPOS_BUSQUEDA) y pesos de tsvector en Postgres
+PESOS_BM25 = (10.0, 1.0, 3.0, 5.0)
+PESOS_TSVECTOR = {'nombre': 'A', 'etiqueta': 'B', 'habilidades_requeridas': 'C', 'descripcion': 'D'}
+
+# Máximo de términos de una consulta que se tienen en cuenta
+MAX_TERMINOS = 8
+
+_indice = {'disponible': False}
+
+
+# Marcas diacríticas combinables del bloque latino (U+0300-U+036F), las que deja NFKD en español
+_MARCAS_LATINAS = dict.fromkeys(range(0x300, 0x370))
+
+
+def plegar_texto(texto):
+    """Pasa un texto a minúsculas y elimina los acentos (á -> a, ñ -> n, ü -> u)."""
+    if not texto:
+        return ''
+    texto = str(texto)
+    if texto.isascii():
+        return texto.lower()
+    descompuesto = unicodedata.normalize('NFKD', texto).translate(_MARCAS_LATINAS)
+    if descompuesto.isascii():
+        return descompuesto.lower()
+    # Otros caracteres (¿, ¡, símbolos u otros alfabetos): se quitan las marcas combinables restantes una a una
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def terminos_busqueda(consulta):
+    """Extrae los términos (palabras, ya plegadas) de una consulta de usuario."""
+    return re.findall(r'\w+', plegar_texto(consulta))[:MAX_TERMINOS]
+
+
+def _dialecto(bind=None):
+    return (bind or db.engine).dialect.name
+
+
+def crear_indice_busqueda():
+    """
+    Crea las estructuras del índice si no existen y lo puebla cuando está vacío.
+
+    Se llama al arrancar la aplicación, antes de cargar los datos iniciales.
+    """
+    dialecto = _dialecto()
+    if dialecto == 'sqlite':
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS actividades_fts USING fts5("
+            + ', '.join(CAMPOS_BUSQUEDA) + ", tokenize = 'unicode61 remove_diacritics 2')"))
+        vacio = db.session.execute(text("SELECT NOT EXISTS (SELECT 1 FROM actividades_fts)")).scalar()
+    elif dialecto == 'postgresql':
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS actividades_busqueda ("
+            "id_actividad INTEGER PRIMARY KEY REFERENCES actividades (id_actividad) ON DELETE CASCADE, "
+            "documento TSVECTOR NOT NULL)"))
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_actividades_busqueda_documento ON actividades_busqueda USING GIN (documento)"))
+        vacio = db.session.execute(text("SELECT NOT EXISTS (SELECT 1 FROM actividades_busqueda)")).scalar()
+    else:
+        current_app.logger.info(f"Búsqueda de texto completo no disponible para '{dialecto}'; se usará LIKE.")
+        return False
+    db.session.commit()
+    _indice['disponible'] = True
+
+    if vacio and db.session.query(Actividades.id_actividad).first() is not None:
+        reconstruir_indice_busqueda()
+    return True
+
+
+def _valores(actividad):
+    return {campo: getattr(actividad, campo) or '' for campo in CAMPOS_BUSQUEDA}
+
+
+def _sentencia_insercion(dialecto):
+    if dialecto == 'sqlite':
+        return text("INSERT INTO actividades_fts (rowid, " + ', '.join(CAMPOS_BUSQUEDA) + ") "
+                    "VALUES (:id, " + ', '.join(f":{campo}" for campo in CAMPOS_BUSQUEDA) + ")")
+    documento = ' || '.join(f"setweight(to_tsvector('spanish', :{campo}), '{PESOS_TSVECTOR[campo]}')"
+                            for campo in CAMPOS_BUSQUEDA)
+    return text("INSERT INTO actividades_busqueda (id_actividad, documento) VALUES (:id, " + documento + ") "
+                "ON CONFLICT (id_actividad) DO UPDATE SET documento = EXCLUDED.documento")
+
+
+def _parametros(dialecto, actividad_id, valores):
+    # FTS5 pliega los acentos en su tokenizador; en Postgres se pliegan antes de construir el tsvector
+    if dialecto == 'postgresql':
+        valores = {campo: plegar_texto(valor) for campo, valor in valores.items()}
+    return dict(valores, id=actividad_id)
+
+
+def _escribir(connection, actividad_id, valores):
+    dialecto = _dialecto(connection)
+    if dialecto not in ('sqlite', 'postgresql'):
+        return
+    if dialecto == 'sqlite':
+        connection.execute(text("DELETE FROM actividades_fts WHERE rowid = :id"), {'id': actividad_id})
+    connection.execute(_sentencia_insercion(dialecto), _parametros(dialecto, actividad_id, valores))
+
+
+def _eliminar(connection, actividad_id):
+    dialecto = _dialecto(connection)
+    if dialecto == 'sqlite':
+        connection.execute(text("DELETE FROM actividades_fts WHERE rowid = :id"), {'id': actividad_id})
+    elif dialecto == 'postgresql':
+        connection.execute(text("DELETE FROM actividades_busqueda WHERE id_actividad = :id"), {'id': actividad_id})
+
+
+@event.listens_for(Actividades, 'after_insert')
+def _indexar_actividad(mapper, connection, target):
+    if _indice['disponible']:
+        _escribir(connection, target.id_actividad, _valores(target))
+
+
+@event.listens_for(Actividades, 'after_update')
+def _reindexar_actividad(mapper, connection, target):
+    state = sa_inspect(target)
+    if _indice['disponible'] and any(state.attrs[campo].history.has_changes() for campo in CAMPOS_BUSQUEDA):
+        _escribir(connection, target.id_actividad, _valores(target))
+
+
+@event.listens_for(Actividades, 'after_delete')
+def _desindexar_actividad(mapper, connection, target):
+    if _indice['disponible']:
+        _eliminar(connection, target.id_actividad)
+
+
+def reconstruir_indice_busqueda():
+    """Reconstruye por completo el índice de búsqueda a partir de todas las actividades."""
+    if not _indice['disponible']:
+        return 0
+    connection = db.session.connection()
+    dialecto = _dialecto()
+    connection.execute(text("DELETE FROM actividades_fts" if dialecto == 'sqlite' else "DELETE FROM actividades_busqueda"))
+    total = 0
+    lote = []
+    for row in db.session.query(Actividades.id_actividad, *[getattr(Actividades, campo) for campo in CAMPOS_BUSQUEDA]) \
+            .yield_per(1000):
+        lote.append(_parametros(dialecto, row.id_actividad, {campo: getattr(row, campo) or '' for campo in CAMPOS_BUSQUEDA}))
+        if len(lote) == 1000:
+            connection.execute(_sentencia_insercion(dialecto), lote)
+            total, lote = total + len(lote), []
+    if lote:
+        connection.execute(_sentencia_insercion(dialecto), lote)
+        total += len(lote)
+    db.session.commit()
+    current_app.logger.info(f"Índice de búsqueda reconstruido: {total} actividades.")
+    return total
+
+
+def subconsulta_busqueda(consulta):
+    """
+    Construye la subconsulta de coincidencias de una búsqueda, para combinarla con otros filtros.
+
+    Args:
+        consulta (str): Texto escrito por el usuario.
+
+    Returns:
+        Subquery con las columnas `id_actividad` y `relevancia` (mayor es mejor), o None si la consulta
+        no tiene términos.
+    """
+    terminos = terminos_busqueda(consulta)
+    if not terminos:
+        return None
+
+    dialecto = _dialecto()
+    if _indice['disponible'] and dialecto == 'sqlite':
+        # Cada término entre comillas (sin operadores FTS5) y como prefijo; los términos se combinan con AND
+        expresion = ' '.join(f'"{termino}"*' for termino in terminos)
+        pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+        return text(f"SELECT rowid AS id_actividad, -bm25(actividades_fts, {pesos}) AS relevancia "
+                    "FROM actividades_fts WHERE actividades_fts MATCH :expresion") \
+            .bindparams(expresion=expresion) \
+            .columns(column('id_actividad', Integer), column('relevancia', Float)) \
+            .subquery('busqueda')
+    if _indice['disponible'] and dialecto == 'postgresql':
+        expresion = ' & '.join(f"{termino}:*" for termino in terminos)
+        return text("SELECT id_actividad, ts_rank_cd(documento, to_tsquery('spanish', :expresion)) AS relevancia "
+                    "FROM actividades_busqueda WHERE documento @@ to_tsquery('spanish', :expresion)") \
+            .bindparams(expresion=expresion) \
+            .columns(column('id_actividad', Integer), column('relevancia', Float)) \
+            .subquery('busqueda')
+
+    # Sin índice nativo: cada término debe aparecer en alguna columna (sin plegado de acentos)
+    condiciones = [or_(*[getattr(Actividades, campo).ilike(f"%{termino}%") for campo in CAMPOS_BUSQUEDA])
+                   for termino in terminos]
+    return select(Actividades.id_actividad.label('id_actividad'), literal(0.0, Float).label('relevancia')) \
+        .where(and_(*condiciones)).subquery('busqueda')
@@ -0,0 +1,81 @@
+"""
+Cupos en vivo para quienes ven el detalle de una actividad.
+
+La página de detalle se une a la sala de Socket.IO de su actividad (`sala_actividad`). Cuando una inscripción
+o una cancelación cambia el cupo, `notificar_cupos` solo marca la actividad como pendiente (no bloquea ni
+consulta la base de datos). Una tarea en segundo plano lee con una sola consulta el contador de las
+actividades pendientes y emite `cupos_actualizados` a cada sala. Después de cada envío espera
+`SEAT_UPDATES_INTERVAL_MS`: las ráfagas se agrupan y sale como máximo una actualización por actividad y
+por intervalo, siempre con el valor ya confirmado.
+
+Con varios procesos, cada uno agrupa sus propios cambios y el backplane de mensajes (ver
+`services/socketio_backplane.py`) reparte los envíos a los clientes de todos los procesos.
+"""
+import threading
+
+from database.db import db
+from model.models import Actividades
+
+EVENTO_CUPOS = 'cupos_actualizados'
+
+_lock = threading.Lock()
+_estado = {'app': None, 'socketio': None, 'pendientes': set(), 'aviso': None}
+
+
+def sala_actividad(activity_id):
+    """Nombre de la sala de Socket.IO de una actividad."""
+    return f'actividad-{activity_id}'
+
+
+def init_seat_updates(app, socketio):
+    """Arranca la tarea que emite los cupos agrupados (una sola vez por proceso)."""
+    with _lock:
+        if _estado['aviso'] is not None:
+            return
+        _estado['app'], _estado['socketio'] = app, socketio
+        _estado['aviso'] = threading.Event()
+    socketio.start_background_task(_emitir_agrupado, app, socketio, _estado['aviso'])
+
+
+def notificar_cupos(activity_id):
+    """Marca el cupo de la actividad como cambiado; se emitirá en el próximo envío agrupado."""
+    if _estado['aviso'] is None:
+        return
+    with _lock:
+        _estado['pendientes'].add(activity_id)
+    _estado['aviso'].set()
+
+
+def datos_cupos(actividad):
+    """Carga útil de `cupos_actualizados` para una fila con inscritos, cupo_maximo y estado."""
+    inscritos = actividad.inscritos or 0
+    disponibles = None if actividad.cupo_maximo is None else max(0, actividad.cupo_maximo - inscritos)
+    return {'id_actividad': actividad.id_actividad, 'inscritos': inscritos, 'cupo_maximo': actividad.cupo_maximo,
+            'disponibles': disponibles, 'estado': actividad.estado.value if actividad.estado else None}
+
+
+def _emitir_agrupado(app, socketio, aviso):
+    intervalo = app.config.get('SEAT_UPDATES_INTERVAL_MS', 1000) / 1000
+    while True:
+        aviso.wait()
+        with _lock:
+            aviso.clear()
+            pendientes, _estado['pendientes'] = _estado['pendientes'], set()
+        if pendientes:
+            try:
+                for datos in _leer_cupos(app, pendientes):
+                    socketio.emit(EVENTO_CUPOS, datos, to=sala_actividad(datos['id_actividad']))
+            except Exception as e:
+                app.logger.error(f"Error al emitir los cupos de {len(pendientes)} actividades: {e}")
+        socketio.sleep(intervalo)
+
+
+def _leer_cupos(app, activity_ids):
+    with app.app_context():
+        try:
+            filas = db.session.query(Actividades.id_actividad, Actividades.inscritos, Actividades.cupo_maximo,
+                                     Actividades.estado) \
+                .filter(Actividades.id_actividad.in_(activity_ids)).all()
+            return [datos_cupos(fila) for fila in filas]
+        finally:
+            db.session.remove()
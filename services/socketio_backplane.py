@@ -0,0 +1,204 @@
+"""
+Configuración de Socket.IO para producción y backplane de mensajes entre procesos.
+
+Con un solo proceso, Socket.IO guarda en memoria qué clientes están conectados y en qué salas. Para
+repartir el chat entre varios procesos (o máquinas), cada proceso se suscribe a un canal de un broker de
+mensajes: un `emit` a una sala o a todos se publica en el canal y cada proceso lo entrega a sus propios
+clientes. La URL del broker se indica en `SOCKETIO_MESSAGE_QUEUE`:
+
+- `redis://host:6379/0` (o `rediss://`), `amqp://...`, `kafka://...`: los gestores de python-socketio
+  (requieren `redis`, `kombu` o `kafka-python` instalados).
+- `local://127.0.0.1:6390`: el broker local de este módulo (TCP, sin dependencias), pensado para
+  desarrollo y pruebas con varios procesos en la misma máquina. Se arranca con
+  `python -m services.socketio_backplane --port 6390` o, dentro de una prueba, con `iniciar_broker_local`.
+
+El broker solo reparte los eventos: cada cliente debe seguir hablando siempre con el mismo proceso
+(sesiones persistentes en el balanceador, ver `wsgi.py`).
+"""
+import argparse
+import socket
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse
+
+import socketio
+
+ESQUEMA_LOCAL = 'local'
+
+
+def opciones_socketio(config):
+    """
+    Traduce la configuración de la aplicación a los argumentos de `SocketIO`.
+
+    Claves usadas: SOCKETIO_ASYNC_MODE, SOCKETIO_MESSAGE_QUEUE, SOCKETIO_CHANNEL,
+    SOCKETIO_CORS_ALLOWED_ORIGINS, SOCKETIO_PING_INTERVAL y SOCKETIO_PING_TIMEOUT.
+    """
+    opciones = {'async_mode': config.get('SOCKETIO_ASYNC_MODE') or 'threading',
+                'ping_interval': config.get('SOCKETIO_PING_INTERVAL', 25),
+                'ping_timeout': config.get('SOCKETIO_PING_TIMEOUT', 20)}
+    origenes = config.get('SOCKETIO_CORS_ALLOWED_ORIGINS')
+    if origenes:
+        opciones['cors_allowed_origins'] = origenes
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    canal = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if url and urlparse(url).scheme == ESQUEMA_LOCAL:
+        opciones['client_manager'] = GestorBrokerLocal(url, channel=canal)
+    elif url:
+        opciones['message_queue'] = url
+        opciones['channel'] = canal
+    return opciones
+
+
+def gestor_externo(url, canal='flask-socketio'):
+    """
+    Gestor de solo escritura para emitir a los clientes desde otro proceso (CLI, tareas, benchmarks).
+
+    Ejemplo: `gestor_externo(url, canal).emit('evento', datos, to='sala')`.
+    """
+    if urlparse(url).scheme == ESQUEMA_LOCAL:
+        return GestorBrokerLocal(url, channel=canal, write_only=True)
+    if url.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager(url, channel=canal, write_only=True)
+    if url.startswith('kafka://'):
+        return socketio.KafkaManager(url, channel=canal, write_only=True)
+    return socketio.KombuManager(url, channel=canal, write_only=True)
+
+
+def _direccion(url):
+    partes = urlparse(url)
+    return partes.hostname or '127.0.0.1', partes.port or 6390
+
+
+class GestorBrokerLocal(socketio.PubSubManager):
+    """
+    Gestor de clientes de python-socketio respaldado por el broker local (`local://host:puerto`).
+
+    Protocolo por líneas: `SUB <canal>` suscribe la conexión y `PUB <canal> <json>` publica; el broker
+    reenvía el JSON (una línea) a cada suscriptor del canal, incluido el que publicó (PubSubManager
+    descarta sus propios mensajes por `host_id`).
+    """
+    name = 'local'
+
+    def __init__(self, url='local://127.0.0.1:6390', channel='socketio', write_only=False, logger=None, json=None):
+        self.direccion = _direccion(url)
+        self._lock_envio = threading.Lock()
+        self._conexion_envio = None
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+
+    def _publish(self, data):
+        linea = f"PUB {self.channel} {self.json.dumps(data)}\n".encode('utf-8')
+        with self._lock_envio:
+            for intento in range(2):
+                try:
+                    if self._conexion_envio is None:
+                        self._conexion_envio = socket.create_connection(self.direccion, timeout=5)
+                    self._conexion_envio.sendall(linea)
+                    return
+                except OSError as e:
+                    self._cerrar_envio()
+                    if intento:
+                        self._get_logger().error(f"No se pudo publicar en el broker local {self.direccion}: {e}")
+
+    def _cerrar_envio(self):
+        if self._conexion_envio is not None:
+            try:
+                self._conexion_envio.close()
+            except OSError:
+                pass
+            self._conexion_envio = None
+
+    def _listen(self):
+        espera = 1
+        while True:
+            try:
+                with socket.create_connection(self.direccion) as conexion:
+                    conexion.sendall(f"SUB {self.channel}\n".encode('utf-8'))
+                    espera = 1
+                    for linea in conexion.makefile('rb'):
+                        yield linea.rstrip(b'\n')
+            except OSError as e:
+                self._get_logger().error(f"Sin conexión con el broker local {self.direccion}: {e}; "
+                                         f"reintento en {espera} s")
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
+
+
+class _ManejadorBroker(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        # Varios publicadores pueden difundir a la vez: las escrituras a un mismo suscriptor se serializan
+        self.lock_escritura = threading.Lock()
+
+    def handle(self):
+        servidor = self.server
+        canales = set()
+        try:
+            for linea in self.rfile:
+                comando, _, resto = linea.decode('utf-8').rstrip('\n').partition(' ')
+                if comando == 'SUB':
+                    canales.add(resto)
+                    with servidor.lock:
+                        servidor.suscriptores.setdefault(resto, set()).add(self)
+                elif comando == 'PUB':
+                    canal, _, datos = resto.partition(' ')
+                    servidor.difundir(canal, (datos + '\n').encode('utf-8'))
+        except OSError:
+            pass
+        finally:
+            with servidor.lock:
+                for canal in canales:
+                    servidor.suscriptores.get(canal, set()).discard(self)
+
+    def enviar(self, datos):
+        with self.lock_escritura:
+            self.wfile.write(datos)
+            self.wfile.flush()
+
+
+class BrokerLocal(socketserver.ThreadingTCPServer):
+    """Broker pub/sub mínimo en memoria: reenvía cada publicación a los suscriptores del canal."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, direccion):
+        super().__init__(direccion, _ManejadorBroker)
+        self.lock = threading.Lock()
+        self.suscriptores = {}  # canal -> {manejador}
+
+    def difundir(self, canal, datos):
+        with self.lock:
+            destinos = list(self.suscriptores.get(canal, ()))
+        for destino in destinos:
+            try:
+                destino.enviar(datos)
+            except OSError:
+                with self.lock:
+                    self.suscriptores.get(canal, set()).discard(destino)
+
+
+def iniciar_broker_local(host='127.0.0.1', port=0):
+    """Arranca el broker local en un hilo y lo devuelve; su URL es `local://host:server_address[1]`."""
+    broker = BrokerLocal((host, port))
+    threading.Thread(target=broker.serve_forever, name='broker-socketio', daemon=True).start()
+    return broker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broker local de mensajes para Socket.IO (desarrollo y pruebas).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    broker = BrokerLocal((args.host, args.port))
+    print(f"Broker local escuchando en local://{args.host}:{args.port}")
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
+
+
+if __name__ == '__main__':
+    main()
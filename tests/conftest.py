@@ -0,0 +1,47 @@
+"""
+Configuración común de las pruebas.
+
+La aplicación se importa desde `main` contra una base de datos SQLite temporal (se crea y se siembra con
+los datos iniciales en la primera importación), de modo que las pruebas no tocan `instance/`.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DIRECTORIO_BD = tempfile.mkdtemp(prefix='konectai-pruebas-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DIRECTORIO_BD, 'pruebas.sqlite')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# DNI únicos (8 dígitos) para los usuarios creados por las pruebas
+_dni = itertools.count(70000000)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from main import app as flask_app
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return flask_app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def crear_voluntarios(app_context):
+    """Crea n voluntarios activos y devuelve sus IDs."""
+    from database.db import db
+    from model.models import Usuarios
+
+    def crear(n):
+        usuarios = [Usuarios(DNI=str(next(_dni)), nombre='Prueba', perfil='voluntario', contrasena_hash='-')
+                    for _ in range(n)]
+        db.session.add_all(usuarios)
+        db.session.commit()
+        return [usuario.id_usuario for usuario in usuarios]
+    return crear
@@ -0,0 +1,58 @@
+from database.db import db
+from model.models import Actividades, Discapacidades, EstadoActividad
+from services.compatibility_service import (get_compatibility_scores, get_compatibility_scores_batch,
+                                            get_compatibility_scores_indexed)
+
+# Casos límite: sin descripción (categoría desde el nombre), solo etiqueta, inclusiva con y sin coincidencia de discapacidad
+ACTIVIDADES = [
+    {'nombre': 'Limpieza de playa', 'descripcion': 'Recoger residuos y cuidar el medio ambiente costero',
+     'etiqueta': 'ambiental', 'es_inclusiva': True, 'discapacidades': ['Visual']},
+    {'nombre': 'Tutorías', 'descripcion': 'Apoyo escolar y educación para niños, trabajo en equipo',
+     'etiqueta': 'educación', 'es_inclusiva': True, 'discapacidades': ['Auditiva']},
+    {'nombre': 'Comedor popular', 'descripcion': 'Preparar y servir comida', 'etiqueta': None,
+     'es_inclusiva': False, 'discapacidades': []},
+    {'nombre': 'Sin descripción', 'descripcion': '', 'etiqueta': '', 'es_inclusiva': True, 'discapacidades': ['Visual']},
+    {'nombre': 'Solo categoría', 'descripcion': None, 'etiqueta': 'comunicacion', 'es_inclusiva': False,
+     'discapacidades': []},
+]
+
+PERFILES = [
+    {'id': 1, 'interests': ['ambiental', 'educación'], 'skills': ['comunicacion', 'trabajo en equipo'],
+     'disabilities': ['Visual']},
+    {'id': 2, 'interests': ['salud'], 'skills': ['comunicacion'], 'disabilities': []},
+    {'id': 3, 'interests': ['deporte'], 'skills': [], 'disabilities': ['Auditiva', 'Visual']},
+    {'id': 4, 'interests': ['a'], 'skills': [], 'disabilities': ['Visual']},  # sin términos comparables
+]
+
+
+def _items(app_context):
+    """Crea las actividades y devuelve los items con el formato de los controladores."""
+    discapacidades = {d.nombre.value: d for d in Discapacidades.query.all()}
+    actividades = []
+    for datos in ACTIVIDADES:
+        actividad = Actividades(nombre=datos['nombre'], descripcion=datos['descripcion'], etiqueta=datos['etiqueta'],
+                                es_inclusiva=datos['es_inclusiva'], estado=EstadoActividad.ABIERTO, cupo_maximo=10)
+        actividad.discapacidades = [discapacidades[nombre] for nombre in datos['discapacidades']]
+        actividades.append(actividad)
+    db.session.add_all(actividades)
+    db.session.commit()
+    return [{'id': a.id_actividad, 'description': a.descripcion,
+             'category': a.etiqueta if a.etiqueta else a.nombre.lower(),
+             'es_inclusiva': a.es_inclusiva,
+             'discapacidades_soportadas': [d.nombre.value for d in a.discapacidades]} for a in actividades]
+
+
+def test_batch_e_indice_coinciden_con_el_calculo_individual(app_context):
+    items = _items(app_context)
+    # Incluye las actividades de los datos iniciales además de los casos límite
+    items += [{'id': a.id_actividad, 'description': a.descripcion,
+               'category': a.etiqueta if a.etiqueta else (a.nombre or '').lower(),
+               'es_inclusiva': a.es_inclusiva,
+               'discapacidades_soportadas': [d.nombre.value for d in a.discapacidades]}
+              for a in Actividades.query.filter(Actividades.id_actividad.notin_([i['id'] for i in items])).all()]
+
+    for perfil in PERFILES:
+        esperado = get_compatibility_scores(perfil, items)
+        assert set(esperado) == {item['id'] for item in items}
+        assert get_compatibility_scores_batch(perfil, items) == esperado
+        assert get_compatibility_scores_indexed(perfil, items) == esperado
@@ -0,0 +1,25 @@
+from database.db import db
+from model.models import Actividades, CompatibilidadUsuarioActividad, EstadoActividad
+from services.compatibility_store import get_compatibility_scores_cached, huella_perfil, obtener_puntajes_frescos
+
+
+def test_editar_el_perfil_invalida_los_puntajes_guardados(app_context, crear_voluntarios):
+    user_id, = crear_voluntarios(1)
+    actividad = Actividades(nombre='Huerto', descripcion='Cultivar un huerto urbano', etiqueta='ambiental',
+                            es_inclusiva=True, estado=EstadoActividad.ABIERTO, cupo_maximo=5)
+    db.session.add(actividad)
+    db.session.commit()
+    items = [{'id': actividad.id_actividad, 'es_inclusiva': True, 'discapacidades_soportadas': ['Visual']}]
+    perfil = {'id': user_id, 'interests': ['ambiental'], 'skills': ['comunicacion'], 'disabilities': []}
+
+    antes = get_compatibility_scores_cached(perfil, items)
+    assert obtener_puntajes_frescos(user_id, [actividad.id_actividad], huella_perfil(perfil)) == antes
+
+    # Con otra discapacidad cambia la huella: el puntaje guardado deja de estar fresco y se recalcula
+    editado = dict(perfil, disabilities=['Visual'])
+    assert obtener_puntajes_frescos(user_id, [actividad.id_actividad], huella_perfil(editado)) == {}
+    despues = get_compatibility_scores_cached(editado, items)
+    assert despues[actividad.id_actividad] == antes[actividad.id_actividad] + 15.0
+
+    fila = db.session.get(CompatibilidadUsuarioActividad, (user_id, actividad.id_actividad))
+    assert fila.huella_perfil == huella_perfil(editado)
@@ -0,0 +1,49 @@
+import threading
+
+from database.db import db
+from model.models import Actividades, EstadoActividad, Inscripciones
+from services.enrollment_service import (EN_ESPERA, ESTADO_CONFIRMADA, ESTADO_EN_ESPERA, INSCRITO,
+                                         inscribir_usuario)
+
+CUPO = 3
+HILOS = 12
+
+
+def test_inscripciones_concurrentes_no_superan_el_cupo(app, app_context, crear_voluntarios):
+    actividad = Actividades(nombre='Cupo limitado', descripcion='Prueba de concurrencia', cupo_maximo=CUPO,
+                            estado=EstadoActividad.ABIERTO)
+    db.session.add(actividad)
+    db.session.commit()
+    activity_id = actividad.id_actividad
+    user_ids = crear_voluntarios(HILOS)
+
+    barrera = threading.Barrier(HILOS)
+    resultados, errores = [], []
+
+    def inscribir(user_id):
+        with app.app_context():
+            try:
+                barrera.wait()
+                resultados.append(inscribir_usuario(user_id, activity_id))
+            except Exception as e:
+                errores.append(e)
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=inscribir, args=(user_id,)) for user_id in user_ids]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert not errores
+    assert resultados.count(INSCRITO) <= CUPO
+    assert resultados.count(INSCRITO) + resultados.count(EN_ESPERA) == HILOS
+
+    db.session.expire_all()
+    estados = [fila.estado_inscripcion for fila in
+               Inscripciones.query.filter_by(id_actividad=activity_id).all()]
+    confirmadas = estados.count(ESTADO_CONFIRMADA)
+    assert confirmadas <= CUPO
+    assert db.session.get(Actividades, activity_id).inscritos == confirmadas
+    assert estados.count(ESTADO_EN_ESPERA) == HILOS - confirmadas
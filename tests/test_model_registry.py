@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+
+import pytest
+
+from services.model_registry import DIRECTORIO_MODELOS, obtener_version_mas_reciente, registrar_modelo
+
+
+@pytest.fixture
+def registro(app_context, tmp_path, monkeypatch):
+    """Registro de modelos en una carpeta de instancia temporal."""
+    monkeypatch.setattr(app_context, 'instance_path', str(tmp_path))
+    return tmp_path / DIRECTORIO_MODELOS
+
+
+def _publicar(app, proceso, n):
+    with app.app_context():
+        for i in range(n):
+            registrar_modelo({'proceso': proceso, 'i': i}, {'filas_entrenamiento': i})
+
+
+def test_conserva_solo_las_ultimas_versiones(app, registro, monkeypatch):
+    monkeypatch.setitem(app.config, 'MODEL_REGISTRY_KEEP_VERSIONS', 3)
+    for i in range(6):
+        metadata = registrar_modelo({'i': i}, {'filas_entrenamiento': i})
+        (registro / f"arbol-{metadata['hash']}.dot").write_text('digraph {}')
+
+    archivos = sorted(os.listdir(registro))
+    versiones = sorted({nombre[:5] for nombre in archivos if nombre.startswith('v')})
+    assert versiones == ['v0004', 'v0005', 'v0006']
+    assert len([nombre for nombre in archivos if nombre.endswith('.joblib')]) == 3
+    # Los .dot de las versiones podadas también se eliminan
+    assert len([nombre for nombre in archivos if nombre.endswith('.dot')]) == 3
+    assert obtener_version_mas_reciente()['version'] == 6
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="requiere fork")
+def test_procesos_concurrentes_no_repiten_version(app, registro, monkeypatch):
+    monkeypatch.setitem(app.config, 'MODEL_REGISTRY_KEEP_VERSIONS', 100)
+    contexto = multiprocessing.get_context('fork')
+    procesos = [contexto.Process(target=_publicar, args=(app, p, 5)) for p in range(4)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(timeout=60)
+        assert proceso.exitcode == 0
+
+    versiones = sorted(int(nombre[1:5]) for nombre in os.listdir(registro) if nombre.endswith('.joblib'))
+    assert versiones == list(range(1, 21))
+    assert obtener_version_mas_reciente()['version'] == 20
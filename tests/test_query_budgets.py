@@ -0,0 +1,55 @@
+"""
+Presupuestos de consultas SQL de las rutas (`presupuesto_consultas`).
+
+Cada ruta se pide dos veces con las cachés del proceso vacías: la primera solicitud incluye la carga de
+los datos de referencia, del índice de actividades y el cálculo de los puntajes o recomendaciones del
+voluntario; la segunda, el camino habitual. Ambas deben quedar dentro del presupuesto declarado.
+"""
+import pytest
+
+from database.query_stats import limite_consultas
+from model.models import Actividades, EstadoActividad, Usuarios
+from services import activity_index_service
+from services.reference_data import invalidar_datos_referencia
+
+
+def _presupuesto(app, ruta):
+    endpoint, _ = app.url_map.bind('localhost').match(ruta)
+    return app.view_functions[endpoint].presupuesto_consultas
+
+
+def _cliente(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def cachés_en_frío(app_context):
+    invalidar_datos_referencia()
+    activity_index_service._cache.reset()
+
+
+def _pedir_dentro_del_presupuesto(app, client, ruta):
+    for _ in range(2):
+        with limite_consultas(_presupuesto(app, ruta)):
+            response = client.get(ruta)
+        assert response.status_code == 200
+
+
+@pytest.mark.parametrize('ruta', ['/programs', '/dashboard/', '/dashboard/profile', '/program/{id}'])
+def test_rutas_del_voluntario(app, crear_voluntarios, cachés_en_frío, ruta):
+    user_id, = crear_voluntarios(1)
+    actividad = Actividades.query.filter_by(estado=EstadoActividad.ABIERTO).first()
+    _pedir_dentro_del_presupuesto(app, _cliente(app, user_id), ruta.format(id=actividad.id_actividad))
+
+
+@pytest.mark.parametrize('dni, ruta', [('12345678', '/dashboard/'),
+                                       ('12345678', '/dashboard/admin/manage_users'),
+                                       ('87654321', '/dashboard/'),
+                                       ('87654321', '/programs')])
+def test_rutas_de_administrador_y_organizador(app, cachés_en_frío, dni, ruta):
+    usuario = Usuarios.query.filter_by(DNI=dni).one()
+    _pedir_dentro_del_presupuesto(app, _cliente(app, usuario.id_usuario), ruta)
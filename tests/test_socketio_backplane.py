@@ -0,0 +1,53 @@
+import threading
+import time
+
+import socketio
+
+from services.socketio_backplane import GestorBrokerLocal, iniciar_broker_local
+
+CANAL = 'pruebas-backplane'
+
+
+def _servidor(url):
+    """Servidor de Socket.IO con el gestor del broker local y un registro de los paquetes que enviaría."""
+    servidor = socketio.Server(async_mode='threading', client_manager=GestorBrokerLocal(url, channel=CANAL))
+    servidor.enviados = []
+    servidor.recibido = threading.Event()
+
+    def registrar(eio_sid, paquete_eio):
+        servidor.enviados.append((eio_sid, socketio.packet.Packet(encoded_packet=paquete_eio.data).data))
+        servidor.recibido.set()
+    servidor._send_eio_packet = registrar
+    servidor.manager_initialized = True
+    servidor.manager.initialize()
+    return servidor
+
+
+def _esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_emit_de_un_proceso_llega_a_los_clientes_del_otro():
+    broker = iniciar_broker_local()
+    url = f'local://127.0.0.1:{broker.server_address[1]}'
+    try:
+        emisor, receptor = _servidor(url), _servidor(url)
+        assert _esperar(lambda: len(broker.suscriptores.get(CANAL, ())) == 2)
+
+        # Un cliente conectado solo al receptor, dentro de la sala de una actividad
+        sid = receptor.manager.connect('eio-receptor', '/')
+        receptor.manager.enter_room(sid, '/', 'actividad-1')
+
+        emisor.emit('cupos_actualizados', {'id_actividad': 1, 'disponibles': 4}, to='actividad-1')
+
+        assert receptor.recibido.wait(5)
+        assert receptor.enviados == [('eio-receptor', ['cupos_actualizados', {'id_actividad': 1, 'disponibles': 4}])]
+        assert emisor.enviados == []
+    finally:
+        broker.shutdown()
+        broker.server_close()
@@ -82,6 +82,9 @@ document.addEventListener('DOMContentLoaded', function() {
             setBotTypingIndicator(false);
             if (data && typeof data.response === 'string') {
                 addMessageToChat(data.response, 'bot');
+                if (Array.isArray(data.programas) && data.programas.length > 0) {
+                    addProgramLinks(data.programas);
+                }
                 if (data.requires_auth) {
                     addMessageToChat("Por favor, inicia sesi&oacute;n para obtener respuestas m&aacute;s personalizadas.", 'bot-info');
                 }
@@ -146,6 +149,22 @@ document.addEventListener('DOMContentLoaded', function() {
         chatMessagesContainer.scrollTop = chatMessagesContainer.scrollHeight;
     }
 
+    function addProgramLinks(programas) {
+        const messageWrapper = document.createElement('div');
+        messageWrapper.classList.add('flex', 'flex-col', 'items-start', 'mb-3', 'clear-both');
+
+        programas.forEach((programa) => {
+            const link = document.createElement('a');
+            link.href = programa.url;
+            link.textContent = programa.nombre;
+            link.classList.add('text-sm', 'text-indigo-600', 'underline', 'hover:text-indigo-800', 'mb-1');
+            messageWrapper.appendChild(link);
+        });
+
+        chatMessagesContainer.appendChild(messageWrapper);
+        chatMessagesContainer.scrollTop = chatMessagesContainer.scrollHeight;
+    }
+
     function setBotTypingIndicator(isTyping) {
         botIsTyping = isTyping;
 
@@ -0,0 +1,58 @@
+"""
+Punto de entrada de producción.
+
+El modo asíncrono se elige con `SOCKETIO_ASYNC_MODE` y debe coincidir con el worker del servidor. Con
+'eventlet' o 'gevent' las bibliotecas estándar (sockets, hilos) se parchean aquí, antes de importar la
+aplicación; por eso el servidor debe cargar `wsgi:app` y no `main:app`.
+
+Un proceso por instancia (Socket.IO no admite varios workers de gunicorn en la misma instancia):
+
+    SOCKETIO_ASYNC_MODE=eventlet gunicorn -k eventlet -w 1 --bind 127.0.0.1:8001 wsgi:app
+    SOCKETIO_ASYNC_MODE=gevent gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker -w 1 --bind 127.0.0.1:8001 wsgi:app
+
+o, sin gunicorn, `PORT=8001 python wsgi.py` (usa el servidor del modo asíncrono configurado).
+
+Varios procesos: se levantan N instancias en puertos distintos, todas con el mismo
+`SOCKETIO_MESSAGE_QUEUE` (p. ej. `redis://redis:6379/0`, o `local://127.0.0.1:6390` con el broker de
+`services.socketio_backplane` para pruebas locales) y el mismo `SECRET_KEY`. El balanceador debe usar
+sesiones persistentes: el transporte de long-polling hace varias solicitudes HTTP por conexión y todas
+deben llegar al proceso que la abrió. Con nginx:
+
+    upstream konectai {
+        ip_hash;
+        server 127.0.0.1:8001;
+        server 127.0.0.1:8002;
+    }
+    server {
+        location /socket.io {
+            proxy_pass http://konectai/socket.io;
+            proxy_http_version 1.1;
+            proxy_set_header Upgrade $http_upgrade;
+            proxy_set_header Connection "upgrade";
+            proxy_set_header Host $host;
+            proxy_read_timeout 86400;
+        }
+        location / {
+            proxy_pass http://konectai;
+            proxy_set_header Host $host;
+        }
+    }
+
+El estado que cada proceso guarda en memoria (tickets de inscripción en cola, cachés) también depende de
+estas sesiones persistentes. Capacidad de conexiones por proceso: `python -m database.benchmark_socketio`.
+"""
+import os
+
+ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from main import app, socketio  # noqa: E402  (después del parcheo)
+
+if __name__ == '__main__':
+    socketio.run(app, host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 5000)),
+                 debug=False, allow_unsafe_werkzeug=ASYNC_MODE == 'threading')